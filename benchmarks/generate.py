@@ -0,0 +1,160 @@
+"""
+Generates synthetic sensor data files in the layout of a sensor model.
+
+The files have the header rows of the sensor model (sensor id, date, time and column names, optionally prefixed with
+the comment style) and relative or absolute timestamps. The signals switch between activities, so that the data can be
+labeled, windowed and classified like real recordings.
+"""
+import datetime as dt
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from constants import ABSOLUTE_TIME_ITEM, RELATIVE_TIME_ITEM
+from database.models import SensorModel
+
+TIME_COLUMN = 'Time'
+DEFAULT_COLUMNS = ['Ax', 'Ay', 'Az', 'Gx', 'Gy', 'Gz']
+START = dt.datetime(2020, 5, 1, 10, 0)
+
+ACTIVITIES = {
+    # Activity: (frequency in Hz, amplitude)
+    'rest': (0.0, 0.0),
+    'walk': (2.0, 3.0),
+    'run': (3.0, 8.0)
+}
+
+SEGMENT_SECONDS = (30, 300)
+"""The minimum and maximum duration of an activity."""
+
+UNIT_SECONDS = {
+    'days': 86400,
+    'hours': 3600,
+    'minutes': 60,
+    'seconds': 1,
+    'milliseconds': 1e-3,
+    'microseconds': 1e-6,
+    'nanoseconds': 1e-9
+}
+
+
+class SyntheticRecording:
+
+    def __init__(self, path: Path, start: dt.datetime, rows: int, labels: List[Tuple[float, float, str]]):
+        self.path = path
+        self.start = start
+        """The naive start datetime, in the timezone of the sensor."""
+        self.rows = rows
+        self.labels = labels
+        """The activities as (start, end, activity), in seconds since the start."""
+
+    def label_datetimes(self) -> List[Tuple[dt.datetime, dt.datetime, str]]:
+        """
+        :return: The activities with naive start and end datetimes, in the timezone of the sensor
+        """
+        return [(self.start + dt.timedelta(seconds=start), self.start + dt.timedelta(seconds=end), activity)
+                for start, end, activity in self.labels]
+
+
+def activity_schedule(duration: float, rng: np.random.Generator) -> List[Tuple[float, float, str]]:
+    """
+    :return: Consecutive activities that cover `duration` seconds, as (start, end, activity)
+    """
+    schedule = []
+    start = 0.0
+    names = list(ACTIVITIES)
+
+    while start < duration:
+        end = min(start + rng.uniform(*SEGMENT_SECONDS), duration)
+        schedule.append((start, end, names[rng.integers(len(names))]))
+        start = end
+
+    return schedule
+
+
+def signals(seconds: np.ndarray, schedule: List[Tuple[float, float, str]], columns: List[str],
+            rng: np.random.Generator) -> np.ndarray:
+    """
+    :return: One column of values per column name, for the activity at every time
+    """
+    starts = np.array([start for start, _, _ in schedule])
+    segment = np.searchsorted(starts, seconds, side='right') - 1
+    frequency = np.array([ACTIVITIES[activity][0] for _, _, activity in schedule])[segment]
+    amplitude = np.array([ACTIVITIES[activity][1] for _, _, activity in schedule])[segment]
+
+    values = np.empty((len(seconds), len(columns)))
+    for i in range(len(columns)):
+        phase = rng.uniform(0, 2 * np.pi)
+        values[:, i] = amplitude * np.sin(2 * np.pi * frequency * seconds + phase) + rng.normal(0, 0.2, len(seconds))
+
+    # The first axis measures gravity
+    values[:, 0] += 9.81
+    return values
+
+
+def header_rows(sensor_model: SensorModel, sensor_name: str, start: dt.datetime) -> List[List[str]]:
+    """
+    :return: The rows above the column names, with the sensor id, date and time where the sensor model expects them
+    """
+    rows = [['Synthetic sensor data']] * sensor_model.col_names_row
+    rows = [list(row) for row in rows]
+
+    if sensor_model.sensor_id_row > 0:
+        column = sensor_model.sensor_id_column if sensor_model.sensor_id_column is not None else 1
+        row = ['Sensor'] + [''] * max(column - 1, 0) + [sensor_name]
+        rows[sensor_model.sensor_id_row] = row if column > 0 else [sensor_name]
+    if sensor_model.date_row > 0:
+        rows[sensor_model.date_row] = ['Date', start.strftime('%Y-%m-%d')]
+    if sensor_model.time_row > 0:
+        rows[sensor_model.time_row] = ['Time', start.strftime('%H:%M:%S')]
+
+    return rows
+
+
+def generate_sensor_file(path: Path, sensor_model: SensorModel, hours: float, sampling_rate: float = 100,
+                         columns: List[str] = None, sensor_name: str = 'SYNTHETIC-01', start: dt.datetime = START,
+                         seed: int = 0) -> SyntheticRecording:
+    """
+    Writes a sensor data file in the layout of `sensor_model`.
+
+    :param path: The path of the file
+    :param sensor_model: The sensor model that describes the layout of the file
+    :param hours: The duration of the recording in hours
+    :param sampling_rate: The number of rows per second
+    :param columns: The names of the value columns, `DEFAULT_COLUMNS` by default
+    :param sensor_name: The sensor id in the header
+    :param start: The naive start datetime, in the timezone of the sensor
+    :param seed: The seed of the random activities and noise
+    :return: The recording, with the activities that were generated
+    """
+    columns = columns if columns is not None else DEFAULT_COLUMNS
+    rng = np.random.default_rng(seed)
+
+    n = int(round(hours * 3600 * sampling_rate))
+    seconds = np.arange(n) / sampling_rate
+    schedule = activity_schedule(n / sampling_rate, rng)
+
+    df = pd.DataFrame(signals(seconds, schedule, columns, rng), columns=columns)
+
+    if sensor_model.relative_absolute == RELATIVE_TIME_ITEM:
+        timestamps = seconds / UNIT_SECONDS[sensor_model.timestamp_unit]
+    elif sensor_model.relative_absolute == ABSOLUTE_TIME_ITEM:
+        timestamps = (pd.Timestamp(start) + pd.to_timedelta(seconds, unit='s')).strftime(sensor_model.format_string)
+    else:
+        raise ValueError('Unknown timestamp type: {}'.format(sensor_model.relative_absolute))
+
+    df.insert(sensor_model.timestamp_column, TIME_COLUMN, timestamps)
+
+    comment = sensor_model.comment_style or ''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with path.open('w', newline='') as f:
+        for row in header_rows(sensor_model, sensor_name, start):
+            f.write(comment + ','.join(row) + '\n')
+        f.write(comment + ','.join(df.columns) + '\n')
+        df.to_csv(f, header=False, index=False, float_format='%.4f')
+
+    return SyntheticRecording(path, start, n, schedule)
@@ -0,0 +1,90 @@
+"""
+History of benchmark results, one JSON record per line.
+
+Every record holds the time of a single stage for a single data size on a single machine. New results are compared
+with the median of the most recent results of the same stage, data size and machine, so that regressions show up.
+"""
+import json
+import platform
+import subprocess
+from pathlib import Path
+from statistics import median
+from typing import List, Optional
+
+HISTORY_FILE = Path(__file__).parent.joinpath('results', 'history.jsonl')
+
+REGRESSION_THRESHOLD = 0.2
+"""A stage is reported as a regression when it is this fraction slower than before."""
+
+HISTORY_LENGTH = 5
+"""The number of previous results a new result is compared with."""
+
+
+def git_commit() -> Optional[str]:
+    """
+    :return: The commit that is checked out, or None if it cannot be determined
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine() -> str:
+    return '{} {} {}'.format(platform.node(), platform.system(), platform.machine())
+
+
+def load_history(path: Path = HISTORY_FILE) -> List[dict]:
+    path = Path(path)
+    if not path.is_file():
+        return []
+
+    records = []
+    with path.open('r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A line of an interrupted run
+                continue
+    return records
+
+
+def append_history(records: List[dict], path: Path = HISTORY_FILE) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with path.open('a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def _key(record: dict) -> tuple:
+    return record['stage'], record['layout'], record['rows'], record['machine']
+
+
+def find_regressions(history: List[dict], records: List[dict], threshold: float = REGRESSION_THRESHOLD,
+                     length: int = HISTORY_LENGTH) -> List[dict]:
+    """
+    :param history: The previous records, oldest first
+    :param records: The new records
+    :param threshold: The fraction a stage may be slower than before
+    :param length: The number of previous records a new record is compared with
+    :return: The new records that are slower than the median of the previous records, with the 'baseline' seconds
+    """
+    previous = {}
+    for record in history:
+        previous.setdefault(_key(record), []).append(record['seconds'])
+
+    regressions = []
+    for record in records:
+        times = previous.get(_key(record), [])[-length:]
+        if not times:
+            continue
+
+        baseline = median(times)
+        if record['seconds'] > baseline * (1 + threshold):
+            regressions.append(dict(record, baseline=baseline))
+
+    return regressions
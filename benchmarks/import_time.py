@@ -0,0 +1,134 @@
+"""
+Import-time profile of the GUI, the largest part of the startup time.
+
+The module is imported in a fresh interpreter with `python -X importtime`, so that the profile is not influenced by
+modules that are already imported. The cumulative import time is appended to the benchmark history, and heavy
+subsystems that should only be imported on first use are reported when they are imported at startup.
+
+Usage: python -m benchmarks.import_time --module gui.gui --repeat 5
+"""
+import argparse
+import datetime as dt
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks import history as h
+
+STARTUP_MODULE = 'gui.gui'
+
+LAZY_MODULES = [
+    'sklearn',
+    'matplotlib.animation',
+    'data_export.windowing',
+    'data_export.feature_store',
+    'machine_learning.model_cache',
+    'machine_learning.suggestion_pipeline',
+    'gui.dialogs.export_dialog',
+    'gui.dialogs.machine_learning_dialog',
+    'gui.dialogs.visual_analysis_dialog',
+]
+"""Modules that are imported on first use, and should not be imported at startup."""
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """
+    :param output: The standard error of `python -X importtime`
+    :return: Per imported module the 'module', its own 'self_us', the 'cumulative_us' including the modules it
+        imports, and the 'depth' in the import tree, in the order in which the imports finished
+    """
+    records = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+
+        self_us, cumulative_us, indent, module = match.groups()
+        records.append({
+            'module': module,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': len(indent) // 2
+        })
+
+    return records
+
+
+def profile_imports(module: str = STARTUP_MODULE, python: str = sys.executable, cwd: Path = None) -> List[Dict]:
+    """
+    Imports a module in a new interpreter and returns its import-time profile, see `parse_importtime`.
+    """
+    cwd = cwd if cwd is not None else Path(__file__).parent.parent
+    res = subprocess.run([python, '-X', 'importtime', '-c', 'import {}'.format(module)], cwd=cwd,
+                         capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError('Could not import {}:\n{}'.format(module, res.stderr[-2000:]))
+
+    return parse_importtime(res.stderr)
+
+
+def total_seconds(records: List[Dict], module: str) -> float:
+    """
+    :return: The cumulative import time of `module` in seconds
+    """
+    return max(record['cumulative_us'] for record in records if record['module'] == module) / 1e6
+
+
+def eager_imports(records: List[Dict], lazy_modules: List[str] = None) -> List[str]:
+    """
+    :return: The modules of `lazy_modules` that were imported, including their submodules
+    """
+    lazy_modules = lazy_modules if lazy_modules is not None else LAZY_MODULES
+    imported = {record['module'] for record in records}
+    return [module for module in lazy_modules
+            if module in imported or any(name.startswith(module + '.') for name in imported)]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_time', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--module', default=STARTUP_MODULE)
+    parser.add_argument('--repeat', type=int, default=5, help='The number of imports of which the fastest is kept')
+    parser.add_argument('--top', type=int, default=20, help='The number of slowest modules that are shown')
+    parser.add_argument('--history', type=Path, default=h.HISTORY_FILE)
+    parser.add_argument('--threshold', type=float, default=h.REGRESSION_THRESHOLD,
+                        help='The fraction the import may be slower than before')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 on a regression, or when a lazy module is imported at startup')
+    args = parser.parse_args(argv)
+
+    profiles = [profile_imports(args.module) for _ in range(args.repeat)]
+    fastest = min(profiles, key=lambda records: total_seconds(records, args.module))
+
+    record = {
+        'time': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'commit': h.git_commit(),
+        'machine': h.machine(),
+        'python': sys.version.split()[0],
+        'layout': args.module,
+        'hours': None,
+        'rows': None,
+        'stage': 'import',
+        'seconds': total_seconds(fastest, args.module)
+    }
+    regressions = h.find_regressions(h.load_history(args.history), [record], args.threshold)
+    h.append_history([record], args.history)
+
+    print('import {}: {:.3f} s'.format(args.module, record['seconds']))
+    for module in sorted(fastest, key=lambda r: r['cumulative_us'], reverse=True)[1:args.top + 1]:
+        print('{:>10.1f} ms  {}{}'.format(module['cumulative_us'] / 1e3, '  ' * module['depth'], module['module']))
+
+    eager = eager_imports(fastest)
+    for module in eager:
+        print('EAGER IMPORT: {} is imported at startup'.format(module))
+    for regression in regressions:
+        print('REGRESSION: import took {seconds:.3f} s, was {baseline:.3f} s'.format(**regression))
+
+    return 1 if (regressions or eager) and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
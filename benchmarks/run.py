@@ -0,0 +1,187 @@
+"""
+End-to-end performance benchmark of the sensor data pipeline.
+
+For every data size, a synthetic sensor data file is generated in the layout of a sensor model and processed by the
+same code as the application: ingest (parsing and unit conversion), formulas, absolute timestamps, labeling, filtering,
+windowing (serially and on a thread pool), classification and export. The fastest of `repeat` runs of every stage is
+appended to the history, and compared with the previous runs on the same machine.
+
+Usage: python -m benchmarks.run --hours 0.5 2 8 --repeat 3
+"""
+import argparse
+import datetime as dt
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pytz
+from sklearn.naive_bayes import GaussianNB
+
+from benchmarks import history as h
+from benchmarks.generate import generate_sensor_file, SyntheticRecording, TIME_COLUMN, DEFAULT_COLUMNS
+from constants import ABSOLUTE_DATETIME, ABSOLUTE_TIME_ITEM, RELATIVE_TIME_ITEM
+from controllers.project_controller import ProjectController
+from data_export import export_data
+from data_export import windowing as w
+from data_import.sensor_data import SensorData
+from database.models import SensorModel
+from date_utils import naive_to_utc
+from machine_learning.classifier import Classifier, CLASSIFIER_NAN
+
+STAGES = ['ingest', 'formula', 'timestamps', 'labeling', 'filtering', 'windowing', 'windowing_parallel',
+          'classification', 'export']
+
+TIMEZONE = 'Europe/Amsterdam'
+FORMULA = ('Magnitude', 'sqrt(Ax^2 + Ay^2 + Az^2)')
+
+LAYOUTS = {
+    RELATIVE_TIME_ITEM: dict(model_name='benchmark relative', date_row=2, time_row=3, timestamp_column=0,
+                             relative_absolute=RELATIVE_TIME_ITEM, timestamp_unit='seconds', format_string='',
+                             sensor_id_row=1, sensor_id_column=1, col_names_row=4, comment_style=';'),
+    ABSOLUTE_TIME_ITEM: dict(model_name='benchmark absolute', date_row=2, time_row=3, timestamp_column=0,
+                             relative_absolute=ABSOLUTE_TIME_ITEM, timestamp_unit='formatted string',
+                             format_string='%Y-%m-%d %H:%M:%S.%f', sensor_id_row=1, sensor_id_column=1,
+                             col_names_row=4, comment_style=None)
+}
+
+
+class Timer:
+
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+
+    def __call__(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        res = func(*args, **kwargs)
+        self.times[stage] = time.perf_counter() - start
+        return res
+
+
+def run_pipeline(project_controller: ProjectController, sensor_model: SensorModel, recording: SyntheticRecording,
+                 output_dir: Path) -> Dict[str, float]:
+    """
+    Processes a sensor data file like the application does when a file is opened and exported.
+
+    :return: The number of seconds of every stage
+    """
+    timer = Timer()
+    timezone = pytz.timezone(TIMEZONE)
+
+    def ingest():
+        sensor_data = SensorData(project_controller, recording.path, sensor_model.id)
+        sensor_data.metadata.sensor_timezone = timezone
+        sensor_data.parse()
+        return sensor_data
+
+    sensor_data = timer('ingest', ingest)
+    timer('formula', sensor_data.add_column_from_func, *FORMULA)
+    timer('timestamps', sensor_data.add_abs_dt_col, use_tznaive=True)
+
+    labels = [{'start': naive_to_utc(start, timezone), 'end': naive_to_utc(end, timezone), 'activity': activity}
+              for start, end, activity in recording.label_datetimes()]
+    # Leave every third activity unlabeled, to be classified
+    labeled = [label for i, label in enumerate(labels) if i % 3 != 1]
+
+    timer('labeling', sensor_data.add_labels, labeled)
+    timer('filtering', sensor_data.filter_between_dates, labels[0]['start'], labels[-1]['end'])
+
+    df = sensor_data.get_data()
+    df['Label'] = df['Label'].replace('', CLASSIFIER_NAN)
+    cols = DEFAULT_COLUMNS + [FORMULA[0]]
+
+    windows = timer('windowing', w.windowing, df, cols, 'Label', ABSOLUTE_DATETIME, mean='mean', std='std')
+    # The same windows with the columns distributed over a thread pool
+    timer('windowing_parallel', w.windowing_parallel, df, cols, 'Label', ABSOLUTE_DATETIME, mean='mean', std='std')
+    features = [col for col in windows.columns if col != 'Label']
+    timer('classification', Classifier(GaussianNB(), windows, features).classify)
+
+    df = df.drop(columns=TIME_COLUMN, errors='ignore')
+    timer('export', export_data.export, [df], 'Label', ABSOLUTE_DATETIME,
+          output_dir.joinpath('export.csv').as_posix(), ['Benchmark export'])
+
+    return timer.times
+
+
+def benchmark(hours: List[float], layout: str = RELATIVE_TIME_ITEM, sampling_rate: float = 100, repeat: int = 3,
+              data_dir: Path = None) -> List[dict]:
+    """
+    Runs the pipeline for every data size.
+
+    :param hours: The durations of the generated recordings
+    :param layout: The timestamp type of the sensor model, relative or absolute
+    :param sampling_rate: The number of rows per second
+    :param repeat: The number of runs of which the fastest is kept
+    :param data_dir: Directory in which the generated files are written, a temporary directory if None
+    :return: One history record per data size and stage
+    """
+    records = []
+    commit = h.git_commit()
+    now = dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        data_dir = Path(data_dir) if data_dir is not None else tmp_dir.joinpath('data')
+
+        project_controller = ProjectController(None)
+        project_controller.load_or_create(tmp_dir.joinpath('project'), new_project=True)
+        project_controller.set_setting('timezone', TIMEZONE)
+
+        try:
+            sensor_model = SensorModel.create(**LAYOUTS[layout])
+
+            for size in hours:
+                path = data_dir.joinpath('{}_{}h_{}hz.csv'.format(layout, size, sampling_rate))
+                recording = generate_sensor_file(path, sensor_model, size, sampling_rate)
+
+                runs = [run_pipeline(project_controller, sensor_model, recording, tmp_dir) for _ in range(repeat)]
+
+                for stage in STAGES:
+                    records.append({
+                        'time': now,
+                        'commit': commit,
+                        'machine': h.machine(),
+                        'python': sys.version.split()[0],
+                        'layout': layout,
+                        'hours': size,
+                        'rows': recording.rows,
+                        'stage': stage,
+                        'seconds': min(run[stage] for run in runs)
+                    })
+        finally:
+            project_controller.close_db()
+
+    return records
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--hours', nargs='+', type=float, default=[0.25, 1, 4],
+                        help='The durations of the generated recordings')
+    parser.add_argument('--layout', choices=sorted(LAYOUTS), default=RELATIVE_TIME_ITEM,
+                        help='Relative or absolute timestamps')
+    parser.add_argument('--sampling-rate', type=float, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', type=Path, help='Write the generated files to this directory')
+    parser.add_argument('--history', type=Path, default=h.HISTORY_FILE)
+    parser.add_argument('--threshold', type=float, default=h.REGRESSION_THRESHOLD,
+                        help='The fraction a stage may be slower than before')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on a regression')
+    args = parser.parse_args(argv)
+
+    records = benchmark(args.hours, args.layout, args.sampling_rate, args.repeat, args.data_dir)
+    regressions = h.find_regressions(h.load_history(args.history), records, args.threshold)
+    h.append_history(records, args.history)
+
+    for record in records:
+        print('{hours:>6}h {rows:>10} rows  {stage:<18} {seconds:9.3f} s'.format(**record))
+
+    for record in regressions:
+        print('REGRESSION: {stage} at {hours}h took {seconds:.3f} s, was {baseline:.3f} s'.format(**record))
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
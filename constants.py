@@ -5,6 +5,14 @@ PROJECT_CONFIG_FILE = 'project_config.json'
 PROJECT_DATABASE_FILE = 'project_data.db'
 PREVIOUS_SENSOR_DATA_FILE = 'previous_sensor_data_file'
 PLOT_HEIGHT_FACTOR = 'plot_height_factor'
+LABEL_VERSION = 'label_version'
+MODEL_CACHE_DIR = 'model_cache'
+FEATURE_STORE_DIR = 'feature_store'
+PARSED_DATA_CACHE_DIR = 'parsed_data_cache'
+SENSOR_DATA_CACHE_SIZE = 'sensor_data_cache_size'
+COMPACT_DTYPES = 'compact_dtypes'
+INSTRUMENTATION = 'instrumentation'
+TRACE_FILE = 'trace.json'
 
 ID = 'id'
 MODEL_NAME = 'model_name'
@@ -1,5 +1,4 @@
-import peewee
-
+from database.label_type_registry import label_types
 from database.models import Label, LabelType, Subject
 
 
@@ -17,18 +16,16 @@ class AnnotationController:
         # In the end, IntegrityErrors should not be raised if it passes these two checks as long as the database
         # remains as it is.
 
-        existing_activities = set(row.activity for row in LabelType.select(LabelType.activity))
-        if activity in existing_activities:
+        if label_types.get_by_activity(activity) is not None:
             raise NonUniqueActivityNameException(activity)
 
-        try:
-            existing_activity = LabelType.get(LabelType.keyboard_shortcut == shortcut).activity
-        except peewee.DoesNotExist:
-            pass  # The above query failed, so there is currently no activity with the specified shortcut.
-        else:
-            raise NonUniqueShortcutException(shortcut, existing_activity)  # An activity has been found with the shortcut.
+        existing_label_type = label_types.get_by_shortcut(shortcut)
+        if existing_label_type is not None:
+            # An activity has been found with the shortcut.
+            raise NonUniqueShortcutException(shortcut, existing_label_type.activity)
 
         LabelType(activity=activity, color=color, description="", keyboard_shortcut=shortcut).save()
+        label_types.invalidate()
 
     def remove_label(self, activity):
         label_type = LabelType.get(LabelType.activity == activity)
@@ -36,6 +33,8 @@ class AnnotationController:
         query = Label.delete().where(Label.label_type == label_type)
         query.execute()
         label_type.delete_instance()
+        label_types.invalidate()
+        self.gui.project_controller.increment_label_version()
 
     def add_subject(self, subject_name, subject_color, subject_size, subject_info):
         subject = Subject(name=subject_name, color=subject_color, size=subject_size, extra_info=subject_info)
@@ -1,6 +1,8 @@
 import datetime as dt
 from typing import Optional, List
 
+import numpy as np
+import pandas as pd
 import pytz
 from PyQt5.QtWidgets import QMessageBox
 from matplotlib.backend_bases import MouseButton
@@ -8,9 +10,11 @@ from matplotlib.dates import date2num, num2date
 from pandas.core.dtypes.common import is_numeric_dtype
 from peewee import DoesNotExist
 
-from constants import ABSOLUTE_DATETIME
-from database.models import LabelType, Label
+from database.label_type_registry import label_types
+from database.models import Label
+from date_utils import utc_ns_to_datetime64, NAT_NS
 from gui.dialogs.label_dialog import LabelDialog
+from instrumentation import traced
 
 LABEL_START_TIME_INDEX = 0
 LABEL_END_TIME_INDEX = 1
@@ -24,6 +28,11 @@ DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 QDATETIME_FORMAT = "yyyy-MM-dd HH:mm:ss.zzz"
 
 
+def _plotted_rows(plot_controller, *args, **kwargs) -> Optional[int]:
+    df = plot_controller.sensor_controller.df
+    return len(df) if df is not None else None
+
+
 class PlotController:
 
     def __init__(self, gui):
@@ -138,6 +147,16 @@ class PlotController:
         else:
             return ""
 
+    def show_placeholder(self, text: str) -> None:
+        """
+        Clear the graph and show a message in its place, e.g. while the sensor data is loading.
+        """
+        self.data_plot = None
+        self.x_min_dt = None
+        self.gui.figure.clear()
+        self.gui.figure.text(0.5, 0.5, text, horizontalalignment='center', verticalalignment='center', color='gray')
+        self.gui.canvas.draw()
+
     def set_current_plot(self, function_name: str):
         """
         Test if this column has numeric values. If so, set it as the new plot.
@@ -170,6 +189,7 @@ class PlotController:
         self.project_controller.set_setting('plot_height_factor', value)
         self.plot_height_factor = value
 
+    @traced('plot.update_plot_axis', rows=_plotted_rows, category='gui')
     def update_plot_axis(self, position=-1.0):
         """
         Every time the timer calls this function, the axis of the graph is updated.
@@ -198,19 +218,26 @@ class PlotController:
         self.vertical_line.set_xdata((x_min + x_max) / 2)
         self.gui.canvas.draw()
 
+    @traced('plot.draw_graph', rows=_plotted_rows, category='gui')
     def draw_graph(self):
         """
         Redraws the graph with the right colors, labels, etc.
         """
-        if self.sensor_controller.sensor_data is None or self.current_plot is None or self.data_plot is None:
+        if self.sensor_controller.sensor_data is None or self.sensor_controller.df is None or \
+                self.current_plot is None or self.data_plot is None:
             return
 
         # Clear the plot
         self.data_plot.clear()
 
+        # The data is plotted in UTC, only the ticks of the axis are shown in the project timezone
+        utc_ns = self.sensor_controller.sensor_data.utc_ns
+        times = date2num(utc_ns_to_datetime64(utc_ns))
+
         # Get the boundaries of the plot axis
-        self.x_min_dt = self.sensor_controller.df[ABSOLUTE_DATETIME].min()
-        self.x_max_dt = self.sensor_controller.df[ABSOLUTE_DATETIME].max()
+        valid = utc_ns[utc_ns != NAT_NS]
+        self.x_min_dt = pd.Timestamp(valid.min(), tz=pytz.utc).tz_convert(self.project_timezone)
+        self.x_max_dt = pd.Timestamp(valid.max(), tz=pytz.utc).tz_convert(self.project_timezone)
         self.x_min = date2num(self.x_min_dt)
         self.x_max = date2num(self.x_max_dt)
         if self.x_min == self.x_max:
@@ -227,19 +254,19 @@ class PlotController:
 
         # Plot the graph
         self.data_plot.plot(
-            self.sensor_controller.df[ABSOLUTE_DATETIME],
-            self.sensor_controller.df[self.current_plot],
+            *self.break_at_gaps(times, self.sensor_controller.df[self.current_plot].to_numpy(dtype=float)),
             ',-',
             linewidth=1,
             color='black'
         )
+        self.data_plot.xaxis_date(tz=self.project_timezone)
 
         # Draw a red vertical line in the middle of the plot
         self.vertical_line = self.data_plot.axvline(x=0)
         self.vertical_line.set_color('red')
 
         # Add label types to dictionary
-        for label_type in LabelType.select():
+        for label_type in label_types.all():
             self.label_types[label_type.id] = {label_type.activity, label_type.color}
 
         # Get labels and add to plot
@@ -251,8 +278,16 @@ class PlotController:
 
         self.gui.canvas.draw()
 
+    def break_at_gaps(self, times: np.ndarray, values: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        :return: The times and values with a missing value at every gap in the sensor data, so that the line of the
+            graph is not drawn across the gaps
+        """
+        gaps = self.sensor_controller.sensor_data.sampling_index.firsts[1:]
+        return np.insert(times, gaps, np.nan), np.insert(values, gaps, np.nan)
+
     def add_label_highlight(self, label_start: dt.datetime, label_end: dt.datetime, label_type_id: int):
-        label_type = LabelType.get_by_id(label_type_id)
+        label_type = label_types.get_by_id(label_type_id)
         label_start_num = date2num(label_start)
         label_end_num = date2num(label_end)
         alpha = self.project_controller.get_setting('label_opacity') / 100
@@ -270,12 +305,37 @@ class PlotController:
         )
         self.highlights[label_start] = (span, text)
 
+    def add_suggestion_highlight(self, label_start: dt.datetime, label_end: dt.datetime, activity: str):
+        """
+        Highlights a suggested label. Unlike label highlights, it is not stored, the caller removes it.
+
+        :return: The span and the text of the highlight
+        """
+        label_type = label_types.get_by_activity(activity)
+        label_start_num = date2num(label_start)
+        label_end_num = date2num(label_end)
+        span = self.data_plot.axvspan(
+            label_start_num,
+            label_end_num,
+            facecolor=label_type.color if label_type is not None else 'grey',
+            alpha=0.25,
+            hatch='//'
+        )
+        text = self.data_plot.text(
+            (label_start_num + label_end_num) / 2,
+            self.y_max * 0.75,
+            activity + '?',
+            horizontalalignment='center'
+        )
+        return span, text
+
     def show_label_dialog(self, datetime1: dt.datetime, datetime2: dt.datetime, shortcut):
         self.label_dialog = LabelDialog(self.sensor_controller)
         self.label_dialog.set_times(datetime1, datetime2)
         self.label_dialog.show_dialog(shortcut)
 
         if self.label_dialog.is_accepted:
+            self.gui.project_controller.increment_label_version()
             self.add_label_highlight(
                 self.label_dialog.label.start_time,
                 self.label_dialog.label.end_time,
@@ -283,6 +343,16 @@ class PlotController:
             )
             self.gui.canvas.draw()
 
+    def get_shortcut_label_type_id(self) -> Optional[int]:
+        """
+        :return: The id of the label type whose keyboard shortcut is currently held down, or None.
+        """
+        if not self.gui.current_key_pressed:
+            return None
+
+        label_type = label_types.get_by_shortcut(self.gui.current_key_pressed)
+        return label_type.id if label_type is not None else None
+
     def on_plot_click(self, event):
         """
         Handles the labeling by clicking on the graph.
@@ -302,10 +372,7 @@ class PlotController:
             self.on_click_datetime = datetime
         elif event.button == MouseButton.RIGHT:
             # Right mouse button clicked for second time
-            if self.gui.current_key_pressed:
-                label_shortcut = (LabelType.get(LabelType.keyboard_shortcut == self.gui.current_key_pressed)).id
-            else:
-                label_shortcut = None
+            label_shortcut = self.get_shortcut_label_type_id()
 
             self.show_label_dialog(self.on_click_datetime, datetime, label_shortcut)
             self.on_click_datetime = None
@@ -333,13 +400,7 @@ class PlotController:
                     # print(e)
                     pass
             else:
-                if self.gui.current_key_pressed:
-                    try:
-                        label_shortcut = LabelType.get(LabelType.keyboard_shortcut == self.gui.current_key_pressed).id
-                    except DoesNotExist:
-                        label_shortcut = None
-                else:
-                    label_shortcut = None
+                label_shortcut = self.get_shortcut_label_type_id()
 
                 # If on_click_datetime was never set (clicking outside of table) skip
                 if self.on_click_datetime is None: return
@@ -354,6 +415,7 @@ class PlotController:
                                      QMessageBox.Yes, QMessageBox.No)
         if reply == QMessageBox.Yes:
             label.delete_instance()
+            self.gui.project_controller.increment_label_version()
 
             # Remove label highlight and text from plot
             self.highlights[label.start_time][0].remove()
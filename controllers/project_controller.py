@@ -1,16 +1,19 @@
-import json
+import copy
 import sys
 from pathlib import Path
 from typing import Any
 from os import getenv
 
-from PyQt5.QtWidgets import QFileDialog
-
 from constants import PROJECT_CONFIG_FILE, PREVIOUS_SENSOR_DATA_FILE, PLOT_HEIGHT_FACTOR, PROJECT_DATABASE_FILE, \
-    PREVIOUS_PROJECT_DIR, PROJECTS, APP_CONFIG_FILE, PROJECT_NAME, PROJECT_DIR
+    PREVIOUS_PROJECT_DIR, PROJECTS, APP_CONFIG_FILE, PROJECT_NAME, PROJECT_DIR, LABEL_VERSION, MODEL_CACHE_DIR, \
+    FEATURE_STORE_DIR, INSTRUMENTATION, TRACE_FILE, PARSED_DATA_CACHE_DIR, SENSOR_DATA_CACHE_SIZE
+import instrumentation
+from controllers.settings_store import SettingsStore
+from data_import.sensor_data_cache import sensor_data_cache
 from database.models import db, Label, LabelType, Camera, Video, Sensor, SensorModel, SensorDataFile, \
-    SubjectMapping, Subject, Offset
+    SubjectMapping, Subject, Offset, FileFingerprint
 from database import migrator
+from database.label_type_registry import label_types
 
 INIT_PROJECT_CONFIG = {
     'subj_map': {},
@@ -20,7 +23,8 @@ INIT_PROJECT_CONFIG = {
     'plot_width': 20,
     'timezone': 'UTC',
     PLOT_HEIGHT_FACTOR: 1.0,
-    PREVIOUS_SENSOR_DATA_FILE: ""
+    PREVIOUS_SENSOR_DATA_FILE: "",
+    LABEL_VERSION: 0
 }
 
 INIT_APP_CONFIG = {
@@ -38,16 +42,27 @@ class ProjectController:
         self.project_dir = None
         self.project_config_file = None
         self.database_file = None
-        self.settings_dict = {}
+        self.settings_store = SettingsStore()
         self.settings_changed = False
 
+    @property
+    def settings_dict(self) -> dict:
+        return self.settings_store.settings
+
+    @settings_dict.setter
+    def settings_dict(self, settings: dict) -> None:
+        self.settings_store.settings = settings
+
     def load_or_create(self, project_dir, new_project=False):
         if project_dir is not None:
+            # Make sure pending changes end up in the settings file of the previous project.
+            self.settings_store.flush()
+
             self.project_dir = project_dir
             self.project_config_file = project_dir.joinpath(PROJECT_CONFIG_FILE)
             self.database_file = project_dir.joinpath(PROJECT_DATABASE_FILE)
 
-            self.settings_dict = {}
+            self.settings_store = SettingsStore(self.project_config_file)
             self.settings_changed = False
         if new_project or not self.project_config_file.is_file():
             self.create_project_directory()
@@ -56,6 +71,11 @@ class ProjectController:
 
         self.init_db()
 
+        # Record the stages of the application when enabled with the 'instrumentation' setting.
+        instrumentation.apply_setting(bool(self.get_setting(INSTRUMENTATION)))
+        # The memory budget of parsed sensor data in megabytes, the default budget if not set.
+        sensor_data_cache.resize(self.get_setting(SENSOR_DATA_CACHE_SIZE))
+
     def init_db(self):
         db.init(self.database_file)
         db.connect()
@@ -65,15 +85,37 @@ class ProjectController:
 
         db.create_tables(
             [Label, LabelType, Camera, Video, Sensor, SensorModel, SensorDataFile, SubjectMapping, Subject,
-             Offset])
+             Offset, FileFingerprint])
+
+        # Databases created by older versions lack the metadata cache columns of videos.
+        migrator.add_missing_columns(Video)
+
+        # The label types that were cached belong to the previously opened database.
+        label_types.invalidate()
+        sensor_data_cache.clear()
 
-    @staticmethod
-    def close_db():
+    def close_db(self):
+        self.flush_settings()
+        self.dump_trace()
         db.close()
 
+    def dump_trace(self) -> None:
+        """
+        Writes the recorded stages to the trace file in the project directory, if instrumentation is enabled with the
+        project setting.
+        """
+        if self.project_dir is not None and self.get_setting(INSTRUMENTATION) and instrumentation.tracer.spans():
+            instrumentation.tracer.dump(self.project_dir.joinpath(TRACE_FILE))
+
+    def flush_settings(self) -> None:
+        """Write pending setting changes to the project configuration file."""
+        self.settings_store.flush()
+
     def create_new_project(self, new_project_name, new_project_dir=None):
         if new_project_name is not None:
             if new_project_dir is None:
+                # Imported here, so that projects can be opened without the GUI
+                from PyQt5.QtWidgets import QFileDialog
                 new_project_dir = QFileDialog.getExistingDirectory(
                     self.gui,
                     caption="Select new project directory. A folder will be created.",
@@ -113,31 +155,29 @@ class ProjectController:
             self.project_dir.mkdir(parents=True, exist_ok=True)
 
         # Create new settings_dict dictionary
-        self.settings_dict = INIT_PROJECT_CONFIG
+        self.settings_dict = copy.deepcopy(INIT_PROJECT_CONFIG)
         self.save()
 
     def load_project_config(self):
         """Loads the saved setting dictionary back into this class from a file"""
-        with self.project_config_file.open(mode='r') as f:
-            self.settings_dict = json.load(f)
-            # self.load_timezone()
+        self.settings_store.load()
 
     def save(self) -> None:
         """Saves the current settings_dict dictionary to a file"""
-        with self.project_config_file.open(mode='w') as f:
-            json.dump(self.settings_dict, f)
+        self.settings_store.save_now()
         self.settings_changed = True
 
     def set_setting(self, setting: str, new_value: Any) -> None:
         """
-        Adds or changes a setting with the given name.
+        Adds or changes a setting with the given name. The change is visible immediately, but the project
+        configuration file is only written after a short delay, so that rapid changes result in a single write.
 
         :param setting: The project setting to change
         :param new_value: The value the setting should get
         """
 
-        self.settings_dict[setting] = new_value
-        self.save()
+        self.settings_store.set(setting, new_value)
+        self.settings_changed = True
 
     def get_setting(self, setting: str) -> Any:
         """
@@ -146,4 +186,32 @@ class ProjectController:
         :param setting: The setting to retrieve
         :return: The value of the setting, or None if the setting is unknown
         """
-        return self.settings_dict.get(setting)
+        return self.settings_store.get(setting)
+
+    def get_label_version(self) -> int:
+        """
+        Returns the label version of the project, a counter that is incremented every time labels are added, changed
+        or removed.
+        """
+        return self.get_setting(LABEL_VERSION) or 0
+
+    def increment_label_version(self) -> None:
+        self.set_setting(LABEL_VERSION, self.get_label_version() + 1)
+
+    def get_model_cache_dir(self) -> Path:
+        """
+        Returns the directory where trained classifiers are cached.
+        """
+        return self.project_dir.joinpath(MODEL_CACHE_DIR)
+
+    def get_feature_store_dir(self) -> Path:
+        """
+        Returns the directory where windowed features are stored.
+        """
+        return self.project_dir.joinpath(FEATURE_STORE_DIR)
+
+    def get_parsed_data_cache_dir(self) -> Path:
+        """
+        Returns the directory where parsed sensor data is cached.
+        """
+        return self.project_dir.joinpath(PARSED_DATA_CACHE_DIR)
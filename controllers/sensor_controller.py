@@ -1,23 +1,81 @@
 import datetime as dt
 import hashlib
+import itertools
+import json
 import ntpath
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 # import PyQt5
 import pandas as pd
 import pytz
-from PyQt5.QtCore import QDir
+from PyQt5.QtCore import QDir, QObject, QThread, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import QFileDialog, QMessageBox, qApp
 from peewee import DoesNotExist, JOIN, PeeweeException
 
 from constants import PREVIOUS_SENSOR_DATA_FILE
+from core.ingest import LoadResult, load_sensor_data, open_sensor_data
+from data_import import bulk_import
+from data_import.import_exception import ImportException
+from data_import.parsed_data_cache import ParsedDataCache, column_settings
 from data_import.sensor_data import SensorData
-from database.models import SensorDataFile, SensorModel, Sensor, Camera, Offset, Label, LabelType, SubjectMapping, Subject
+from database.models import SensorDataFile, SensorModel, Sensor, Camera, Offset, SubjectMapping, Subject
 from date_utils import naive_to_utc
+from exceptions import SensorDoesNotExist, SensorModelDoesNotExist
+from file_fingerprint import get_fingerprint
 import datetime
 
+_load_generations = itertools.count(1)
+"""Identifies every load of sensor data on a worker thread, so that results of earlier loads are recognized."""
+
+_loaders: Dict[QThread, 'SensorDataLoader'] = {}
+"""The worker threads that are loading sensor data, kept until they finish."""
+
+
+class SensorDataLoader(QObject):
+    """
+    Loads sensor data on a worker thread, see `load_sensor_data`. The loading code does not use Qt, errors are raised
+    and reported with the `failed` signal, so that dialogs are only shown on the GUI thread.
+    """
+    loaded = pyqtSignal(object, int)
+    failed = pyqtSignal(str, int)
+    finished = pyqtSignal()
+
+    def __init__(self, sensor_data: SensorData, formulas: Dict[str, str], cache: Optional[ParsedDataCache],
+                 cache_key: str, fingerprint: str, generation: int):
+        super().__init__()
+        self.sensor_data = sensor_data
+        self.formulas = dict(formulas)
+        self.cache = cache
+        self.cache_key = cache_key
+        self.fingerprint = fingerprint
+        """The fingerprint of the file, so that the worker does not use the database."""
+        self.generation = generation
+        self.aborted = False
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = load_sensor_data(self.sensor_data, self.formulas, self.cache, self.cache_key,
+                                      self.fingerprint)
+            if not self.aborted:
+                self.loaded.emit(result, self.generation)
+        except ImportException as e:
+            if not self.aborted:
+                self.failed.emit(e.describe(), self.generation)
+        except Exception as e:
+            if not self.aborted:
+                self.failed.emit(str(e), self.generation)
+        finally:
+            self.finished.emit()
+
+    def abort(self):
+        """
+        Discard the result. Parsing cannot be interrupted, so the worker finishes first.
+        """
+        self.aborted = True
+
 
 class SensorController:
     """
@@ -43,6 +101,10 @@ class SensorController:
         self.model_id: Optional[int] = None
         """ The model ID. """
         self.sensor_data_file = None
+        self.loader: Optional[SensorDataLoader] = None
+        """ The worker that is loading sensor data, if any. """
+        self.load_generation: Optional[int] = None
+        """ The generation of the load whose result is waited for. """
 
     def open_previous_file(self) -> None:
         """
@@ -55,9 +117,11 @@ class SensorController:
 
             if previous_path.is_file():
                 self.file_path = previous_path
-                self.open_file()
+                # Restore the session on a worker thread, so that the window stays responsive
+                self.open_file(background=not self.gui.testing)
 
-                if hasattr(self.gui, 'video_controller') and self.gui.video_controller.project_dt is not None:
+                if self.df is not None and hasattr(self.gui, 'video_controller') \
+                        and self.gui.video_controller.project_dt is not None:
                     self.gui.video_controller.set_position(0)
 
     def prompt_file(self) -> None:
@@ -80,6 +144,52 @@ class SensorController:
         self.open_file(Path(self.file_path))
         self.gui.plot_controller.draw_graph()
 
+    def prompt_directory(self) -> None:
+        """
+        Open a directory dialog that lets the user select a directory of sensor data files to import.
+        """
+        path = self.project_controller.get_setting(PREVIOUS_SENSOR_DATA_FILE)
+        path = path.rsplit('/', 1)[0] if path else QDir.homePath()
+
+        directory = QFileDialog.getExistingDirectory(self.gui, "Import Sensor Data Folder", path)
+
+        if directory:
+            self.import_directory(Path(directory))
+
+    def import_directory(self, directory: Path) -> Optional[bulk_import.BulkImportResult]:
+        """
+        Register all sensor data files in `directory` and its subdirectories, without loading their data. The sensor
+        model of the files is asked once.
+
+        :param directory: The directory that contains the sensor data files
+        :return: Which files were added, skipped or failed, or None if no sensor model was selected
+        """
+        sensor_model_id = self.open_sensor_model_dialog()
+
+        if sensor_model_id is None:
+            return None
+
+        def show_progress(done: int, total: int):
+            self.gui.label_sensor_data_filename.setText(f"Importing \"{directory.name}\" ({done}/{total})...")
+            qApp.processEvents()
+
+        result = bulk_import.import_directory(directory, SensorModel.get_by_id(sensor_model_id),
+                                              progress=show_progress)
+
+        self.gui.label_sensor_data_filename.setText(self.file_path.as_posix() if self.file_path else "")
+
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Warning if result.failed else QMessageBox.Information)
+        msg.setWindowTitle("Sensor data imported")
+        msg.setText(f"{len(result.added)} sensor data files were added, {len(result.skipped)} files were already "
+                    f"part of the project and {len(result.failed)} files could not be read.")
+        if result.failed:
+            msg.setDetailedText("\n".join(f"{path}: {error}" for path, error in result.failed))
+        msg.setStandardButtons(QMessageBox.Ok)
+        msg.exec()
+
+        return result
+
     @staticmethod
     def add_sensor(name: str, sensor_model: SensorModel, timezone: pytz.timezone = None) -> Sensor:
         """
@@ -219,156 +329,288 @@ class SensorController:
         self.file_name = ntpath.basename(self.file_path.as_posix())
         self.file_id_hash = self.create_file_id(self.file_path)
 
+        sdf = SensorDataFile.get_or_none(SensorDataFile.file_id_hash == self.file_id_hash)
+
+        if sdf is None:
+            # The file may have been registered with the previous file ID scheme, in which case the ID is updated.
+            legacy_file_id_hash = self.create_legacy_file_id(self.file_path)
+
+            if legacy_file_id_hash is not None:
+                sdf = SensorDataFile.get_or_none(SensorDataFile.file_id_hash == legacy_file_id_hash)
+
+                if sdf is not None:
+                    sdf.file_id_hash = self.file_id_hash
+                    sdf.save()
+
         # Get or create the sensor data file model instance
-        sdf = SensorDataFile.get_or_create(
-            file_id_hash=self.file_id_hash,
-            defaults={
-                'file_name': self.file_name,
-                'file_path': self.file_path,
-                'sensor': -1,
-            }
-        )[0]
+        if sdf is None:
+            sdf = SensorDataFile.get_or_create(
+                file_id_hash=self.file_id_hash,
+                defaults={
+                    'file_name': self.file_name,
+                    'file_path': self.file_path,
+                    'sensor': -1,
+                }
+            )[0]
 
         return sdf
 
-    def open_file(self, file_path: Path = None) -> None:
+    def open_file(self, file_path: Path = None, background: bool = False) -> None:
         """
         Open the file specified and load the sensor data from the file.
+
+        :param file_path: The sensor data file, the current file if None
+        :param background: Whether to load the sensor data on a worker thread. The plot shows a placeholder until the
+            data is attached.
+        """
+        self.cancel_loading()
+
+        sensor_data = self.resolve_file(file_path)
+        if sensor_data is None:
+            return
+
+        formulas = self.project_controller.get_setting('formulas')
+
+        if background:
+            self.start_loading(sensor_data, formulas)
+            return
+
+        try:
+            result = load_sensor_data(sensor_data, formulas, self.get_parsed_data_cache(),
+                                      self.get_parsed_data_key(sensor_data, formulas), self.file_id_hash)
+        except ImportException as e:
+            from gui.dialogs.import_error_message import show_import_error
+            show_import_error(self.gui, e)
+            return
+
+        self.attach_sensor_data(result)
+
+    def resolve_file(self, file_path: Path = None) -> Optional[SensorData]:
         """
+        Find the sensor data file in the database and resolve its sensor model and sensor, asking the user when they
+        are unknown. The data itself is not parsed yet.
 
+        :param file_path: The sensor data file, the current file if None
+        :return: The SensorData object of the file, or None if the file cannot be opened
+        """
         if file_path is not None:
             self.file_path = file_path
 
-        if self.file_path and self.file_path.is_file():
+        if not self.file_path or not self.file_path.is_file():
+            return None
+
+        self.gui.label_sensor_data_filename.setText(f"Loading \"{self.file_path.name}\"...")
+        qApp.processEvents()  # Force GUI to refresh to show loading text before loading the sensor data file.
 
-            self.gui.label_sensor_data_filename.setText(f"Loading \"{self.file_path.name}\"...")
-            qApp.processEvents()  # Force GUI to refresh to show loading text before loading the sensor data file.
+        # Store the selected file path in the configuration
+        self.project_controller.set_setting(PREVIOUS_SENSOR_DATA_FILE, self.file_path.as_posix())
 
-            # Store the selected file path in the configuration
-            self.project_controller.set_setting(PREVIOUS_SENSOR_DATA_FILE, self.file_path.as_posix())
+        self.sensor_data_file = self.get_or_create_sdf(self.file_path)
 
-            self.sensor_data_file = self.get_or_create_sdf(self.file_path)
+        if type(self.sensor_data_file.datetime) == str:
+            self.sensor_data_file.datetime = dt.datetime.strptime(self.sensor_data_file.datetime,
+                                                                  "%Y-%m-%d %H:%M:%S.%f%z")
 
-            if type(self.sensor_data_file.datetime) == str:
-                self.sensor_data_file.datetime = dt.datetime.strptime(self.sensor_data_file.datetime,
-                                                                      "%Y-%m-%d %H:%M:%S.%f%z")
+        # Reset the dictionary that maps function names to functions
+        self.gui.plot_controller.formula_dict = dict()
 
-            # Reset the dictionary that maps function names to functions
-            self.gui.plot_controller.formula_dict = dict()
+        # Retrieve the sensor model ID from the database
+        try:
+            sensor_model = (SensorModel
+                            .select(SensorModel.id)
+                            .join(Sensor, JOIN.LEFT_OUTER)
+                            .where(SensorModel.id == self.sensor_data_file.sensor.model_id)
+                            .get())
+            sensor_model_id = sensor_model.id
+
+        # If not found, open a dialog where the user can select the sensor model
+        except DoesNotExist:
+            msg = QMessageBox()
+            msg.setWindowTitle("No sensor model selected")
+            msg.setIcon(QMessageBox.Warning)
+            msg.setText("While loading the (previously) selected sensor data file, no associated sensor model "
+                        "was found. Sensor data file:\n"
+                        f" {self.file_path}.\n\n"
+                        "Do you want to create/select one now?")
+            msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            msg.setEscapeButton(QMessageBox.No)
+            msg.setDefaultButton(QMessageBox.Yes)
+
+            return_val = msg.exec()
+            if return_val == QMessageBox.Yes:
+                sensor_model_id = self.open_sensor_model_dialog()
+            else:
+                return None
 
-            # Retrieve the sensor model ID from the database
+        if sensor_model_id is None:
+            return None
+
+        # Retrieve the SensorData object that parses the sensor data file
+        self.sensor_data = SensorData(self.project_controller, self.file_path, sensor_model_id)
+        # Try to load sensor name from either metadata or DB
+        if self.sensor_data.metadata.sensor_name:
+            sensor_name = self.sensor_data.metadata.sensor_name
+        else:
+            # Check if sensor data has been loaded before and name is known in DB
             try:
-                sensor_model = (SensorModel
-                                .select(SensorModel.id)
-                                .join(Sensor, JOIN.LEFT_OUTER)
-                                .where(SensorModel.id == self.sensor_data_file.sensor.model_id)
-                                .get())
-                sensor_model_id = sensor_model.id
-
-            # If not found, open a dialog where the user can select the sensor model
+                sensor_name = Sensor.get_by_id(self.sensor_data_file.sensor).name
             except DoesNotExist:
+                sensor_name = None
+                QMessageBox.warning(self.gui, "No associated sensor found",
+                                    "There is currently no sensor associated with the sensor data file. "
+                                    "Please select the sensor that should be associated with the "
+                                    f"sensor data file \"{self.sensor_data_file.file_path}\"")
+
+        # When sensor ID (name) cannot be parsed it has to be manually linked to datafile by user
+        while sensor_name is None:
+            self.gui.open_select_sensor_dialog()
+            sensor_name = self.sensor_data_file.sensor.name
+            # Verify that user indeed selected a sensor ID
+            if sensor_name is None:
                 msg = QMessageBox()
-                msg.setWindowTitle("No sensor model selected")
                 msg.setIcon(QMessageBox.Warning)
-                msg.setText("While loading the (previously) selected sensor data file, no associated sensor model "
-                            "was found. Sensor data file:\n"
-                            f" {self.file_path}.\n\n"
-                            "Do you want to create/select one now?")
-                msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                msg.setEscapeButton(QMessageBox.No)
-                msg.setDefaultButton(QMessageBox.Yes)
-
-                return_val = msg.exec()
-                if return_val == QMessageBox.Yes:
-                    sensor_model_id = self.open_sensor_model_dialog()
-                else:
-                    return
-
-            if sensor_model_id is None:
-                return
-
-            # Retrieve the SensorData object that parses the sensor data file
-            self.sensor_data = SensorData(self.project_controller, self.file_path, sensor_model_id)
-            # Try to load sensor name from either metadata or DB
-            if self.sensor_data.metadata.sensor_name:
-                sensor_name = self.sensor_data.metadata.sensor_name
-            else:
-                # Check if sensor data has been loaded before and name is known in DB
-                try:
-                    sensor_name = Sensor.get_by_id(self.sensor_data_file.sensor).name
-                except DoesNotExist:
-                    sensor_name = None
-                    QMessageBox.warning(self.gui, "No associated sensor found",
-                                        "There is currently no sensor associated with the sensor data file. "
-                                        "Please select the sensor that should be associated with the "
-                                        f"sensor data file \"{self.sensor_data_file.file_path}\"")
-
-            # When sensor ID (name) cannot be parsed it has to be manually linked to datafile by user
-            while sensor_name is None:
-                self.gui.open_select_sensor_dialog()
-                sensor_name = self.sensor_data_file.sensor.name
-                # Verify that user indeed selected a sensor ID
-                if sensor_name is None:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Warning)
-                    msg.setWindowTitle("Warning")
-                    msg.setText("A sensor ID must be selected")
-                    msg.setInformativeText("The selected sensor model states that sensor identifier (ID) cannot "
-                                           "be parsed from sensor datafile. Please select sensor ID manually.")
-                    msg.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
-                    response = msg.exec()
-                    if response == QMessageBox.Cancel:
-                        return
-
-            sensor = Sensor.get_or_create(name=sensor_name, defaults={'model': sensor_model_id})[0]
-
-            while sensor.timezone is None:
-                # Prompt user for timezone of sensor
-                from gui.dialogs.edit_sensor_dialog import EditSensorDialog
-                dialog = EditSensorDialog(self, sensor)
-                dialog.exec()
-
-            self.sensor_data.metadata.sensor_timezone = pytz.timezone(sensor.timezone)
-
-            self.sensor_data_file.sensor = sensor
-
-            # Parse the sensor data from the file
-            self.sensor_data.parse()
-
-            # Retrieve the formulas that are associated with this sensor data file, and store them in the dictionary
-            stored_formulas = self.project_controller.get_setting('formulas')
-
-            for formula_name in stored_formulas:
-                try:
-                    self.sensor_data.add_column_from_func(formula_name, stored_formulas[formula_name])
-                    self.gui.plot_controller.formula_dict[formula_name] = stored_formulas[formula_name]
-                except Exception as e:
-                    print(e)
-
-            # Parse the utc datetime of the sensor data from metadata when possible
-            # self.sensor_data.metadata.parse_datetime()
-            # self.gui.setCursor(.WaitCursor)
-            # Add absolute time column to dataframe
-            if not self.sensor_data.add_abs_dt_col():
-                return
-            # Save the starting time of the sensor data in a DateTime object
-            self.sensor_data_file.datetime = self.sensor_data.metadata.utc_dt.replace(tzinfo=None)
-
-            # Retrieve the DataFrame with all the raw sensor data
-            self.df = self.sensor_data.get_data()
-
-            # Update file path in DB if it has changed
-            if self.sensor_data_file.file_path != self.file_path.as_posix():
-                self.sensor_data_file.file_path = self.file_path.as_posix()
-                self.sensor_data_file.save()
-
-            # self.gui.setCursor(QtGui.QCursor(0))
-            self.init_functions()
-            self.gui.update_camera_sensor_offset()
-            self.gui.plot_controller.init_graph()
-            self.gui.plot_controller.draw_graph()
-            self.gui.video_controller.sync_with_sensor_data()
-            self.gui.label_sensor_data_filename.setText(self.file_path.as_posix())
+                msg.setWindowTitle("Warning")
+                msg.setText("A sensor ID must be selected")
+                msg.setInformativeText("The selected sensor model states that sensor identifier (ID) cannot "
+                                       "be parsed from sensor datafile. Please select sensor ID manually.")
+                msg.setStandardButtons(QMessageBox.Ok | QMessageBox.Cancel)
+                response = msg.exec()
+                if response == QMessageBox.Cancel:
+                    return None
+
+        sensor = Sensor.get_or_create(name=sensor_name, defaults={'model': sensor_model_id})[0]
+
+        while sensor.timezone is None:
+            # Prompt user for timezone of sensor
+            from gui.dialogs.edit_sensor_dialog import EditSensorDialog
+            dialog = EditSensorDialog(self, sensor)
+            dialog.exec()
+
+        self.sensor_data.metadata.sensor_timezone = pytz.timezone(sensor.timezone)
+
+        self.sensor_data_file.sensor = sensor
+
+        return self.sensor_data
+
+    def get_parsed_data_cache(self) -> Optional[ParsedDataCache]:
+        if self.project_controller.project_dir is None:
+            return None
+        return ParsedDataCache(self.project_controller.get_parsed_data_cache_dir())
+
+    def get_parsed_data_key(self, sensor_data: SensorData, formulas: dict) -> str:
+        """
+        :return: The key of the parsed data of `sensor_data` in the parsed data cache
+        """
+        return ParsedDataCache.key(self.file_id_hash, sensor_data.sensor_model.__data__,
+                                   sensor_data.metadata.sensor_timezone, sensor_data.project_timezone,
+                                   column_settings(self.project_controller.settings_dict), formulas)
+
+    def start_loading(self, sensor_data: SensorData, formulas: dict) -> None:
+        """
+        Load the sensor data on a worker thread. The data is attached when it is loaded, unless another file is
+        opened or loading is cancelled first.
+        """
+        self.load_generation = next(_load_generations)
+
+        worker = SensorDataLoader(sensor_data, formulas, self.get_parsed_data_cache(),
+                                  self.get_parsed_data_key(sensor_data, formulas), self.file_id_hash,
+                                  self.load_generation)
+        thread = QThread()
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        # The GUI receives the results, so that they are handled on the GUI thread
+        worker.loaded.connect(self.gui.sensor_data_loaded)
+        worker.failed.connect(self.gui.sensor_data_load_failed)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(lambda: _loaders.pop(thread, None))
+
+        # Keep the thread alive until it finished, also when loading is cancelled or the project is switched
+        _loaders[thread] = worker
+        self.loader = worker
+        thread.start()
+
+        self.df = None
+        self.gui.plot_controller.show_placeholder(f"Loading \"{self.file_path.name}\"...")
+        self.gui.set_sensor_data_loading(True)
+
+    def cancel_loading(self) -> None:
+        """
+        Stop waiting for the sensor data that is loaded on a worker thread. The worker finishes parsing, but its result
+        is discarded.
+        """
+        if self.loader is None:
+            return
+
+        self.loader.abort()
+        self.loader = None
+        self.load_generation = None
+
+        self.gui.set_sensor_data_loading(False)
+        self.gui.plot_controller.show_placeholder("Loading cancelled")
+        self.gui.label_sensor_data_filename.clear()
+
+    def finish_loading(self, result: 'LoadResult', generation: int) -> None:
+        """
+        Attach the sensor data that was loaded on a worker thread, if it is still the file that should be opened.
+        """
+        if generation != self.load_generation:
+            return
+
+        self.loader = None
+        self.load_generation = None
+        self.gui.set_sensor_data_loading(False)
+
+        if result is None:
+            self.gui.plot_controller.show_placeholder("The sensor data could not be loaded")
+            self.gui.label_sensor_data_filename.clear()
+            return
+
+        self.attach_sensor_data(result)
+
+        if self.gui.video_controller.project_dt is not None:
+            self.gui.video_controller.set_position(0)
+
+    def fail_loading(self, error: str, generation: int) -> None:
+        if generation != self.load_generation:
+            return
+
+        self.finish_loading(None, generation)
+        QMessageBox.critical(self.gui, "Could not load sensor data",
+                             f"The sensor data file \"{self.file_path}\" could not be loaded:\n\n{error}")
+
+    def attach_sensor_data(self, result: 'LoadResult') -> None:
+        """
+        Show the sensor data that was loaded: fill the list of functions, draw the graph and synchronize the video.
+        """
+        self.sensor_data = result.sensor_data
+
+        stored_formulas = self.project_controller.get_setting('formulas')
+        for formula_name in result.formulas:
+            self.gui.plot_controller.formula_dict[formula_name] = stored_formulas[formula_name]
+
+        # Save the starting time of the sensor data in a DateTime object
+        self.sensor_data_file.datetime = self.sensor_data.metadata.utc_dt.replace(tzinfo=None)
+
+        # Retrieve the DataFrame with all the raw sensor data
+        self.df = self.sensor_data.get_data()
+
+        # Update file path in DB if it has changed
+        if self.sensor_data_file.file_path != self.file_path.as_posix():
+            self.sensor_data_file.file_path = self.file_path.as_posix()
+            self.sensor_data_file.save()
+
+        self.init_functions()
+        self.gui.update_camera_sensor_offset()
+        self.gui.plot_controller.init_graph()
+        self.gui.plot_controller.draw_graph()
+        self.gui.video_controller.sync_with_sensor_data()
+        self.gui.label_sensor_data_filename.setText(self.file_path.as_posix())
+
+        if result.failed:
+            errors = '\n'.join(f"{name}: {error}" for name, error in result.failed.items())
+            QMessageBox.warning(self.gui, "Formulas could not be added",
+                                f"The following formulas could not be added to the sensor data:\n\n{errors}")
 
     def init_functions(self) -> None:
         """
@@ -390,6 +632,14 @@ class SensorController:
         else:
             self.gui.plot_controller.set_current_plot(self.gui.comboBox_functions.currentText())
 
+    def get_feature_file_id(self) -> str:
+        """
+        Identifies the data of the current sensor data file for the feature store: the fingerprint of the file
+        combined with the formulas, which define the values of the formula columns.
+        """
+        formulas = json.dumps(self.project_controller.get_setting('formulas'), sort_keys=True)
+        return self.file_id_hash + hashlib.md5(formulas.encode('utf-8')).hexdigest()
+
     def save_last_used_column(self, function_name) -> None:
         """
         Store the last function that was used in the sensor data file object for later reference.
@@ -448,63 +698,62 @@ class SensorController:
                 self.gui.doubleSpinBox_video_offset.setValue(0)
 
     @staticmethod
-    def create_file_id(file_path, block_size=256):
+    def create_file_id(file_path) -> str:
         """
-        Function that takes a file and returns the first 10 characters of a hash of
-        10 times block size in the middle of the file.
+        Get the ID of a file, which recognizes the file independent from its location on disk. The ID is a hash of
+        blocks sampled from the file plus the file size, see `file_fingerprint`. It is memoized in the project
+        database, so the file is only read again when its size or modification time changed.
 
-        :param file_path: File path as string
-        :param block_size:
-        :return: Hash of 10 blocks of 128 bits of size as string plus file size as string.
+        :param file_path: File path
+        :return: The ID of the file as string.
         """
+        return get_fingerprint(file_path)
 
+    @staticmethod
+    def create_legacy_file_id(file_path, block_size=256) -> Optional[str]:
+        """
+        File ID as it was created by previous versions: the first 9 characters of an MD5 hash of roughly 2 KB in the
+        middle of the file, read in text mode, followed by the file size. Only used to recognize files that were
+        registered by those versions.
+
+        :param file_path: File path
+        :param block_size: Number of characters per block
+        :return: The legacy ID as string, or None if the middle of the file could not be decoded.
+        """
         file_size = os.path.getsize(file_path)
         start_index = int(file_size / 2)
-        with file_path.open(mode='r') as f:
-            f.seek(start_index)
-            n = 1
-            md5 = hashlib.md5()
-            while True:
-                data = f.read(block_size)
-                n += 1
-                if n == 10:
-                    break
-                md5.update(data.encode('utf-8'))
+        try:
+            with file_path.open(mode='r') as f:
+                f.seek(start_index)
+                n = 1
+                md5 = hashlib.md5()
+                while True:
+                    data = f.read(block_size)
+                    n += 1
+                    if n == 10:
+                        break
+                    md5.update(data.encode('utf-8'))
+        except UnicodeDecodeError:
+            # Seeking in text mode can end up in the middle of a multibyte character.
+            return None
         return '{}{}'.format(md5.hexdigest()[0:9], str(file_size))
 
-    def get_sensor_data(self, sensor_data_file_id: int) -> SensorData:
+    def get_sensor_data(self, sensor_data_file_id: int) -> Optional[SensorData]:
         """
-        Get the sensor data from the sensor data file.
+        Get the sensor data from the sensor data file, asking the user for its location if it has moved.
 
         :param sensor_data_file_id: The id of the sensor data file instance containing the desired data
 
-        :return: A new SensorData instance containing the desired data
+        :return: A new SensorData instance containing the desired data, or None if the sensor model is unknown
+        :raises ImportException: If the data does not match the sensor model
         """
         file_path = self.get_file_path(sensor_data_file_id)
 
-        query = (SensorDataFile
-                 .select()
-                 .join(Sensor, JOIN.LEFT_OUTER)
-                 .join(SensorModel, JOIN.LEFT_OUTER)
-                 .where(SensorDataFile.id == sensor_data_file_id)
-                 .get()
-                 )
-
-        model_id = query.sensor.model.id
-        sensor_id = SensorDataFile.get_by_id(sensor_data_file_id).sensor.id
-
-        if model_id >= 0 and sensor_id >= 0:
-            sensor_timezone = pytz.timezone(Sensor.get_by_id(sensor_id).timezone)
-            sensor_data = SensorData(self.project_controller, Path(file_path), model_id)
-            sensor_data.metadata.sensor_timezone = sensor_timezone
-            # Parse the utc datetime of the sensor data
-            sensor_data.metadata.parse_datetime()
-            sensor_data.parse()
+        try:
+            return open_sensor_data(self.project_controller, sensor_data_file_id, Path(file_path))
         # Sensor model unknown
-        else:
-            sensor_data = None
-
-        return sensor_data
+        except (SensorDoesNotExist, SensorModelDoesNotExist):
+            return None
 
     def get_file_path(self, sensor_data_file_id: int) -> str:
         """
@@ -568,54 +817,3 @@ class SensorController:
                                                    name_suggestion + ".csv")
 
         return file_path
-
-
-def get_labels(sdf_id: int, start_dt: dt.datetime, end_dt: dt.datetime) -> list:
-    """
-    Get all the labels linked to the desired sensor data file within the specified interval.
-
-    :param sdf_id: The SensorDataFile id from which the labels should be retrieved.
-    :param start_dt: The start time of the interval
-    :param end_dt: The end time of the interval
-    :return: A list of dictionaries, each representing one annotation, containing the start time, end time, and activity
-    of that label
-    """
-
-    # The original query, where only the labels for sdf_id==1 were retrieved, even is sdf_id was actually 2.
-
-    # labels = (Label
-    #           .select(Label.start_time, Label.end_time, LabelType.activity)
-    #           .join(LabelType)
-    #           .where(Label.sensor_data_file == sdf_id & (Label.start_time.between(start_dt, end_dt) |
-    #                   Label.end_time.between(start_dt, end_dt))))
-
-    # labels = (Label
-    #           .select(Label.start_time, Label.end_time, LabelType.activity)
-    #           .join(LabelType)
-    #           .where(Label.sensor_data_file == ([bool(2)] & [Not None] |
-    #                   Label.end_time.between(start_dt, end_dt))))
-
-    # labels = (Label
-    #           .select(Label.start_time, Label.end_time, LabelType.activity)
-    #           .join(LabelType)
-    #           .where(Label.sensor_data_file == [True] |
-    #                   Label.end_time.between(start_dt, end_dt))))
-
-    # labels = (Label
-    #           .select(Label.start_time, Label.end_time, LabelType.activity)
-    #           .join(LabelType)
-    #           .where(Label.sensor_data_file == 1 |
-    #                   Label.end_time.between(start_dt, end_dt))))
-
-    # GEBRUIK HAAKJES!!!
-
-    labels = (Label
-              .select(Label.start_time, Label.end_time, LabelType.activity)
-              .join(LabelType)
-              .where((Label.sensor_data_file == sdf_id) &
-                     (Label.start_time.between(start_dt, end_dt) |
-                      Label.end_time.between(start_dt, end_dt))))
-
-    return [{'start': label.start_time,
-             'end': label.end_time,
-             'activity': label.label_type.activity} for label in labels]
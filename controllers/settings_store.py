@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+SAVE_DELAY = 0.5
+"""Number of seconds without changes after which pending settings are written to disk."""
+
+
+class SettingsStore:
+    """
+    Write-behind store for a JSON settings file.
+
+    Changes are applied to the in-memory dictionary immediately, while writing the file is postponed until no change
+    has been made for `delay` seconds. This coalesces bursts of changes (e.g. dragging a spin box) into a single write.
+    Files are written atomically by writing to a temporary file in the same directory and renaming it, so that a
+    crash during a write never leaves a truncated settings file behind.
+    """
+
+    def __init__(self, file_path: Optional[Path] = None, delay: float = SAVE_DELAY):
+        self.file_path = file_path
+        self.delay = delay
+        self.settings = {}
+
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._pending: Optional[str] = None
+        """The serialized settings that still have to be written, or None if the file is up to date."""
+
+    def load(self) -> None:
+        """Load the settings from the settings file, discarding any unsaved changes."""
+        with self._lock:
+            self._cancel_timer()
+            self._pending = None
+
+            with self.file_path.open(mode='r') as f:
+                self.settings = json.load(f)
+
+    def get(self, setting: str) -> Any:
+        return self.settings.get(setting)
+
+    def set(self, setting: str, new_value: Any) -> None:
+        """
+        Change a setting in memory and schedule the settings file to be written.
+
+        :param setting: The setting to change
+        :param new_value: The value the setting should get
+        """
+        self.settings[setting] = new_value
+        self.schedule_save()
+
+    def schedule_save(self) -> None:
+        """(Re)start the timer after which the current settings are written to disk."""
+        with self._lock:
+            # Serialize now, so that later in-place changes to nested values cannot race with the writing thread.
+            self._pending = json.dumps(self.settings)
+            self._cancel_timer()
+
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def save_now(self) -> None:
+        """Write the current settings to disk immediately."""
+        with self._lock:
+            self._pending = json.dumps(self.settings)
+        self.flush()
+
+    def flush(self) -> None:
+        """Write pending changes to disk, if there are any."""
+        with self._lock:
+            self._cancel_timer()
+
+            if self._pending is None or self.file_path is None:
+                return
+
+            self._write(self._pending)
+            self._pending = None
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _write(self, content: str) -> None:
+        directory = self.file_path.parent
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=self.file_path.name, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, mode='w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
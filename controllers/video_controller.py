@@ -14,6 +14,7 @@ from peewee import DoesNotExist
 import video_metadata
 from database.models import Video
 from date_utils import utc_to_local
+from file_fingerprint import get_fingerprint
 from gui.dialogs.project_settings_dialog import ProjectSettingsDialog
 from utils import ms_to_hms
 
@@ -25,6 +26,9 @@ class VideoController:
         self.project_controller = gui.project_controller
         self.file_name = None
         self.file_path = None
+        self.file_id_hash = None
+        self.metadata: Optional[dict] = None
+        """The metadata of the video, as returned by `video_metadata.read_video_metadata`."""
 
         self.video = None
         self.utc_dt: Optional[dt.datetime] = None
@@ -74,26 +78,28 @@ class VideoController:
             self.project_controller.set_setting('last_videofile', str(self.file_path))
 
             self.file_name = ntpath.basename(self.file_path)
+            self.file_id_hash = get_fingerprint(self.file_path)
+            self.metadata = None
+            self.video = self.find_video()
 
             # Check if a camera has already been set for this video
-            try:
-                camera_id = Video.get(Video.file_name == self.file_name).camera
-                self.gui.camera_controller.change_camera(camera_id)
-            except Video.DoesNotExist:  # No camera was found
+            if self.video is not None:
+                self.gui.camera_controller.change_camera(self.video.camera)
+            else:  # No camera was found
                 self.gui.open_select_camera_dialog()
 
             if self.gui.camera_controller.camera is not None:
                 self.update_datetime()
 
-                try:
-                    self.video = Video.get(Video.file_name == self.file_name)
+                if self.video is not None:
+                    self.video.file_name = self.file_name
                     self.video.file_path = self.file_path
                     self.video.save()
-                except DoesNotExist:
+                else:
                     # Video not yet in database
                     self.video = Video(file_name=self.file_name, file_path=self.file_path, datetime=self.utc_dt,
                                        camera=self.gui.camera_controller.camera.id)
-                    self.video.save()
+                    self.store_metadata()
 
                 self.gui.label_video_filename.setText(self.file_path.as_posix())
 
@@ -106,9 +112,56 @@ class VideoController:
                 self.pause()
                 self.unmute()
 
+    def find_video(self) -> Optional[Video]:
+        """
+        Finds the video that is currently opened in the database, by the fingerprint of the file or, for videos that
+        were added before fingerprints were stored, by its file name. A video with another fingerprint is a different
+        video with the same file name, e.g. a clip of a camera that numbers its files the same every day.
+        """
+        try:
+            return Video.get(Video.file_id_hash == self.file_id_hash)
+        except DoesNotExist:
+            pass
+
+        try:
+            return Video.get((Video.file_name == self.file_name) & Video.file_id_hash.is_null())
+        except DoesNotExist:
+            return None
+
+    def get_metadata(self) -> dict:
+        """
+        Returns the metadata of the opened video. The metadata stored with the video in the database is used as long as
+        the video file has not changed, otherwise it is read from the file.
+        """
+        if self.metadata is None:
+            if self.video is not None and self.video.file_id_hash == self.file_id_hash:
+                self.metadata = {
+                    'begin_time_tag': self.video.begin_time_tag,
+                    'frame_rate': self.video.frame_rate,
+                    'duration': self.video.duration,
+                    'camera_name': self.video.camera_name
+                }
+            else:
+                self.metadata = video_metadata.read_video_metadata(self.file_path)
+                self.store_metadata()
+
+        return self.metadata
+
+    def store_metadata(self):
+        """
+        Stores the metadata of the opened video with the video in the database.
+        """
+        if self.video is not None and self.metadata is not None:
+            self.video.file_id_hash = self.file_id_hash
+            self.video.begin_time_tag = self.metadata['begin_time_tag']
+            self.video.frame_rate = self.metadata['frame_rate']
+            self.video.duration = self.metadata['duration']
+            self.video.camera_name = self.metadata['camera_name']
+            self.video.save()
+
     def update_datetime(self):
         timezone = pytz.timezone(self.gui.camera_controller.camera.timezone)
-        self.utc_dt = video_metadata.parse_video_begin_time(self.file_path, timezone) + \
+        self.utc_dt = video_metadata.parse_begin_time_tag(self.get_metadata()['begin_time_tag'], timezone) + \
                       dt.timedelta(hours=self.gui.camera_controller.camera.manual_offset)
         self.update_timezone()
         self.update_labels_datetime()
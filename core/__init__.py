@@ -0,0 +1,13 @@
+"""
+Processing of sensor data without the GUI.
+
+The functions in this package only use the database and the project settings, and raise exceptions instead of showing
+dialogs, so that they can run on worker threads, in worker processes and in batch runs on a server. The GUI is a client
+of this package that asks the user for the missing information and shows the errors. The windowing functions are in
+`data_export.windowing`, which does not depend on the GUI either.
+"""
+from core.alignment import AlignmentSource, SensorAlignment, open_subject_sources, write_alignment, \
+    export_aligned_subject
+from core.export import ExportCancelled, find_subject_files, prepare_sensor_data, write_export, export_subject
+from core.ingest import LoadResult, load_sensor_data, open_sensor_data, parse_sensor_data
+from core.labels import get_labels
@@ -0,0 +1,316 @@
+"""
+Alignment of the sensor data of several sensors on a common time base.
+
+The sensors of a subject are sampled at different rates and their clocks can be off, so their rows cannot simply be
+put next to each other. The alignment resamples every sensor onto one grid of times with a fixed rate: numeric columns
+are interpolated linearly between the samples around a grid time, other columns, like the labels, take the value of
+the nearest sample. Grid times in a gap of a sensor, where its samples are further apart than `GAP_FACTOR` times its
+usual interval, are left empty. The offsets between the sensors and a camera are applied first, so that all sensors
+are in the time of the camera.
+
+The aligned data is produced in blocks of grid rows, so that the output of long recordings does not have to fit in
+memory at once.
+"""
+import datetime as dt
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from constants import ABSOLUTE_DATETIME
+from core.export import ExportCancelled, find_subject_files
+from core.ingest import open_sensor_data
+from core.labels import get_labels
+from database.models import Offset, SensorDataFile, Sensor
+from date_utils import to_utc_ns, NAT_NS
+from instrumentation import span
+
+LINEAR = 'linear'
+NEAREST = 'nearest'
+
+BLOCK_ROWS = 100000
+"""The number of grid rows that are aligned at once."""
+
+GAP_FACTOR = 2
+"""Samples that are further apart than this many times the median interval of the sensor are on both sides of a gap."""
+
+SECOND = 10 ** 9
+
+
+class AlignmentSource:
+
+    def __init__(self, name: str, utc_ns: np.ndarray, df: pd.DataFrame, offset: float = 0.0,
+                 monotonic: bool = None):
+        """
+        :param name: The name of the sensor, the aligned columns are named '<name>_<column>'
+        :param utc_ns: The time of every row as nanoseconds since the epoch in UTC, see `SensorData.utc_ns`
+        :param df: The columns to align. The rows are used by position, the DataFrame is not copied if the times are
+            sorted.
+        :param offset: The offset of the sensor to the camera in seconds, which is added to its times
+        :param monotonic: Whether the times are sorted and none is missing, see `SamplingIndex.monotonic`. It is
+            checked if None.
+        """
+        if monotonic is None:
+            monotonic = bool(np.all(utc_ns != NAT_NS)) and bool(np.all(np.diff(utc_ns) >= 0))
+
+        self.name = name
+
+        if monotonic:
+            self.times = utc_ns + int(round(offset * SECOND))
+            self.df = df
+        else:
+            valid = utc_ns != NAT_NS
+            order = np.argsort(utc_ns[valid], kind='stable')
+            self.times = utc_ns[valid][order] + int(round(offset * SECOND))
+            self.df = df[valid].iloc[order].reset_index(drop=True)
+
+        intervals = np.diff(self.times)
+        intervals = intervals[intervals > 0]
+        self.max_gap = int(GAP_FACTOR * np.median(intervals)) if len(intervals) else 0
+        """The largest interval between two samples that is interpolated, in nanoseconds."""
+
+    @property
+    def start(self) -> Optional[int]:
+        return int(self.times[0]) if len(self.times) else None
+
+    @property
+    def end(self) -> Optional[int]:
+        return int(self.times[-1]) if len(self.times) else None
+
+    def resample(self, grid: np.ndarray, method: str = LINEAR) -> pd.DataFrame:
+        """
+        :param grid: The sorted grid times in nanoseconds since the epoch in UTC
+        :param method: `LINEAR` to interpolate the numeric columns, or `NEAREST` to use the nearest sample for all
+            columns
+        :return: The values of the columns at the grid times, missing in the gaps of the sensor
+        """
+        columns = {column: f"{self.name}_{column}" for column in self.df.columns}
+
+        if len(grid) == 0:
+            return pd.DataFrame(columns=list(columns.values()))
+
+        # Only the samples around the block are used
+        lo = np.searchsorted(self.times, grid[0] - self.max_gap, side='left')
+        hi = np.searchsorted(self.times, grid[-1] + self.max_gap, side='right')
+        times = self.times[lo:hi]
+        df = self.df.iloc[lo:hi]
+
+        resampled = pd.DataFrame(index=pd.RangeIndex(len(grid)))
+        interpolated = []
+
+        if method == LINEAR and len(times) > 0:
+            interpolated = [column for column in df.columns if pd.api.types.is_numeric_dtype(df[column].dtype)]
+            valid = self._interpolated_rows(times, grid)
+            # Relative to the block, so that the float64 times keep their nanoseconds
+            x = (grid - grid[0]).astype(np.float64)
+            xp = (times - grid[0]).astype(np.float64)
+
+            for column in interpolated:
+                values = np.interp(x, xp, df[column].to_numpy(dtype=np.float64))
+                values[~valid] = np.nan
+                resampled[columns[column]] = values
+
+        nearest = [column for column in df.columns if column not in interpolated]
+        if nearest:
+            samples = df[nearest].assign(**{ABSOLUTE_DATETIME: times})
+            merged = pd.merge_asof(pd.DataFrame({ABSOLUTE_DATETIME: grid}), samples, on=ABSOLUTE_DATETIME,
+                                   direction='nearest', tolerance=max(self.max_gap // 2, 1))
+            for column in nearest:
+                resampled[columns[column]] = merged[column].to_numpy()
+
+        return resampled[[columns[column] for column in self.df.columns]]
+
+    def _interpolated_rows(self, times: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        """
+        :return: Whether the grid times are at a sample, or between two samples that are not separated by a gap
+        """
+        after = np.searchsorted(times, grid, side='right')
+        before = after - 1
+
+        inside = (before >= 0) & (after < len(times))
+        at_sample = (before >= 0) & (times[np.maximum(before, 0)] == grid)
+        interval = times[np.minimum(after, len(times) - 1)] - times[np.maximum(before, 0)]
+
+        return at_sample | (inside & (interval <= self.max_gap))
+
+
+class SensorAlignment:
+
+    def __init__(self, sources: List[AlignmentSource], rate: float, start_ns: int = None, end_ns: int = None,
+                 method: str = LINEAR, timezone=pytz.utc, block_rows: int = BLOCK_ROWS):
+        """
+        :param sources: The sensors to align
+        :param rate: The number of grid rows per second
+        :param start_ns: The first grid time in nanoseconds since the epoch in UTC, the first sample by default
+        :param end_ns: The last grid time, the last sample by default
+        :param method: See `AlignmentSource.resample`
+        :param timezone: The timezone of the absolute datetime column of the blocks
+        :param block_rows: The number of grid rows per block
+        """
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive: {rate}")
+
+        self.sources = sources
+        self.step = int(round(SECOND / rate))
+        """The interval of the grid in nanoseconds."""
+        self.method = method
+        self.timezone = timezone
+        self.block_rows = block_rows
+
+        starts = [source.start for source in sources if source.start is not None]
+        ends = [source.end for source in sources if source.end is not None]
+        self.start_ns = start_ns if start_ns is not None else min(starts, default=0)
+        end_ns = end_ns if end_ns is not None else max(ends, default=self.start_ns - 1)
+
+        self.rows = max((end_ns - self.start_ns) // self.step + 1, 0)
+        """The number of grid rows."""
+
+    @property
+    def blocks(self) -> int:
+        return -(-self.rows // self.block_rows)
+
+    def grid(self, index: int) -> np.ndarray:
+        """
+        :return: The grid times of the block in nanoseconds since the epoch in UTC
+        """
+        first = index * self.block_rows
+        rows = np.arange(first, min(first + self.block_rows, self.rows), dtype=np.int64)
+        return self.start_ns + rows * self.step
+
+    def block(self, index: int) -> pd.DataFrame:
+        """
+        :return: The absolute datetime of the grid rows of the block, followed by the resampled columns of every sensor
+        """
+        grid = self.grid(index)
+
+        with span('alignment.block', len(grid), sensors=len(self.sources)):
+            columns = [source.resample(grid, self.method) for source in self.sources]
+            datetimes = pd.DataFrame({ABSOLUTE_DATETIME: pd.to_datetime(grid, utc=True).tz_convert(self.timezone)})
+            return pd.concat([datetimes] + columns, axis=1)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return (self.block(index) for index in range(self.blocks))
+
+
+def get_offsets(camera_id: int, sensor_data_file_ids: List[int]) -> Dict[int, float]:
+    """
+    :return: The offsets in seconds between the camera and the sensors of the sensor data files by file id, as they
+        were set in the GUI on the day of each file
+    """
+    offsets = {}
+
+    for sdf in SensorDataFile.select().where(SensorDataFile.id.in_(sensor_data_file_ids)):
+        offset = Offset.get_or_none((Offset.camera == camera_id) & (Offset.sensor == sdf.sensor_id) &
+                                    (Offset.added == sdf.datetime.date()))
+        offsets[sdf.id] = offset.offset if offset is not None else 0.0
+
+    return offsets
+
+
+def open_subject_sources(project_controller, subject_id: int, start_dt: dt.datetime, end_dt: dt.datetime,
+                         camera_id: int = None, columns: List[str] = None) -> List[AlignmentSource]:
+    """
+    Open the labeled sensor data of every sensor of the subject within the timespan, with one source per sensor.
+
+    :param project_controller: The project, only its settings are used
+    :param subject_id: The id of the subject
+    :param start_dt: The start of the timespan in UTC
+    :param end_dt: The end of the timespan in UTC
+    :param camera_id: The camera whose offsets to the sensors are applied, no offsets are applied if None
+    :param columns: The columns to align, all columns except the timestamps by default. The labels are always aligned.
+    :return: The sources, in the order of the sensor names
+    :raises ImportException: If the timestamps of a file could not be parsed
+    :raises FileNotFoundError: If a sensor data file does not exist anymore
+    """
+    sdf_ids = find_subject_files(subject_id, start_dt, end_dt)
+    offsets = get_offsets(camera_id, sdf_ids) if camera_id is not None else {}
+    by_sensor = {}
+
+    for sdf_id in sdf_ids:
+        sensor_data = open_sensor_data(project_controller, sdf_id)
+        sensor_data.add_abs_dt_col()
+        sensor_data.filter_between_dates(start_dt, end_dt)
+        sensor_data.add_labels(get_labels(sdf_id, start_dt, end_dt))
+
+        names = sensor_data.get_column_names()
+        time_column = sensor_data.sensor_model.timestamp_column
+        skip = {ABSOLUTE_DATETIME, names[time_column] if time_column < len(names) else None}
+        # Only the aligned columns are copied
+        df = sensor_data.get_columns([column for column in names if column not in skip and
+                                      (columns is None or column in columns or column == 'Label')])
+        utc_ns = sensor_data.utc_ns + int(round(offsets.get(sdf_id, 0.0) * SECOND))
+        monotonic = sensor_data.sampling_index is not None and sensor_data.sampling_index.monotonic
+
+        sensor = SensorDataFile.get_by_id(sdf_id).sensor_id
+        by_sensor.setdefault(sensor, []).append((utc_ns, df, monotonic))
+
+    sources = []
+    for sensor_id, parts in by_sensor.items():
+        name = Sensor.get_by_id(sensor_id).name
+
+        if len(parts) == 1:
+            # The data of a single file is aligned without sorting or copying when its times are in order
+            utc_ns, df, monotonic = parts[0]
+            sources.append(AlignmentSource(name, utc_ns, df, monotonic=monotonic))
+        else:
+            utc_ns = np.concatenate([part[0] for part in parts])
+            df = pd.concat([part[1] for part in parts], ignore_index=True)
+            sources.append(AlignmentSource(name, utc_ns, df))
+
+    return sorted(sources, key=lambda source: source.name)
+
+
+def write_alignment(file_path: Path, alignment: SensorAlignment, progress: Callable[[int], None] = None,
+                    aborted: Callable[[], bool] = None) -> int:
+    """
+    Write the aligned data to a CSV file block by block, with naive absolute datetimes like `write_export`.
+
+    :param file_path: The CSV file, replaced if it exists
+    :param alignment: The alignment
+    :param progress: Called with the percentage of the blocks that has been written
+    :param aborted: Called before each block, the export stops when it returns True
+    :return: The number of rows that were written
+    :raises ExportCancelled: If the export was aborted
+    """
+    file_path = Path(file_path)
+    if file_path.is_file():
+        file_path.unlink()
+
+    with span('export.align', alignment.rows, file=file_path.name, sensors=len(alignment.sources)):
+        for index in range(alignment.blocks):
+            if aborted is not None and aborted():
+                raise ExportCancelled(file_path.as_posix())
+
+            block = alignment.block(index)
+            block[ABSOLUTE_DATETIME] = block[ABSOLUTE_DATETIME].dt.tz_localize(None)
+            block.to_csv(file_path, mode='a', header=(index == 0), index=False, na_rep="")
+
+            if progress is not None:
+                progress((index + 1) * 100 // alignment.blocks)
+
+    return alignment.rows
+
+
+def export_aligned_subject(project_controller, subject_id: int, start_dt: dt.datetime, end_dt: dt.datetime,
+                           file_path: Path, rate: float, camera_id: int = None,
+                           progress: Callable[[int], None] = None, aborted: Callable[[], bool] = None) -> int:
+    """
+    Export the labeled sensor data of all sensors of a subject within the timespan, aligned on a common time base.
+
+    :param rate: The number of rows per second
+    :param camera_id: See `open_subject_sources`
+    :return: The number of rows that were written
+    :raises ImportException: If the timestamps of a file could not be parsed
+    :raises FileNotFoundError: If a sensor data file does not exist anymore
+    """
+    sources = open_subject_sources(project_controller, subject_id, start_dt, end_dt, camera_id)
+    timezone = pytz.timezone(project_controller.get_setting('timezone'))
+
+    # The grid starts at a whole multiple of the interval, so that the rows of subjects are at the same times
+    step = int(round(SECOND / rate))
+    starts = [source.start for source in sources if source.start is not None]
+    start_ns = -(-min(starts) // step) * step if starts else to_utc_ns(start_dt)
+
+    return write_alignment(file_path, SensorAlignment(sources, rate, start_ns, timezone=timezone), progress, aborted)
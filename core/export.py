@@ -0,0 +1,150 @@
+import datetime as dt
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+from core.ingest import open_sensor_data
+from core.labels import get_labels
+from data_import.sensor_data import SensorData
+from database.models import SensorDataFile, SubjectMapping
+from instrumentation import span
+
+EXPORT_CHUNKS = 100
+"""The number of parts in which the data is written, to report the progress."""
+
+
+class ExportCancelled(Exception):
+    """The export was aborted before all the data was written."""
+    pass
+
+
+def find_subject_files(subject_id: int, start_dt: dt.datetime, end_dt: dt.datetime) -> List[int]:
+    """
+    Find the sensor data files of the sensors that were mapped to the subject within the timespan.
+
+    :param subject_id: The id of the subject
+    :param start_dt: The start of the timespan in UTC
+    :param end_dt: The end of the timespan in UTC
+    :return: The ids of the sensor data files that start within the timespan
+    """
+    # Find all the sensors that belong to the subject by looking through the subject mappings.
+    subject_mappings = (SubjectMapping
+                        .select(SubjectMapping.sensor)
+                        .where((SubjectMapping.subject == subject_id) &
+                               (
+                                       SubjectMapping.start_datetime.between(start_dt, end_dt) |
+                                       SubjectMapping.end_datetime.between(start_dt, end_dt) |
+                                       (start_dt >= SubjectMapping.start_datetime) & (
+                                               start_dt <= SubjectMapping.end_datetime) |
+                                       (end_dt >= SubjectMapping.start_datetime) & (
+                                               end_dt <= SubjectMapping.end_datetime)
+                               )
+                               ))
+
+    sdf_ids = []
+    for subject_mapping in subject_mappings:
+        # Retrieve all SensorDataFiles that have this sensor associated with it.
+        sdf_query = (SensorDataFile
+                     .select(SensorDataFile.id)
+                     .where((SensorDataFile.sensor == subject_mapping.sensor_id) &
+                            SensorDataFile.datetime.between(start_dt, end_dt)))
+
+        sdf_ids.extend(sdf.id for sdf in sdf_query if sdf.id not in sdf_ids)
+
+    return sdf_ids
+
+
+def prepare_sensor_data(sensor_data: SensorData, sdf_id: int, start_dt: dt.datetime,
+                        end_dt: dt.datetime) -> SensorData:
+    """
+    Add the naive absolute timestamps and the labels to parsed sensor data, and keep the rows within the timespan.
+
+    :param sensor_data: The parsed sensor data of the sensor data file
+    :param sdf_id: The id of the sensor data file
+    :param start_dt: The start of the timespan in UTC
+    :param end_dt: The end of the timespan in UTC
+    :return: The same sensor data
+    :raises ImportException: If the timestamps could not be parsed
+    """
+    with span('export.prepare_file', sensor_data_file=sdf_id) as prepare_span:
+        labels = get_labels(sdf_id, start_dt, end_dt)
+
+        sensor_data.add_abs_dt_col(use_tznaive=True)
+        sensor_data.filter_between_dates(start_dt, end_dt)
+        sensor_data.add_labels(labels)
+
+        prepare_span.rows = len(sensor_data.get_data())
+        prepare_span.args['labels'] = len(labels)
+
+    return sensor_data
+
+
+def write_export(file_path: Path, sensor_data: List[SensorData], progress: Callable[[int], None] = None,
+                 aborted: Callable[[], bool] = None) -> int:
+    """
+    Export the data of the sensor data files to a CSV file in chunks.
+
+    The data is separated in 100 roughly equal parts and each part is appended to the previous parts, so that the
+    progress can be reported. This is particularly useful for data that encompasses large amounts of time.
+
+    :param file_path: The CSV file, replaced if it exists
+    :param sensor_data: The prepared sensor data, see `prepare_sensor_data`
+    :param progress: Called with the percentage of the data that has been written
+    :param aborted: Called before each part, the export stops when it returns True
+    :return: The number of rows that were written
+    :raises ExportCancelled: If the export was aborted
+    :raises PermissionError: If the file cannot be written
+    """
+    file_path = Path(file_path)
+
+    with span('export.job', file=file_path.name, sensor_data_files=len(sensor_data)) as job_span:
+        with span('export.collect') as collect_span:
+            frames = [data.get_data() for data in sensor_data]
+            # Missing values are written as empty fields, without turning numeric columns into object columns
+            df = pd.concat(frames) if frames else pd.DataFrame()
+            collect_span.rows = job_span.rows = len(df)
+
+        # Because exporting uses append mode, the existing file has to be deleted first in case of the reuse of file
+        # name.
+        if file_path.is_file():
+            file_path.unlink()
+
+        # Divide into 100 (roughly) equal chunks.
+        bounds = np.linspace(0, len(df), EXPORT_CHUNKS + 1).astype(int)
+
+        with span('export.write', len(df)):
+            for i in range(EXPORT_CHUNKS):
+                if aborted is not None and aborted():
+                    raise ExportCancelled(file_path.as_posix())
+
+                # Append each chunk to the CSV file using mode='a' (append).
+                df.iloc[bounds[i]:bounds[i + 1]].to_csv(file_path, mode='a', header=(i == 0), index=False, na_rep="")
+
+                if progress is not None:
+                    progress((i + 1) * 100 // EXPORT_CHUNKS)
+
+    return len(df)
+
+
+def export_subject(project_controller, subject_id: int, start_dt: dt.datetime, end_dt: dt.datetime, file_path: Path,
+                   progress: Callable[[int], None] = None, aborted: Callable[[], bool] = None) -> int:
+    """
+    Export the labeled sensor data of a subject within the timespan to a CSV file, without asking the user anything.
+
+    :param project_controller: The project, only its settings are used
+    :param subject_id: The id of the subject
+    :param start_dt: The start of the timespan in UTC
+    :param end_dt: The end of the timespan in UTC
+    :param file_path: The CSV file
+    :param progress: See `write_export`
+    :param aborted: See `write_export`
+    :return: The number of rows that were written
+    :raises ImportException: If the timestamps of a file could not be parsed
+    :raises FileNotFoundError: If a sensor data file does not exist anymore
+    """
+    sensor_data = [prepare_sensor_data(open_sensor_data(project_controller, sdf_id), sdf_id, start_dt, end_dt)
+                   for sdf_id in find_subject_files(subject_id, start_dt, end_dt)]
+
+    return write_export(file_path, sensor_data, progress, aborted)
@@ -0,0 +1,133 @@
+from pathlib import Path
+from typing import Dict, List
+
+import pytz
+
+from data_import.parsed_data_cache import ParsedDataCache, ENTRY_DATA, ENTRY_COLUMNS, ENTRY_UTC_DT, ENTRY_FORMULAS, \
+    ENTRY_SAMPLING_INDEX
+from data_import.sensor_data import SensorData
+from data_import.sensor_data_cache import sensor_data_cache
+from database.models import SensorDataFile, Sensor, SensorModel
+from exceptions import SensorDataFileDoesNotExist, SensorDoesNotExist, SensorModelDoesNotExist
+
+
+def open_sensor_data(project_controller, sensor_data_file_id: int, file_path: Path = None) -> SensorData:
+    """
+    Parse the sensor data of a sensor data file in the database, with the sensor model and the timezone of its sensor.
+
+    :param project_controller: The project of the sensor data file, only its settings are used
+    :param sensor_data_file_id: The id of the sensor data file
+    :param file_path: The location of the file, if it is not at the path in the database anymore
+    :return: A new SensorData instance containing the parsed data
+    :raises SensorDataFileDoesNotExist: If the sensor data file is not in the database
+    :raises SensorDoesNotExist: If the sensor of the file is unknown
+    :raises SensorModelDoesNotExist: If the sensor model of the sensor is unknown
+    :raises FileNotFoundError: If the file does not exist
+    :raises ImportException: If the data does not match the sensor model
+    """
+    sdf = SensorDataFile.get_or_none(SensorDataFile.id == sensor_data_file_id)
+    if sdf is None:
+        raise SensorDataFileDoesNotExist(sensor_data_file_id)
+
+    sensor = Sensor.get_or_none(Sensor.id == sdf.sensor_id)
+    if sensor is None:
+        raise SensorDoesNotExist(sdf.sensor_id)
+
+    sensor_model = SensorModel.get_or_none(SensorModel.id == sensor.model_id)
+    if sensor_model is None:
+        raise SensorModelDoesNotExist(sensor.model_id)
+
+    file_path = Path(file_path if file_path is not None else sdf.file_path)
+    if not file_path.is_file():
+        raise FileNotFoundError(file_path.as_posix())
+
+    sensor_data = SensorData(project_controller, file_path, sensor_model.id)
+    sensor_data.metadata.sensor_timezone = pytz.timezone(sensor.timezone)
+    # Parse the utc datetime of the sensor data
+    sensor_data.metadata.parse_datetime()
+    parse_sensor_data(sensor_data)
+
+    return sensor_data
+
+
+def parse_sensor_data(sensor_data: SensorData, fingerprint: str = None) -> None:
+    """
+    Parse the sensor data, or restore a copy of the data from the sensor data cache when the file was parsed before in
+    this session.
+
+    :param sensor_data: The SensorData object of the file, with the timezone of the sensor
+    :param fingerprint: The fingerprint of the file, looked up in the database if None. It must be given on a worker
+        thread, which cannot use the database.
+    :raises ImportException: If the data does not match the sensor model
+    """
+    key = sensor_data_cache.key(sensor_data, fingerprint)
+    entry = sensor_data_cache.get(key)
+
+    if entry is not None:
+        sensor_data.restore(entry.df, entry.columns, entry.utc_dt)
+        return
+
+    sensor_data.parse()
+    sensor_data_cache.put(key, sensor_data.get_data(), list(sensor_data.col_metadata), sensor_data.metadata.utc_dt)
+
+
+class LoadResult:
+
+    def __init__(self, sensor_data: SensorData, formulas: List[str], from_cache: bool,
+                 failed: Dict[str, str] = None):
+        self.sensor_data = sensor_data
+        self.formulas = formulas
+        """The names of the formulas that were added to the sensor data."""
+        self.from_cache = from_cache
+        self.failed = failed if failed is not None else {}
+        """The error messages of the formulas that could not be added, by name."""
+
+
+def load_sensor_data(sensor_data: SensorData, formulas: Dict[str, str], cache: ParsedDataCache = None,
+                     cache_key: str = None, fingerprint: str = None) -> LoadResult:
+    """
+    Parse the sensor data and add the formula columns and the absolute timestamps, or restore the result of an earlier
+    parse from the cache. Does not use the controllers or Qt, and does not use the database when `fingerprint` is
+    given, so that it can run on a worker thread.
+
+    :param sensor_data: The SensorData object of the file, with the timezone of the sensor
+    :param formulas: The formulas of the project by name
+    :param cache: The cache of parsed sensor data, not used if None
+    :param cache_key: The key of the sensor data in the cache
+    :param fingerprint: The fingerprint of the file, see `parse_sensor_data`
+    :return: The loaded sensor data, with the formulas that could not be added in `failed`
+    :raises ImportException: If the timestamps could not be parsed
+    """
+    entry = cache.load(cache_key) if cache is not None else None
+
+    if entry is not None:
+        sensor_data.restore(entry[ENTRY_DATA], entry[ENTRY_COLUMNS], entry[ENTRY_UTC_DT], entry[ENTRY_SAMPLING_INDEX])
+        return LoadResult(sensor_data, entry[ENTRY_FORMULAS], from_cache=True)
+
+    # Parse the sensor data from the file
+    parse_sensor_data(sensor_data, fingerprint)
+    columns = list(sensor_data.col_metadata)
+
+    # Add the formulas of the project, a formula that cannot be evaluated is reported to the caller
+    added = []
+    failed = {}
+    for formula_name in formulas:
+        try:
+            sensor_data.add_column_from_func(formula_name, formulas[formula_name])
+            added.append(formula_name)
+        except Exception as e:
+            failed[formula_name] = str(e)
+
+    # Add absolute time column to dataframe
+    sensor_data.add_abs_dt_col()
+
+    # Only cache complete results, so that failed formulas are reported on every load
+    if cache is not None and not failed:
+        try:
+            cache.save(cache_key, sensor_data.get_data(), columns, sensor_data.metadata.utc_dt, added,
+                       sensor_data.sampling_index)
+        except OSError:
+            # The cache only speeds up the next load
+            pass
+
+    return LoadResult(sensor_data, added, from_cache=False, failed=failed)
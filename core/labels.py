@@ -0,0 +1,25 @@
+import datetime as dt
+
+from database.models import Label, LabelType
+
+
+def get_labels(sdf_id: int, start_dt: dt.datetime, end_dt: dt.datetime) -> list:
+    """
+    Get all the labels linked to the desired sensor data file within the specified interval.
+
+    :param sdf_id: The SensorDataFile id from which the labels should be retrieved.
+    :param start_dt: The start time of the interval
+    :param end_dt: The end time of the interval
+    :return: A list of dictionaries, each representing one annotation, containing the start time, end time, and activity
+    of that label
+    """
+    labels = (Label
+              .select(Label.start_time, Label.end_time, LabelType.activity)
+              .join(LabelType)
+              .where((Label.sensor_data_file == sdf_id) &
+                     (Label.start_time.between(start_dt, end_dt) |
+                      Label.end_time.between(start_dt, end_dt))))
+
+    return [{'start': label.start_time,
+             'end': label.end_time,
+             'activity': label.label_type.activity} for label in labels]
@@ -0,0 +1,6 @@
+import sys
+
+from data_export.batch_export import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Exports the labeled sensor data of a project without the GUI, e.g. in a scheduled job.
+
+Every subject is exported to its own CSV file, like the export dialog does, by a pool of worker processes. The progress
+is printed as one JSON object per line, and the exit status is 1 when the export of a subject failed. With --rate, the
+sensors of a subject are aligned on a common time base instead, see `core.alignment`.
+
+Usage: python -m data_export <project directory> [--subject NAME ...] [--start 2020-05-01T00:00] [--end ...]
+       [--rate HZ [--camera NAME]]
+"""
+import argparse
+import concurrent.futures
+import datetime as dt
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytz
+
+import core
+from constants import PROJECT_CONFIG_FILE
+from controllers.project_controller import ProjectController
+from data_import.import_exception import ImportException
+from database.models import Subject, SubjectMapping, Camera
+
+EXPORT_DIR = 'export'
+"""The directory in the project directory to which the files are exported by default."""
+
+PROGRESS_STEP = 10
+"""The percentage between the progress events of a subject."""
+
+_project: Optional[ProjectController] = None
+"""The project opened by the worker process."""
+
+
+def emit(event: str, **fields) -> None:
+    """
+    Print an event as a line of JSON.
+    """
+    print(json.dumps(dict(event=event, **fields), default=str), flush=True)
+
+
+class _Emitter:
+    """Prints the progress of an export in the current process, used instead of a queue to the main process."""
+
+    @staticmethod
+    def put(record: dict) -> None:
+        emit(**record)
+
+
+def parse_utc(value: str) -> dt.datetime:
+    """
+    :param value: An ISO 8601 datetime, in UTC if it has no offset
+    :return: The naive datetime in UTC, as the datetimes are stored in the database
+    """
+    try:
+        datetime = dt.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO 8601 datetime: '{value}'")
+
+    if datetime.tzinfo is not None:
+        datetime = datetime.astimezone(pytz.utc).replace(tzinfo=None)
+
+    return datetime
+
+
+def open_project(project_dir: Path) -> None:
+    """
+    Open the project in this process. Used as initializer of the worker processes.
+    """
+    global _project
+    _project = ProjectController(None)
+    _project.load_or_create(Path(project_dir))
+
+
+def close_project() -> None:
+    global _project
+    if _project is not None:
+        _project.close_db()
+        _project = None
+
+
+def find_subjects(names: List[str] = None) -> Dict[int, str]:
+    """
+    :param names: The names of the subjects, all subjects if None
+    :return: The names of the subjects by id
+    :raises ValueError: If a subject does not exist
+    """
+    subjects = {subject.name: subject.id for subject in Subject.select(Subject.id, Subject.name)}
+
+    if names is None:
+        names = sorted(subjects)
+
+    unknown = [name for name in names if name not in subjects]
+    if unknown:
+        raise ValueError("Unknown subject(s): " + ", ".join(unknown))
+
+    return {subjects[name]: name for name in names}
+
+
+def mapped_timespan() -> (Optional[dt.datetime], Optional[dt.datetime]):
+    """
+    :return: The first start and the last end of the subject mappings, the timespan in which labels can be exported
+    """
+    first = SubjectMapping.select().order_by(SubjectMapping.start_datetime).first()
+    last = SubjectMapping.select().order_by(SubjectMapping.end_datetime.desc()).first()
+
+    if first is None:
+        return None, None
+
+    return first.start_datetime, last.end_datetime
+
+
+def find_camera(name: Optional[str]) -> Optional[int]:
+    """
+    :return: The id of the camera, None if `name` is None
+    :raises ValueError: If the camera does not exist
+    """
+    if name is None:
+        return None
+
+    camera = Camera.get_or_none(Camera.name == name)
+    if camera is None:
+        raise ValueError("Unknown camera: " + name)
+
+    return camera.id
+
+
+def export_subject(subject_id: int, subject_name: str, start_dt: dt.datetime, end_dt: dt.datetime, file_path: Path,
+                   rate: Optional[float], camera_id: Optional[int], progress_queue) -> dict:
+    """
+    Export a subject with the project opened by `open_project`.
+
+    :param rate: The rate of the common time base of the sensors in rows per second, the files of the sensors are
+        concatenated if None
+    :param camera_id: The camera whose offsets to the sensors are applied when aligning
+    :param progress_queue: Receives the progress events
+    :return: The 'done', 'skipped' or 'failed' event of the subject
+    """
+    started = time.perf_counter()
+    subject = dict(subject=subject_name, file=file_path.as_posix())
+
+    def progress(percentage: int):
+        if percentage % PROGRESS_STEP == 0:
+            progress_queue.put(dict(event='progress', percentage=percentage, **subject))
+
+    try:
+        if not core.find_subject_files(subject_id, start_dt, end_dt):
+            return dict(event='skipped', reason='No sensor data within the timespan', **subject)
+
+        if rate is None:
+            rows = core.export_subject(_project, subject_id, start_dt, end_dt, file_path, progress)
+        else:
+            rows = core.export_aligned_subject(_project, subject_id, start_dt, end_dt, file_path, rate, camera_id,
+                                               progress)
+    except ImportException as e:
+        return dict(event='failed', error=e.describe(), **subject)
+    except Exception as e:
+        return dict(event='failed', error=f"{type(e).__name__}: {e}", **subject)
+
+    return dict(event='done', rows=rows, seconds=round(time.perf_counter() - started, 3), **subject)
+
+
+def run(project_dir: Path, subjects: Dict[int, str], start_dt: dt.datetime, end_dt: dt.datetime, output_dir: Path,
+        jobs: int, rate: float = None, camera_id: int = None) -> List[dict]:
+    """
+    Export the subjects, in parallel when `jobs` is larger than 1, and print their events.
+
+    :param rate: See `export_subject`
+    :param camera_id: See `export_subject`
+    :return: The final event of every subject
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tasks = [(subject_id, name, start_dt, end_dt, output_dir.joinpath(f"export_subject_{name}.csv"), rate, camera_id)
+             for subject_id, name in subjects.items()]
+
+    results = []
+
+    if jobs <= 1 or len(tasks) <= 1:
+        open_project(project_dir)
+        try:
+            for task in tasks:
+                results.append(export_subject(*task, _Emitter()))
+                emit(**results[-1])
+        finally:
+            close_project()
+        return results
+
+    # Spawn instead of fork, so that the workers do not share the database connection of this process
+    context = multiprocessing.get_context('spawn')
+
+    with context.Manager() as manager:
+        progress_queue = manager.Queue()
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=open_project,
+                                                    initargs=(project_dir,)) as executor:
+            pending = {executor.submit(export_subject, *task, progress_queue) for task in tasks}
+
+            while pending:
+                done, pending = concurrent.futures.wait(pending, timeout=0.2,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                _print_progress(progress_queue)
+
+                for future in done:
+                    results.append(future.result())
+                    emit(**results[-1])
+
+        _print_progress(progress_queue)
+
+    return results
+
+
+def _print_progress(progress_queue) -> None:
+    while not progress_queue.empty():
+        emit(**progress_queue.get())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m data_export', description=__doc__.split('\n\n')[0])
+    parser.add_argument('project_dir', type=Path, help='The project directory')
+    parser.add_argument('--subject', action='append', dest='subjects', metavar='NAME',
+                        help='A subject to export, can be repeated. All subjects by default')
+    parser.add_argument('--start', type=parse_utc, help='The start of the timespan in UTC, in ISO 8601 format. '
+                                                        'The start of the first subject mapping by default')
+    parser.add_argument('--end', type=parse_utc, help='The end of the timespan in UTC, in ISO 8601 format. '
+                                                      'The end of the last subject mapping by default')
+    parser.add_argument('--output-dir', type=Path, help='The directory of the exported files, '
+                                                        f'<project directory>/{EXPORT_DIR} by default')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='The number of subjects that are exported in parallel')
+    parser.add_argument('--rate', type=float, metavar='HZ',
+                        help='Align the sensors of a subject on a common time base with this many rows per second, '
+                             'instead of concatenating their files')
+    parser.add_argument('--camera', metavar='NAME', help='With --rate, apply the offsets of the sensors to this camera')
+    args = parser.parse_args(argv)
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+
+    project_dir = args.project_dir.resolve()
+    if not project_dir.joinpath(PROJECT_CONFIG_FILE).is_file():
+        parser.error(f"{project_dir} is not a project directory")
+
+    open_project(project_dir)
+    try:
+        subjects = find_subjects(args.subjects)
+        first_start, last_end = mapped_timespan()
+        camera_id = find_camera(args.camera)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        close_project()
+
+    start_dt = args.start if args.start is not None else first_start
+    end_dt = args.end if args.end is not None else last_end
+    output_dir = args.output_dir if args.output_dir is not None else project_dir.joinpath(EXPORT_DIR)
+
+    started = time.perf_counter()
+    emit('start', project=project_dir.as_posix(), subjects=list(subjects.values()), start=start_dt, end=end_dt,
+         output_dir=output_dir.as_posix(), jobs=args.jobs, rate=args.rate)
+
+    results = run(project_dir, subjects, start_dt, end_dt, output_dir, args.jobs, args.rate, camera_id) \
+        if subjects and start_dt is not None and end_dt is not None else []
+
+    failed = [result['subject'] for result in results if result['event'] == 'failed']
+    emit('finished', exported=sum(result['event'] == 'done' for result in results), failed=failed,
+         rows=sum(result.get('rows', 0) for result in results), seconds=round(time.perf_counter() - started, 3))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
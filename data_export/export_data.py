@@ -2,9 +2,11 @@ import pandas as pd
 import os
 
 from data_export import windowing as w
+from data_export.feature_store import FeatureStore
 
 
-def export(data: [], label_col: str, timestamp_col: str, file_path: str, comments: [str], comment=';'):
+def export(data: [], label_col: str, timestamp_col: str, file_path: str, comments: [str], comment=';',
+           feature_store: FeatureStore = None, file_ids: [str] = None, window: float = 2, hop: float = 1, **funcs):
     """
     Exports a list of DataFrames after using the windowing_fast method to get a statistical
     overview of the data contained in the DataFrames. The DataFrames are required to have
@@ -17,6 +19,12 @@ def export(data: [], label_col: str, timestamp_col: str, file_path: str, comment
     :param file_path: The path of the newly created file.
     :param comments: A list of comments that will be added at the head of the file.
     :param comment: The style used to denote comments (defaults to ';')
+    :param feature_store: If given, the windowed features of the DataFrames are exported instead of the raw data.
+        Features that were computed before are taken from the store.
+    :param file_ids: The fingerprints of the sensor data files of the DataFrames, required with `feature_store`.
+    :param window: The window length in seconds.
+    :param hop: The time in seconds between the ends of consecutive windows.
+    :param funcs: A dictionary of function names and functions used for windowing.
     :return:
     """
     # # Initialise result list
@@ -35,6 +43,20 @@ def export(data: [], label_col: str, timestamp_col: str, file_path: str, comment
     # # Turn list into one DataFrame
     # _df = pd.concat(res)
 
+    if feature_store is not None:
+        windowed = []
+
+        for _df, file_id in zip(data, file_ids):
+            # Get list of columns to be windowed over
+            collist = _df.columns.tolist()
+            collist.remove(label_col)
+            collist.remove(timestamp_col)
+
+            windowed.append(feature_store.windowing(_df, file_id, collist, label_col, timestamp_col, window, hop,
+                                                    **funcs).reset_index())
+
+        data = windowed
+
     df = pd.concat(data)
 
     # Remove file if it exists
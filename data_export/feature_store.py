@@ -0,0 +1,259 @@
+"""
+Persistent store of windowed features.
+
+Windowing over the raw sensor data is the slowest step of training, predicting and exporting features. The feature
+store keeps the result of `windowing.windowing` per configuration: the sensor data file, the columns, the window
+length, the hop and the feature functions. Within a configuration, results are stored per segment, a run of rows with
+the same label. When the labels of a file change, only the segments that are new or different are windowed again.
+
+Every configuration is stored in its own directory, with one `.npy` file per feature column so that columns can be
+memory mapped, and a `manifest.json` that describes the stored segments.
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import types
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data_export import window_functions as wf
+from data_export import windowing as w
+
+MANIFEST_FILE = 'manifest.json'
+TIMESTAMP_FILE = 'timestamp.npy'
+
+
+def feature_id(func: Union[Callable, str]) -> str:
+    """
+    :return: A name that identifies a feature function between runs, e.g. 'numpy.mean'. Lambdas and nested functions
+        are identified by their name and a hash of their code and the values they refer to, partial functions by the
+        function and a hash of the arguments.
+    :raise ValueError: If the callable has no name that is stable between runs
+    """
+    if isinstance(func, str):
+        # Name of a spectral feature
+        return func
+    if isinstance(func, wf.WindowFunction):
+        return feature_id(func.func)
+    if isinstance(func, functools.partial):
+        return 'functools.partial({}, {})'.format(feature_id(func.func),
+                                                  _digest(_stable_repr(func.args), _stable_repr(func.keywords)))
+
+    qualname = getattr(func, '__qualname__', None)
+    if qualname is None:
+        name = _checked_repr(func)
+    elif '<' in qualname and hasattr(func, '__code__'):
+        # Lambdas and nested functions do not have a unique name
+        closure = [cell.cell_contents for cell in func.__closure__ or ()]
+        name = '{}[{}]'.format(qualname, _digest(_code_digest(func.__code__), _stable_repr(func.__defaults__),
+                                                 _stable_repr(closure)))
+    else:
+        name = qualname
+
+    return '{}.{}'.format(getattr(func, '__module__', None), name)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b('\0'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _code_digest(code: types.CodeType) -> str:
+    consts = [_code_digest(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts]
+    return _digest(code.co_code.hex(), repr(code.co_names), *consts)
+
+
+def _stable_repr(value) -> str:
+    if callable(value) and not isinstance(value, type):
+        return feature_id(value)
+    if isinstance(value, (list, tuple)):
+        return '({})'.format(', '.join(_stable_repr(item) for item in value))
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join('{!r}: {}'.format(key, _stable_repr(value[key])) for key in sorted(value)))
+
+    return _checked_repr(value)
+
+
+def _checked_repr(value) -> str:
+    text = repr(value)
+    if ' at 0x' in text:
+        raise ValueError('{} has no name that is stable between runs, it cannot be used in the feature store'
+                         .format(text))
+    return text
+
+
+class FeatureStore:
+
+    def __init__(self, store_dir: Path):
+        """
+        :param store_dir: The directory in which the features are stored
+        """
+        self.store_dir = Path(store_dir)
+
+    @staticmethod
+    def key(file_id: str, cols: List[str], window: float, hop: float, funcs: Dict[str, Callable]) -> str:
+        """
+        :param file_id: The fingerprint of the sensor data file
+        :param cols: The columns that are windowed over
+        :param window: The window length in seconds
+        :param hop: The time in seconds between the ends of consecutive windows
+        :param funcs: A dictionary of function names and functions
+        :return: The key of the configuration
+        """
+        config = json.dumps([file_id, list(cols), float(window), float(hop),
+                             sorted((name, feature_id(func)) for name, func in funcs.items())])
+        return hashlib.blake2b(config.encode('utf-8'), digest_size=16).hexdigest()
+
+    def windowing(self, df: pd.DataFrame, file_id: str, cols: [str], label_col: str, timestamp_col: str,
+                  window: float = 2, hop: float = 1, executor: Executor = None, **funcs) -> pd.DataFrame:
+        """
+        Returns the same DataFrame as `windowing.windowing`, computing only the segments that are not stored yet.
+
+        Columns are recognized by name, so `file_id` should change when the values of a column change for another
+        reason than a change of the file, e.g. a changed formula.
+
+        :param df: The DataFrame to be windowed over.
+        :param file_id: The fingerprint of the sensor data file the DataFrame was read from.
+        :param cols: The columns that should be used for windowing.
+        :param label_col: The column containing the labels.
+        :param timestamp_col: The column containing the timestamps.
+        :param window: The window length in seconds.
+        :param hop: The time in seconds between the ends of consecutive windows.
+        :param executor: If given, the segments that are not stored are windowed in parallel on this executor.
+        :param funcs: A dictionary of function names and functions.
+        :return: A windowed DataFrame with the timestamp as index.
+        """
+        config_dir = self.store_dir.joinpath(self.key(file_id, cols, window, hop, funcs))
+        manifest = self._load_manifest(config_dir)
+        stored = {self._segment_key(segment): segment for segment in manifest['segments']} if manifest else {}
+
+        results = []
+        segments = []
+        missing = []
+        timestamp_dtype = str(df[timestamp_col].dtype)
+
+        for segment_df in w.split_df(df, label_col):
+            segment = {
+                'start': int(segment_df[timestamp_col].iloc[0].value),
+                'stop': int(segment_df[timestamp_col].iloc[-1].value),
+                'label': str(segment_df[label_col].iloc[0]),
+                'rows': len(segment_df)
+            }
+            segment_key = self._segment_key(segment)
+
+            if segment_key in stored and manifest['timestamp_dtype'] == timestamp_dtype:
+                windowed = self._load_segment(config_dir, manifest, stored[segment_key], label_col, timestamp_col,
+                                              segment_df[label_col].iloc[0])
+            else:
+                windowed = None
+                missing.append((len(results), segment_df))
+
+            segments.append(segment)
+            results.append(windowed)
+
+        if missing:
+            if executor is not None:
+                windowed = [executor.submit(w.windowing, segment_df, cols, label_col, timestamp_col, window, hop,
+                                            **funcs)
+                            for _, segment_df in missing]
+                windowed = [future.result() for future in windowed]
+            else:
+                windowed = [w.windowing(segment_df, cols, label_col, timestamp_col, window, hop, **funcs)
+                            for _, segment_df in missing]
+
+            for (i, _), result in zip(missing, windowed):
+                results[i] = result
+
+        res = pd.concat(results).sort_index(axis=1).sort_index(axis=0)
+
+        # Only write when a segment was computed or removed
+        if missing or [self._segment_key(s) for s in segments] != list(stored):
+            self._save(config_dir, manifest, segments, results, label_col, timestamp_dtype)
+
+        return res
+
+    @staticmethod
+    def _segment_key(segment: dict) -> tuple:
+        return segment['start'], segment['stop'], segment['label'], segment['rows']
+
+    @staticmethod
+    def _load_manifest(config_dir: Path) -> Optional[dict]:
+        try:
+            with config_dir.joinpath(MANIFEST_FILE).open(mode='r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _load_segment(config_dir: Path, manifest: dict, segment: dict, label_col: str, timestamp_col: str,
+                      label) -> pd.DataFrame:
+        rows = slice(segment['offset'], segment['offset'] + segment['count'])
+        generation = manifest['generation']
+
+        ns = np.load(config_dir.joinpath(f'{generation}_{TIMESTAMP_FILE}'), mmap_mode='r')[rows]
+        data = {name: np.array(np.load(config_dir.joinpath(f'{generation}_{i}.npy'), mmap_mode='r')[rows])
+                for i, name in enumerate(manifest['columns'])}
+
+        windowed = pd.DataFrame(data, index=_timestamps_from_ns(ns, manifest['timestamp_dtype'], timestamp_col))
+        windowed[label_col] = label
+        return windowed
+
+    def _save(self, config_dir: Path, manifest: Optional[dict], segments: List[dict], results: List[pd.DataFrame],
+              label_col: str, timestamp_dtype: str) -> None:
+        config_dir.mkdir(parents=True, exist_ok=True)
+        generation = manifest['generation'] + 1 if manifest else 0
+        columns = [col for col in results[0].columns if col != label_col]
+
+        offset = 0
+        for segment, windowed in zip(segments, results):
+            segment['offset'] = offset
+            segment['count'] = len(windowed)
+            offset += len(windowed)
+
+        # New files are written under a new generation, the manifest that points to them is replaced atomically.
+        np.save(config_dir.joinpath(f'{generation}_{TIMESTAMP_FILE}'),
+                np.concatenate([_timestamps_to_ns(windowed.index) for windowed in results]))
+        for i, col in enumerate(columns):
+            np.save(config_dir.joinpath(f'{generation}_{i}.npy'),
+                    np.concatenate([windowed[col].to_numpy(dtype=float) for windowed in results]))
+
+        new_manifest = {
+            'generation': generation,
+            'columns': columns,
+            'timestamp_dtype': timestamp_dtype,
+            'segments': segments
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=config_dir, prefix=MANIFEST_FILE, suffix='.tmp')
+        with os.fdopen(fd, mode='w') as f:
+            json.dump(new_manifest, f)
+        os.replace(tmp_path, config_dir.joinpath(MANIFEST_FILE))
+
+        # Remove the files of previous generations
+        for path in config_dir.glob('*.npy'):
+            if not path.name.startswith(f'{generation}_'):
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still memory mapped (on Windows), removed on the next save.
+                    pass
+
+
+def _timestamps_to_ns(index: pd.Index) -> np.ndarray:
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return np.asarray(index, dtype='datetime64[ns]').view('int64')
+
+
+def _timestamps_from_ns(ns: np.ndarray, dtype: str, name: str) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(np.asarray(ns, dtype='datetime64[ns]'), name=name)
+    tz = pd.api.types.pandas_dtype(dtype)
+
+    if isinstance(tz, pd.DatetimeTZDtype):
+        index = index.tz_localize('UTC').tz_convert(tz.tz)
+    return index.astype(dtype)
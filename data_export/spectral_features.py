@@ -0,0 +1,156 @@
+"""
+Frequency-domain features, computed for all windows of a segment at once.
+
+The windows of a segment are stacked into a matrix (one window per row) and transformed with a single `np.fft.rfft`
+call, instead of calling a Python function per window. The features can be used in `windowing.windowing` by passing
+their name instead of a function, e.g. `windowing(df, cols, label_col, timestamp_col, dom_freq='dominant_frequency')`.
+
+The spectral features are computed over the windows with their mean removed, so that the constant component (e.g.
+gravity) does not dominate the spectrum.
+"""
+import re
+from typing import Callable, Dict, List
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SPECTRAL_FEATURES: Dict[str, Callable] = {}
+"""Registered features by name. A feature takes the window matrix, its power spectrum and the frequencies of the
+spectrum, and returns one value per window."""
+
+BAND_ENERGY_PATTERN = re.compile(r'^band_energy_(\d+(?:\.\d+)?)_(\d+(?:\.\d+)?)$')
+"""Name of a band energy feature, with the lower (inclusive) and upper (exclusive) frequency in Hz, e.g.
+'band_energy_0.5_3'."""
+
+
+def register(name: str):
+    """
+    Decorator that registers a feature under `name`.
+    """
+    def decorator(func: Callable) -> Callable:
+        SPECTRAL_FEATURES[name] = func
+        return func
+
+    return decorator
+
+
+def is_spectral_feature(name) -> bool:
+    return isinstance(name, str) and (name in SPECTRAL_FEATURES or BAND_ENERGY_PATTERN.match(name) is not None)
+
+
+def get_feature(name: str) -> Callable:
+    if name in SPECTRAL_FEATURES:
+        return SPECTRAL_FEATURES[name]
+
+    match = BAND_ENERGY_PATTERN.match(name)
+    if match is None:
+        raise KeyError('Unknown spectral feature: {}'.format(name))
+
+    return band_energy(float(match.group(1)), float(match.group(2)))
+
+
+def window_matrix(values: np.ndarray, rpw: int, rph: int, stops: np.ndarray = None) -> np.ndarray:
+    """
+    Stacks the windows that `windowing` emits into a matrix, without copying. Row `k` contains the `rpw` values that
+    end at row `rpw - 1 + k * rph`, or before row `stops[k]` when `stops` is given.
+
+    :param values: The values of a column in a segment
+    :param rpw: The number of rows per window
+    :param rph: The number of rows per hop
+    :param stops: The row after the last row of every window, see `window_functions.window_bounds`. Every stop has
+        to be at least `rpw`.
+    :return: A read-only matrix with one window per row
+    """
+    if rpw < 1 or len(values) < rpw:
+        return np.empty((0, max(rpw, 0)), dtype=values.dtype)
+
+    if stops is not None:
+        return sliding_window_view(values, rpw)[np.asarray(stops) - rpw]
+
+    return sliding_window_view(values, rpw)[::rph]
+
+
+def compute(values: np.ndarray, names: List[str], rpw: int, rph: int, sampling_rate: float,
+            stops: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Computes spectral features for every window of a segment.
+
+    :param values: The values of a column in a segment
+    :param names: The names of the features to compute
+    :param rpw: The number of rows per window
+    :param rph: The number of rows per hop
+    :param sampling_rate: The number of rows per second
+    :param stops: The row after the last row of every window, if the windows are not `rph` rows apart. The features
+        are NaN for windows that end before row `rpw`.
+    :return: A dictionary from feature name to an array with one value per window
+    """
+    if not names:
+        return {}
+
+    values = np.asarray(values, dtype=float)
+
+    if stops is None:
+        windows = window_matrix(values, rpw, rph)
+        full = None
+    else:
+        full = np.asarray(stops) >= max(rpw, 1)
+        windows = window_matrix(values, rpw, rph, np.asarray(stops)[full])
+
+    spectrum = np.abs(np.fft.rfft(windows - windows.mean(axis=1, keepdims=True), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(windows.shape[1], d=1 / sampling_rate)
+    features = {name: get_feature(name)(windows, spectrum, freqs) for name in names}
+
+    if full is not None:
+        # Windows that end before row `rpw` have too few rows for a spectrum
+        for name, feature in features.items():
+            features[name] = np.full(len(full), np.nan)
+            features[name][full] = feature
+
+    return features
+
+
+def band_energy(low: float, high: float) -> Callable:
+    """
+    :return: A feature that computes the energy of the frequencies in [`low`, `high`) Hz, normalized by the window
+        length.
+    """
+    def feature(windows: np.ndarray, spectrum: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+        band = (freqs >= low) & (freqs < high)
+        return spectrum[:, band].sum(axis=1) / max(windows.shape[1], 1)
+
+    return feature
+
+
+@register('spectral_energy')
+def spectral_energy(windows: np.ndarray, spectrum: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    return spectrum.sum(axis=1) / max(windows.shape[1], 1)
+
+
+@register('dominant_frequency')
+def dominant_frequency(windows: np.ndarray, spectrum: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    if spectrum.shape[0] == 0:
+        return np.empty(0)
+
+    return freqs[spectrum.argmax(axis=1)]
+
+
+@register('spectral_entropy')
+def spectral_entropy(windows: np.ndarray, spectrum: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    """
+    Shannon entropy of the normalized power spectrum, normalized to [0, 1]. Constant windows have entropy 0.
+    """
+    total = spectrum.sum(axis=1, keepdims=True)
+    p = np.divide(spectrum, total, out=np.zeros_like(spectrum), where=total > 0)
+    log_p = np.log2(p, out=np.zeros_like(p), where=p > 0)
+
+    n_bins = spectrum.shape[1]
+    return -(p * log_p).sum(axis=1) / np.log2(n_bins) if n_bins > 1 else np.zeros(spectrum.shape[0])
+
+
+@register('sma')
+def signal_magnitude_area(windows: np.ndarray, spectrum: np.ndarray, freqs: np.ndarray) -> np.ndarray:
+    """
+    Signal magnitude area of a single axis: the mean absolute value in the window. The SMA over several axes is the
+    sum of the SMA of each axis.
+    """
+    return np.abs(windows).mean(axis=1)
@@ -0,0 +1,207 @@
+"""
+Evaluation of window functions (reducers) on the windows that `windowing` emits.
+
+`rolling(...).apply(func, raw=True)` calls `func` for the window ending at every row, while windowing only keeps one
+window per hop. Here, `func` is only called for the emitted windows. The bounds of each window are found with
+`np.searchsorted` on the timestamps, so the windows are exactly those of the time based rolling window: the rows with
+a timestamp in (end - window, end].
+
+When Numba is installed, window functions are compiled together with the loop over the windows. Functions that Numba
+cannot compile, such as NumPy functions passed directly or functions using pandas, are evaluated in Python.
+"""
+import threading
+import types
+import weakref
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+
+try:
+    import numba
+    from numba.core.errors import NumbaError
+except ImportError:
+    numba = None
+
+
+def _evaluate(func, values, starts, stops):
+    out = np.empty(len(starts))
+    for i in range(len(starts)):
+        out[i] = func(values[starts[i]:stops[i]])
+    return out
+
+
+def _compile(func: Callable) -> Callable:
+    """
+    Compiles the loop over the windows together with the function. The loop is compiled per function, because Numba
+    keeps the functions that are passed to a compiled function alive.
+
+    :raises TypeError: If the function is not a Python function
+    """
+    if not isinstance(func, types.FunctionType):
+        raise TypeError('{!r} is not a Python function'.format(func))
+
+    # Numba keeps a reference to the function it compiles. A copy does not keep `func` alive in the cache of
+    # `get_window_function`.
+    copy = types.FunctionType(func.__code__, func.__globals__, func.__name__, func.__defaults__, func.__closure__)
+    copy.__kwdefaults__ = func.__kwdefaults__
+    compiled_func = numba.njit(copy)
+
+    @numba.njit
+    def evaluate(values, starts, stops):
+        out = np.empty(len(starts))
+        for i in range(len(starts)):
+            out[i] = compiled_func(values[starts[i]:stops[i]])
+        return out
+
+    return evaluate
+
+
+class WindowFunction:
+
+    def __init__(self, func: Callable, compile: bool = True):
+        """
+        :param func: Function that reduces a 1-dimensional array of floats to a single number
+        :param compile: Whether to try to compile the function with Numba
+        """
+        self._func = func
+        self.compile = compile and numba is not None
+        self._compiled: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    @property
+    def func(self) -> Callable:
+        return self._func() if isinstance(self._func, weakref.ref) else self._func
+
+    def __getstate__(self):
+        # Window functions are sent to the processes of `windowing_parallel`, where they are compiled again
+        return {'func': self.func, 'compile': self.compile}
+
+    def __setstate__(self, state):
+        self.__init__(state['func'], state['compile'])
+
+    @property
+    def is_compiled(self) -> bool:
+        return self._compiled is not None
+
+    def evaluate(self, values: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+        """
+        Applies the function to `values[starts[i]:stops[i]]` for every window `i`.
+
+        :param values: The values of a column
+        :param starts: The first row of every window
+        :param stops: The row after the last row of every window
+        :return: The result of the function for every window
+        """
+        values = np.ascontiguousarray(values, dtype=float)
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+
+        if self.compile and self._compiled is None:
+            # Threads of `windowing_parallel` share the window function, it is wrapped by Numba once
+            with self._lock:
+                if self.compile and self._compiled is None:
+                    try:
+                        self._compiled = _compile(self.func)
+                    except TypeError:
+                        # Not a Python function, e.g. a built-in function or a callable object
+                        self.compile = False
+
+        compiled = self._compiled
+        if compiled is not None:
+            try:
+                return compiled(values, starts, stops)
+            except NumbaError:
+                # The function cannot be compiled (Numba raises when the function is first called with these
+                # types), so it is evaluated in Python from now on.
+                self.compile = False
+                self._compiled = None
+
+        return _evaluate(self.func, values, starts, stops)
+
+
+_registry: Dict[str, WindowFunction] = {}
+
+_wrapped: 'weakref.WeakKeyDictionary[Callable, WindowFunction]' = weakref.WeakKeyDictionary()
+"""The window functions of plain functions, which refer to their function weakly so that it can be released."""
+_wrapped_lock = threading.Lock()
+
+
+def register(name: str, func: Callable, compile: bool = True) -> WindowFunction:
+    """
+    Registers a window function, which can then be used in `windowing` by passing its name instead of a function.
+
+    :param name: The name of the window function
+    :param func: Function that reduces a 1-dimensional array of floats to a single number
+    :param compile: Whether to try to compile the function with Numba
+    :return: The registered window function
+    """
+    _registry[name] = WindowFunction(func, compile)
+    return _registry[name]
+
+
+def is_registered(name) -> bool:
+    return isinstance(name, str) and name in _registry
+
+
+def get_window_function(func: Union[str, Callable, WindowFunction]) -> WindowFunction:
+    """
+    :param func: The name of a registered window function, a window function, or a plain function
+    :return: The window function. Plain functions are wrapped once, so they are only compiled once.
+    """
+    if isinstance(func, WindowFunction):
+        return func
+    if isinstance(func, str):
+        return _registry[func]
+
+    if not isinstance(func, types.FunctionType):
+        # Only Python functions are compiled. Other callables, e.g. bound methods that are created on every access,
+        # are wrapped on every call.
+        return WindowFunction(func)
+
+    with _wrapped_lock:
+        wrapped = _wrapped.get(func)
+        if wrapped is None:
+            wrapped = WindowFunction(func)
+            wrapped._func = weakref.ref(func)
+            _wrapped[func] = wrapped
+        return wrapped
+
+
+def window_bounds(timestamps: np.ndarray, window: float, hop: float) -> (np.ndarray, np.ndarray):
+    """
+    Determines the rows of the windows that `windowing` emits for a segment.
+
+    Window `k` ends `window + k * hop` seconds after the first row and contains the rows within `window` seconds
+    before its last row. The ends are found with a binary search over the timestamps, so the windows stay `hop`
+    seconds apart when the sensor dropped samples or changed its sampling rate. A window is emitted when the segment
+    reaches its end, i.e. when the end is at most one sampling interval after the last row. Windows that end in the
+    same gap contain the same rows and are emitted once.
+
+    :param timestamps: The timestamps of the segment, sorted, as datetime64 values
+    :param window: The window length in seconds
+    :param hop: The time in seconds between the ends of consecutive windows
+    :return: The first row and the row after the last row of every window
+    """
+    ns = np.asarray(timestamps, dtype='datetime64[ns]').view(np.int64)
+    window_ns = int(round(window * 1e9))
+    hop_ns = int(round(hop * 1e9))
+
+    if len(ns) < 2:
+        stops = np.zeros(0, dtype=np.int64)
+    else:
+        count = max((int(ns[-1]) + int(ns[-1] - ns[-2]) - int(ns[0]) - window_ns) // hop_ns + 1, 0)
+        ends = ns[0] + window_ns + np.arange(count, dtype=np.int64) * hop_ns
+        stops = np.searchsorted(ns, ends, side='left').astype(np.int64)
+        stops = np.unique(stops[stops > 0])
+
+    starts = np.searchsorted(ns, ns[stops - 1] - window_ns, side='right')
+    return starts, stops
+
+
+# Every emitted window contains at least the row at its end, so the arrays are never empty.
+register('mean', lambda a: a.mean())
+register('std', lambda a: a.std())
+register('min', lambda a: a.min())
+register('max', lambda a: a.max())
+register('range', lambda a: a.max() - a.min())
+register('energy', lambda a: (a * a).mean())
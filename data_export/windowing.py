@@ -1,7 +1,17 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
 
+from data_export import spectral_features as sf
+from data_export import window_functions as wf
+from instrumentation import traced
+
+
+def _rows(df: pd.DataFrame, *args, **kwargs) -> int:
+    return len(df)
+
 
 def split_df(df, col):
     """
@@ -51,7 +61,31 @@ def nearest(items, pivot):
     return min(items, key=lambda x: abs(x - pivot))
 
 
-def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str, **funcs):
+def rows_per_window(df: pd.DataFrame, timestamp_col: str, window: float, hop: float) -> (int, int):
+    """
+    Determines how many rows of a segment fit in a window and in a hop, from the median interval between the rows.
+    The windows that are emitted are determined from time, see `window_functions.window_bounds`; the number of rows
+    per window is the length of the windows of which the spectral features are computed.
+
+    :param df: The segment, sorted by time.
+    :param timestamp_col: The column containing the timestamps.
+    :param window: The window length in seconds.
+    :param hop: The time in seconds between the ends of consecutive windows.
+    :return: The number of rows per window and per hop.
+    """
+    ns = df[timestamp_col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    intervals = np.diff(ns)
+
+    if len(intervals) == 0:
+        return 0, 0
+
+    interval = max(float(np.median(intervals)), 1.0)
+    return int(round(window * 1e9 / interval)), int(round(hop * 1e9 / interval))
+
+
+@traced('windowing.windowing', rows=_rows)
+def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str, window: float = 2,
+              hop: float = 1, **funcs):
     """
     Windows over a DataFrame by splitting it into segments based on the label column and
     windowing over every segment separately.
@@ -60,7 +94,12 @@ def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str,
     :param cols: The columns that should be used for windowing.
     :param label_col: The column containing the labels.
     :param timestamp_col: The column containing the timestamps.
-    :param funcs: A dictionary of function names and functions.
+    :param window: The window length in seconds.
+    :param hop: The time in seconds between the ends of consecutive windows.
+    :param funcs: A dictionary of function names and functions. Functions are only applied to the windows that are
+        kept, and compiled when possible, see `window_functions`. Instead of a function, the name of a window function
+        registered in `window_functions` or of a feature in `spectral_features` can be given. Spectral features are
+        computed for all windows of a segment at once.
     :return: A windowed DataFrame with the timestamp as index.
     """
     # Split DataFrame by label
@@ -69,37 +108,46 @@ def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str,
     # Initialise list to store results
     res = []
 
+    # Names of the spectral features, which are not applied per window
+    spectral_names = [func for func in funcs.values() if sf.is_spectral_feature(func)]
+
     # Window over every DataFrame in the dfs list
     for df in split_dfs:
         # Determine label of DataFrame
         label = df[label_col].iloc[0]
         df_rolls = []
 
-        # Determine index of timestamp 1 second after starting timestamp
-        pivot = df[timestamp_col].iloc[0] + timedelta(seconds=1)
-        cutoff = df.loc[df[timestamp_col] == nearest(df[timestamp_col].tolist(), pivot)]
+        # Determine the rows of the windows that are kept, other windows are never computed
+        starts, stops = wf.window_bounds(df[timestamp_col].to_numpy(dtype='datetime64[ns]'), window, hop)
 
-        # Determine rows per second of DataFrame (how many rows fit in 1 second)
-        rps = cutoff.index[0] - df.index[0]
+        # Determine how many rows fit in the windows of the spectral features
+        rpw, rph = rows_per_window(df, timestamp_col, window, hop) if spectral_names else (0, 0)
 
         for col in cols:
             # Get a DataFrame with only selected column and timestamp column
             df_col = df[[col, timestamp_col]]
+            values = df[col].to_numpy(dtype=float)
+
+            # Compute the spectral features of all windows of this column at once
+            spectral = sf.compute(values, spectral_names, rpw, rph, rph / hop, stops)
 
             if funcs:
                 for func_name, func in funcs.items():
                     # Determine new column name (based on function)
                     new_col = '%s_%s' % (col, func_name)
 
-                    # Roll over column and apply function
-                    df_roll = df_col.rolling(window='2s', on=timestamp_col).apply(func, raw=True)
+                    # Take the rows at the end of the emitted windows
+                    df_roll = df_col.iloc[stops - 1].copy()
+
+                    if isinstance(func, str) and func in spectral:
+                        df_roll[col] = spectral[func]
+                    else:
+                        # Apply the (possibly compiled) function to the emitted windows only
+                        df_roll[col] = wf.get_window_function(func).evaluate(values, starts, stops)
 
                     # Rename column to the new name
                     df_roll = df_roll.rename(columns={col: new_col})
 
-                    # Select 2 second windows with 1 second overlap from rolled DataFrame
-                    df_roll = df_roll[rps*2 - 1::rps]
-
                     # Add DataFrame to rolling list
                     df_rolls.append(df_roll)
             else:
@@ -108,13 +156,13 @@ def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str,
                 new_col = '%s_%s' % (col, 'mean')
 
                 # Roll over column and apply mean function
-                df_roll = df_col.rolling(window='2s', on=timestamp_col).mean()
+                df_roll = df_col.rolling(window=timedelta(seconds=window), on=timestamp_col).mean()
 
                 # Rename column to the new name
                 df_roll = df_roll.rename(columns={col: new_col})
 
-                # Select 2 second windows with 1 second overlap from rolled DataFrame
-                df_roll = df_roll[rps * 2 - 1::rps]
+                # Select windows that end `hop` seconds apart from rolled DataFrame
+                df_roll = df_roll.iloc[stops - 1]
 
                 # Add DataFrame to rolling list
                 df_rolls.append(df_roll)
@@ -138,7 +186,9 @@ def windowing(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str,
     return pd.concat(res).set_index(timestamp_col).sort_index(axis=1).sort_index(axis=0)
 
 
-def windowing_fast(df: pd.DataFrame, cols: [str], label_col='Label', timestamp_col='Timestamp'):
+@traced('windowing.windowing_fast', rows=_rows)
+def windowing_fast(df: pd.DataFrame, cols: [str], label_col='Label', timestamp_col='Timestamp', window: float = 2,
+                   hop: float = 1):
     """
     Windows over a DataFrame by splitting it into segments based on the label column and
     windowing over every segment separately.
@@ -147,6 +197,8 @@ def windowing_fast(df: pd.DataFrame, cols: [str], label_col='Label', timestamp_c
     :param cols: The columns that should be used for windowing.
     :param label_col: The column containing the labels.
     :param timestamp_col: The column containing the timestamps.
+    :param window: The window length in seconds.
+    :param hop: The time in seconds between the ends of consecutive windows.
     :return: A windowed DataFrame with the timestamp as index.
     """
     # Split DataFrame by label
@@ -161,75 +213,72 @@ def windowing_fast(df: pd.DataFrame, cols: [str], label_col='Label', timestamp_c
         label = df[label_col].iloc[0]
         df_rolls = []
 
-        # Determine index of timestamp 1 second after starting timestamp
-        pivot = df[timestamp_col].iloc[0] + timedelta(seconds=1)
-        cutoff = df.loc[df[timestamp_col] == nearest(df[timestamp_col].tolist(), pivot)]
-
-        # Determine rows per second of DataFrame
-        rps = cutoff.index[0] - df.index[0]
+        # Determine the rows at the end of the windows that end `hop` seconds apart
+        _, stops = wf.window_bounds(df[timestamp_col].to_numpy(dtype='datetime64[ns]'), window, hop)
+        ends = stops - 1
 
         for col in cols:
             # Get DataFrame with column and timestamp column
             df_col = df[[col, timestamp_col]]
 
             # Produce rolling object
-            roll = df_col.rolling(window='2s', on=timestamp_col)
+            roll = df_col.rolling(window=timedelta(seconds=window), on=timestamp_col)
 
             # Apply built-in rolling functions
-            # and take 2 second windows with 1 second overlap
+            # and take windows that end `hop` seconds apart
 
             # Mean
             df_roll = roll.mean()
             df_roll = df_roll.rename(columns={col: '%s_mean' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Max
             df_roll = roll.max()
             df_roll = df_roll.rename(columns={col: '%s_max' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Min
             df_roll = roll.min()
             df_roll = df_roll.rename(columns={col: '%s_min' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Median
             df_roll = roll.median()
             df_roll = df_roll.rename(columns={col: '%s_median' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Standard Deviation
             df_roll = roll.std()
             df_roll = df_roll.rename(columns={col: '%s_std' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # 25th Percentile
             df_roll = roll.quantile(.25)
             df_roll = df_roll.rename(columns={col: '%s_25_percentile' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # 75th Percentile
             df_roll = roll.quantile(.75)
             df_roll = df_roll.rename(columns={col: '%s_75_percentile' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Kurtosis
             df_roll = roll.kurt()
             df_roll = df_roll.rename(columns={col: '%s_kurtosis' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
             # Skewness
             df_roll = roll.skew()
             df_roll = df_roll.rename(columns={col: '%s_skewness' % col})
-            df_roll = df_roll[rps * 2 - 1::rps]
+            df_roll = df_roll.iloc[ends]
             df_rolls.append(df_roll)
 
         # Get timestamps from rolling
@@ -249,3 +298,61 @@ def windowing_fast(df: pd.DataFrame, cols: [str], label_col='Label', timestamp_c
 
     # Concatenate DataFrames from list into one single DataFrame and return it
     return pd.concat(res).set_index(timestamp_col).sort_index(axis=1).sort_index(axis=0)
+
+
+def _window_task(windowing_func, df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str, window: float,
+                 hop: float, funcs: dict) -> pd.DataFrame:
+    return windowing_func(df[cols + [label_col, timestamp_col]], cols, label_col, timestamp_col, window, hop, **funcs)
+
+
+@traced('windowing.windowing_parallel', rows=_rows)
+def windowing_parallel(df: pd.DataFrame, cols: [str], label_col: str, timestamp_col: str, window: float = 2,
+                       hop: float = 1, executor: Executor = None, max_workers: int = None, cols_per_task: int = 1,
+                       windowing_func=windowing, **funcs):
+    """
+    Windows over a DataFrame like `windowing_func`, but distributes the label segments and blocks of columns over an
+    executor. The result is the same as that of `windowing_func`.
+
+    By default a thread pool is used, which runs in parallel as far as the windowing releases the GIL (NumPy and
+    compiled window functions). A `concurrent.futures.ProcessPoolExecutor` can be passed as `executor` instead, in
+    which case `funcs` have to be picklable, e.g. functions defined at module level or names of registered functions.
+
+    :param df: The DataFrame to be windowed over.
+    :param cols: The columns that should be used for windowing.
+    :param label_col: The column containing the labels.
+    :param timestamp_col: The column containing the timestamps.
+    :param window: The window length in seconds.
+    :param hop: The time in seconds between the ends of consecutive windows.
+    :param executor: The executor to run the tasks, a thread pool is created if None.
+    :param max_workers: The number of threads of the created thread pool.
+    :param cols_per_task: The number of columns that are windowed in a single task.
+    :param windowing_func: The windowing function, `windowing` or `windowing_fast`.
+    :param funcs: A dictionary of function names and functions, see `windowing`.
+    :return: A windowed DataFrame with the timestamp as index.
+    """
+    segments = split_df(df, label_col)
+    blocks = [cols[i:i + cols_per_task] for i in range(0, len(cols), cols_per_task)]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    try:
+        futures = [[executor.submit(_window_task, windowing_func, segment, block, label_col, timestamp_col, window,
+                                    hop, funcs)
+                    for block in blocks]
+                   for segment in segments]
+
+        res = []
+        for segment_futures in futures:
+            block_results = [future.result() for future in segment_futures]
+
+            # Every block contains the label column, keep it once
+            res.append(pd.concat([block_results[0]] + [block.drop(columns=label_col) for block in block_results[1:]],
+                                 axis=1))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    # Stitch the segments back together in timestamp order
+    return pd.concat(res).sort_index(axis=1).sort_index(axis=0)
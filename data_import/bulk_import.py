@@ -0,0 +1,172 @@
+"""
+Registers all sensor data files in a directory tree at once.
+
+Only the header of each file is read, to find the sensor name and the start datetime. The sensor data itself is parsed
+when a file is opened. Reading the headers and computing the file fingerprints is done in a thread pool, while all
+database access happens on the calling thread, in a single transaction.
+"""
+import datetime as dt
+import ntpath
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import pytz
+
+from database.models import db, Sensor, SensorDataFile, SensorModel
+from date_utils import naive_to_utc
+from file_fingerprint import get_fingerprints, memo_key
+from models.sensor_metadata import SensorMetadata
+
+FILE_PATTERN = '*.csv'
+
+
+class BulkImportResult:
+
+    def __init__(self):
+        self.added: List[Path] = []
+        """The files that were registered."""
+        self.skipped: List[Path] = []
+        """The files that were already registered."""
+        self.failed: List[Tuple[Path, str]] = []
+        """The files of which the header could not be read, with the reason."""
+
+
+def find_sensor_data_files(directory: Path, pattern: str = FILE_PATTERN) -> List[Path]:
+    """
+    Find all sensor data files in a directory and its subdirectories.
+
+    :param directory: The directory to search
+    :param pattern: The glob pattern of sensor data file names
+    :return: The sorted paths of the files
+    """
+    return sorted(path for path in Path(directory).rglob(pattern) if path.is_file())
+
+
+def read_header(file_path: Path, sensor_model: SensorModel) -> Tuple[Optional[str], Optional[dt.datetime]]:
+    """
+    Read the sensor name and start datetime from the header of a sensor data file. Does not access the database.
+
+    :param file_path: The path of the sensor data file
+    :param sensor_model: The sensor model that describes the layout of the file
+    :return: The sensor name and the naive start datetime, both None if the sensor model does not specify them
+    """
+    metadata = SensorMetadata(file_path, sensor_model, sensor_model.id)
+    metadata.load_values()
+
+    if metadata.sensor_name is not None and not isinstance(metadata.sensor_name, str):
+        raise ValueError('Sensor name not found in header')
+
+    return metadata.sensor_name, metadata.parse_naive_datetime()
+
+
+def _read_header_safe(args):
+    file_path, sensor_model = args
+
+    try:
+        return read_header(file_path, sensor_model), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def import_directory(directory: Path, sensor_model: SensorModel, max_workers: int = None,
+                     max_variables: int = 500, progress: Callable[[int, int], None] = None) -> BulkImportResult:
+    """
+    Register all sensor data files in a directory tree that are not registered yet.
+
+    :param directory: The directory that contains the sensor data files
+    :param sensor_model: The sensor model of all files in the directory
+    :param max_workers: The number of threads that read headers and compute fingerprints
+    :param max_variables: The maximum number of query parameters, SQLite limits the number of query parameters
+    :param progress: Called with the number of processed steps and the total number of steps, every file is
+        fingerprinted and then its header is read
+    :return: Which files were added, skipped or failed
+    """
+    result = BulkImportResult()
+    file_paths = find_sensor_data_files(directory)
+
+    if not file_paths:
+        return result
+
+    total = 2 * len(file_paths)
+
+    def fingerprint_progress(done: int):
+        if progress is not None:
+            progress(done, total)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # A file that cannot be read fails, the other files are still imported
+        unreadable = {}
+        fingerprints = get_fingerprints(file_paths, max_variables, executor, failed=unreadable,
+                                        progress=fingerprint_progress)
+
+        readable = [path for path in file_paths if memo_key(path) in fingerprints]
+        result.failed.extend((path, unreadable[memo_key(path)]) for path in file_paths
+                             if memo_key(path) in unreadable)
+
+        # The headers of the unreadable files are not read
+        done = total - len(readable)
+        headers = []
+        for i, header in enumerate(executor.map(_read_header_safe, [(path, sensor_model) for path in readable])):
+            headers.append(header)
+
+            if progress is not None:
+                progress(done + i + 1, total)
+
+    file_paths = readable
+
+    # Skip files that have been registered before, possibly at another location
+    hashes = [fingerprints[memo_key(path)] for path in file_paths]
+    registered = set()
+    for i in range(0, len(hashes), max_variables):
+        query = (SensorDataFile
+                 .select(SensorDataFile.file_id_hash)
+                 .where(SensorDataFile.file_id_hash.in_(hashes[i:i + max_variables])))
+        registered.update(sdf.file_id_hash for sdf in query)
+
+    sensors = {}
+    rows = []
+
+    with db.atomic():
+        for file_path, file_id_hash, (header, error) in zip(file_paths, hashes, headers):
+            if error is not None:
+                result.failed.append((file_path, error))
+                continue
+
+            if file_id_hash in registered:
+                result.skipped.append(file_path)
+                continue
+
+            # The same file may occur twice in the directory tree
+            registered.add(file_id_hash)
+
+            sensor_name, naive_dt = header
+            sensor = None
+
+            if sensor_name is not None:
+                if sensor_name not in sensors:
+                    sensors[sensor_name] = Sensor.get_or_create(name=sensor_name,
+                                                                defaults={'model': sensor_model.id})[0]
+                sensor = sensors[sensor_name]
+
+            # The start datetime can only be converted to UTC when the timezone of the sensor is known, otherwise it
+            # is set when the file is opened.
+            utc_dt = None
+            if naive_dt is not None and sensor is not None and sensor.timezone is not None:
+                utc_dt = naive_to_utc(naive_dt, pytz.timezone(sensor.timezone))
+
+            rows.append({
+                'file_name': ntpath.basename(file_path.as_posix()),
+                'file_path': file_path.as_posix(),
+                'file_id_hash': file_id_hash,
+                'sensor': sensor.id if sensor is not None else -1,
+                'datetime': utc_dt
+            })
+            result.added.append(file_path)
+
+        # Each row has 5 parameters.
+        batch_size = max(1, max_variables // 5)
+        for i in range(0, len(rows), batch_size):
+            SensorDataFile.insert_many(rows[i:i + batch_size]).on_conflict_ignore().execute()
+
+    return result
@@ -0,0 +1,74 @@
+"""
+Compact dtypes for sensor data, enabled with the 'compact_dtypes' project setting.
+
+By default pandas reads every sensor channel as float64 or int64. Storing a float channel as float32 halves its
+memory, but rounds its values to about seven significant digits. A channel is only stored as float32 when no value
+changes by more than `FLOAT32_TOLERANCE` times the range of the channel, which sensor values with few significant
+digits satisfy, while e.g. epoch timestamps would lose their differences and stay float64. Labels are stored as a
+categorical column instead of a column of Python strings. The timestamp column is left as it is, because relative
+timestamps of long recordings do need the precision of float64; absolute timestamps are datetime64, which is already
+stored as int64 nanoseconds.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+FLOAT32_TOLERANCE = 1e-6
+"""The error up to which float64 values are stored as float32, relative to the range of the values in the column."""
+
+INT32_RANGE = (np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+
+
+def compact_column(series: pd.Series) -> pd.Series:
+    """
+    :return: The column as float32 if it is a float column whose values keep their precision in float32, as int32 if
+        it is an integer column whose values fit in int32, and otherwise the column itself
+    """
+    if pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32 and series.notna().any():
+        values = series.to_numpy()
+        with np.errstate(over='ignore', invalid='ignore'):
+            downcast = values.astype(np.float32)
+            # E.g. epoch timestamps lose the differences between the values in float32
+            tolerance = FLOAT32_TOLERANCE * (np.nanmax(values) - np.nanmin(values))
+
+            if np.allclose(downcast, values, rtol=0, atol=tolerance, equal_nan=True):
+                return pd.Series(downcast, index=series.index, name=series.name)
+
+    elif pd.api.types.is_integer_dtype(series.dtype) and series.dtype.itemsize > 4 and len(series) > 0:
+        # Smaller integers would overflow in the formulas of the user
+        if INT32_RANGE[0] <= series.min() and series.max() <= INT32_RANGE[1]:
+            return series.astype(np.int32)
+
+    return series
+
+
+def compact_frame(df: pd.DataFrame, skip: List[str] = ()) -> pd.DataFrame:
+    """
+    Replaces the columns of the DataFrame with their compact columns, see `compact_column`.
+
+    :param df: The DataFrame, changed in place
+    :param skip: The columns that are kept as they are
+    :return: The same DataFrame
+    """
+    for name in df.columns:
+        if name not in skip:
+            df[name] = compact_column(df[name])
+
+    return df
+
+
+def categorical_labels(times: np.ndarray, labels: List[Tuple[int, int, str]]) -> pd.Categorical:
+    """
+    :param times: The times of the rows as nanoseconds since the epoch in UTC
+    :param labels: The labels as (start, end, activity), with the start and end in the same representation as the
+        times. Later labels take precedence over earlier labels.
+    :return: The activity of every row, the empty string for rows without a label
+    """
+    categories = [""] + sorted({activity for _, _, activity in labels} - {""})
+    codes = np.zeros(len(times), dtype=np.int32)
+
+    for start, end, activity in labels:
+        codes[(times >= start) & (times < end)] = categories.index(activity)
+
+    return pd.Categorical.from_codes(codes, categories)
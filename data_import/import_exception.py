@@ -1,4 +1,27 @@
 class ImportException(Exception):
+    """The sensor data could not be imported."""
+    title = "Could not import sensor data"
 
-    def __init__(self, message):
+    def __init__(self, message, details: str = None):
+        """
+        :param message: What went wrong
+        :param details: How the user can resolve the problem
+        """
         super(ImportException, self).__init__(message)
+        self.details = details
+
+    def describe(self) -> str:
+        """
+        :return: The message followed by the details
+        """
+        return "\n\n".join(filter(None, [str(self), self.details]))
+
+
+class TimestampParseException(ImportException):
+    """The timestamps in the sensor data file could not be parsed with the settings of the sensor model."""
+    title = "Could not parse timestamps"
+
+
+class DatetimeFormatException(ImportException):
+    """The datetimes in the sensor data file do not match the format string of the sensor model."""
+    title = "Invalid datetime format"
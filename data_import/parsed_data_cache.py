@@ -0,0 +1,131 @@
+"""
+Disk cache of parsed sensor data.
+
+Parsing a sensor data file, i.e. reading the CSV, converting the units, evaluating the formulas and adding the
+absolute timestamps, takes much longer than reading the resulting DataFrame from a pickle. The cache stores the parsed
+DataFrame of a file under a key that covers everything the result depends on: the fingerprint of the file, the sensor
+model, the timezones, the conversions and formulas of the project and the version of the cache format.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from constants import COMPACT_DTYPES
+
+CACHE_VERSION = 2
+"""Incremented when the way sensor data is parsed changes, so that older entries are not used anymore."""
+
+MAX_ENTRIES = 8
+"""The number of most recently used files that are kept."""
+
+ENTRY_DATA = 'data'
+ENTRY_COLUMNS = 'columns'
+ENTRY_UTC_DT = 'utc_dt'
+ENTRY_FORMULAS = 'formulas'
+ENTRY_SAMPLING_INDEX = 'sampling_index'
+
+COLUMN_SETTINGS = ('_data_type', '_sensor_name', '_sampling_rate', '_unit', '_conversion')
+"""The suffixes of the project settings of the columns, which influence how sensor data is parsed."""
+
+
+def column_settings(settings: dict) -> dict:
+    """
+    :param settings: The project settings
+    :return: The settings of the columns, e.g. their conversions, and whether compact dtypes are used
+    """
+    return {name: value for name, value in settings.items()
+            if name.endswith(COLUMN_SETTINGS) or name == COMPACT_DTYPES}
+
+
+class ParsedDataCache:
+
+    def __init__(self, cache_dir: Path, max_entries: int = MAX_ENTRIES):
+        """
+        :param cache_dir: The directory in which the entries are stored
+        :param max_entries: The number of entries that are kept, the least recently used entries are removed
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(fingerprint: str, sensor_model: dict, sensor_timezone: str, project_timezone: str, settings: dict,
+            formulas: Dict[str, str]) -> str:
+        """
+        :param fingerprint: The fingerprint of the sensor data file
+        :param sensor_model: The fields of the sensor model
+        :param sensor_timezone: The timezone of the sensor
+        :param project_timezone: The timezone of the project
+        :param settings: The project settings of the columns, e.g. their conversions
+        :param formulas: The formulas of the project by name
+        :return: The key of the entry
+        """
+        config = json.dumps([CACHE_VERSION, fingerprint, sensor_model, str(sensor_timezone), str(project_timezone),
+                             settings, formulas], sort_keys=True, default=str)
+        return hashlib.blake2b(config.encode('utf-8'), digest_size=16).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir.joinpath(key + '.pkl')
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        :return: The entry with the parsed DataFrame, the parsed columns, the start datetime in UTC, the formulas that
+            were added and the sampling index, or None if there is no (readable) entry
+        """
+        path = self.entry_path(key)
+
+        if not path.is_file():
+            return None
+
+        try:
+            with path.open('rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            # A corrupt or incompatible entry is treated as missing, it is overwritten when the file is parsed again.
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+        return entry
+
+    def save(self, key: str, data, columns: List[str], utc_dt, formulas: List[str], sampling_index=None) -> None:
+        """
+        :param key: The key of the entry
+        :param data: The parsed DataFrame
+        :param columns: The columns as they were read from the file
+        :param utc_dt: The start datetime of the sensor data in UTC
+        :param formulas: The names of the formulas that were added to the DataFrame
+        :param sampling_index: The `SamplingIndex` of the data
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.entry_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=path.name, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({ENTRY_DATA: data, ENTRY_COLUMNS: list(columns), ENTRY_UTC_DT: utc_dt,
+                             ENTRY_FORMULAS: list(formulas), ENTRY_SAMPLING_INDEX: sampling_index}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until at most `max_entries` are left.
+        """
+        entries = sorted(self.cache_dir.glob('*.pkl'), key=lambda p: p.stat().st_mtime, reverse=True)
+
+        for path in entries[self.max_entries:]:
+            try:
+                path.unlink()
+            except OSError:
+                # Removed by another process, or still opened on Windows
+                pass
@@ -0,0 +1,197 @@
+"""
+Index of the contiguous runs of samples in sensor data.
+
+Sensors drop samples, and some pause recording or change their sampling rate, so the rate of a file cannot be derived
+from the first rows and the rows cannot be found from a time by assuming a constant rate. The index is built once when
+the absolute times of a file are computed. It splits the rows into runs, which are separated by gaps where the samples
+are more than `GAP_FACTOR` times the median of the surrounding intervals apart, or where the time goes back. Because
+the median is local, a change of the sampling rate does not split a run. For every run it keeps the
+first row, the first and last time and the effective sampling rate, so that the rate at a time and the rows within a
+timespan are found with a binary search over the runs and the times.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from date_utils import NAT_NS
+
+GAP_FACTOR = 2
+"""Samples that are further apart than this many times the median interval are on both sides of a gap."""
+
+NEIGHBOURS = 16
+"""The number of surrounding intervals of which the median is taken."""
+
+SECOND = 10 ** 9
+
+
+class SamplingRun:
+
+    def __init__(self, first: int, stop: int, start_ns: int, end_ns: int, rate: Optional[float]):
+        self.first = first
+        """The first row of the run."""
+        self.stop = stop
+        """The row after the last row of the run."""
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.rate = rate
+        """The number of samples per second, None for a run of one sample."""
+
+    def __len__(self) -> int:
+        return self.stop - self.first
+
+    def __repr__(self) -> str:
+        return f"SamplingRun(rows={self.first}:{self.stop}, rate={self.rate})"
+
+
+class SamplingIndex:
+
+    def __init__(self, firsts: np.ndarray, stops: np.ndarray, starts_ns: np.ndarray, ends_ns: np.ndarray,
+                 monotonic: bool):
+        """
+        Use `build` to index the times of sensor data.
+
+        :param firsts: The first row of every run
+        :param stops: The row after the last row of every run
+        :param starts_ns: The time of the first row of every run, in nanoseconds since the epoch in UTC
+        :param ends_ns: The time of the last row of every run
+        :param monotonic: Whether the times never go back, so that rows can be found with a binary search
+        """
+        self.firsts = firsts
+        self.stops = stops
+        self.starts_ns = starts_ns
+        self.ends_ns = ends_ns
+        self.monotonic = monotonic
+
+    @classmethod
+    def build(cls, utc_ns: np.ndarray) -> 'SamplingIndex':
+        """
+        :param utc_ns: The time of every row in nanoseconds since the epoch in UTC, see `SensorData.utc_ns`
+        """
+        utc_ns = np.asarray(utc_ns, dtype=np.int64)
+
+        if len(utc_ns) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, empty, empty, empty, True)
+
+        intervals = np.diff(utc_ns)
+        missing = (utc_ns[:-1] == NAT_NS) | (utc_ns[1:] == NAT_NS)
+        invalid = missing | (intervals <= 0)
+
+        breaks = np.flatnonzero(invalid)
+        positive = intervals[~invalid]
+
+        if len(positive):
+            # Only intervals that are longer than twice the shortest interval can be gaps, so that the median of the
+            # surrounding intervals is only taken for a few intervals
+            candidates = np.flatnonzero(~invalid & (intervals > GAP_FACTOR * positive.min()))
+            padded = np.pad(np.where(invalid, np.nan, intervals.astype(np.float64)), NEIGHBOURS // 2,
+                            constant_values=np.nan)
+            local = np.nanmedian(sliding_window_view(padded, NEIGHBOURS + 1)[candidates], axis=1)
+            breaks = np.union1d(breaks, candidates[intervals[candidates] > GAP_FACTOR * local])
+
+        # A run ends before a gap, a step back in time or a missing time
+        breaks = breaks + 1
+        firsts = np.concatenate([[0], breaks]).astype(np.int64)
+        stops = np.concatenate([breaks, [len(utc_ns)]]).astype(np.int64)
+
+        valid = utc_ns[utc_ns != NAT_NS]
+        monotonic = bool(np.all(np.diff(valid) >= 0)) and len(valid) == len(utc_ns)
+
+        return cls(firsts, stops, utc_ns[firsts], utc_ns[stops - 1], monotonic)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of runs
+        """
+        return len(self.firsts)
+
+    @property
+    def rows(self) -> int:
+        return int(self.stops[-1]) if len(self.stops) else 0
+
+    @property
+    def rates(self) -> np.ndarray:
+        """
+        :return: The effective sampling rate of every run in samples per second, NaN for runs of one sample
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            durations = (self.ends_ns - self.starts_ns) / SECOND
+            return np.where(durations > 0, (self.stops - self.firsts - 1) / durations, np.nan)
+
+    @property
+    def rate(self) -> Optional[float]:
+        """
+        :return: The effective sampling rate of the run with the most rows, None if no run has a rate
+        """
+        rates = self.rates
+        sizes = np.where(np.isnan(rates), -1, self.stops - self.firsts)
+
+        if len(sizes) == 0 or sizes.max() < 0:
+            return None
+
+        return float(rates[np.argmax(sizes)])
+
+    def runs(self) -> List[SamplingRun]:
+        return [SamplingRun(int(first), int(stop), int(start), int(end), None if np.isnan(rate) else float(rate))
+                for first, stop, start, end, rate in zip(self.firsts, self.stops, self.starts_ns, self.ends_ns,
+                                                         self.rates)]
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """
+        :return: The gaps between the runs, as the time of the last sample before and the first sample after the gap
+        """
+        return list(zip(self.ends_ns[:-1].tolist(), self.starts_ns[1:].tolist()))
+
+    def run_at(self, time_ns: int) -> Optional[int]:
+        """
+        :return: The number of the run that spans the time, None if the time is in a gap or outside the data
+        """
+        if not self.monotonic:
+            runs = np.flatnonzero((self.starts_ns <= time_ns) & (time_ns <= self.ends_ns))
+            return int(runs[0]) if len(runs) else None
+
+        run = int(np.searchsorted(self.starts_ns, time_ns, side='right')) - 1
+        if run < 0 or time_ns > self.ends_ns[run]:
+            return None
+        return run
+
+    def rate_at(self, time_ns: int) -> Optional[float]:
+        """
+        :return: The effective sampling rate at the time, None if the time is in a gap or outside the data
+        """
+        run = self.run_at(time_ns)
+        if run is None:
+            return None
+
+        rate = self.rates[run]
+        return None if np.isnan(rate) else float(rate)
+
+    def rows_between(self, utc_ns: np.ndarray, start_ns: int, end_ns: int) -> Optional[Tuple[int, int]]:
+        """
+        :param utc_ns: The times that were indexed
+        :param start_ns: The start of the timespan
+        :param end_ns: The end of the timespan, which is excluded
+        :return: The first row and the row after the last row within the timespan, or None if the times are not
+            monotonic, so that the rows of the timespan are not contiguous
+        """
+        if not self.monotonic:
+            return None
+
+        return int(np.searchsorted(utc_ns, start_ns, side='left')), int(np.searchsorted(utc_ns, end_ns, side='left'))
+
+    def slice(self, utc_ns: np.ndarray, first: int, stop: int) -> 'SamplingIndex':
+        """
+        :param utc_ns: The times that were indexed
+        :return: The index of the rows from `first` up to `stop`
+        """
+        lo = int(np.searchsorted(self.stops, first, side='right'))
+        hi = int(np.searchsorted(self.firsts, stop, side='left'))
+        firsts = np.maximum(self.firsts[lo:hi], first)
+        stops = np.minimum(self.stops[lo:hi], stop)
+
+        # An empty range within a run has no rows to keep
+        non_empty = stops > firsts
+        firsts, stops = firsts[non_empty], stops[non_empty]
+
+        return SamplingIndex(firsts - first, stops - first, utc_ns[firsts], utc_ns[stops - 1], self.monotonic)
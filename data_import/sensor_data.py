@@ -1,15 +1,20 @@
 import datetime as dt
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 import pytz
-from PyQt5.QtWidgets import QMessageBox
 
 import parse_function.custom_function_parser as parser
-from constants import ABSOLUTE_DATETIME, RELATIVE_TIME_ITEM, ABSOLUTE_TIME_ITEM
+from constants import ABSOLUTE_DATETIME, RELATIVE_TIME_ITEM, ABSOLUTE_TIME_ITEM, COMPACT_DTYPES
 from data_import import sensor as sens, column_metadata as cm
+from data_import.compact_dtypes import compact_column, compact_frame, categorical_labels
+from data_import.import_exception import TimestampParseException, DatetimeFormatException
+from data_import.sampling_index import SamplingIndex
 from database.models import *
-from date_utils import utc_to_local
+from date_utils import utc_to_local, to_utc_ns, timestamps_to_utc_ns, NAT_NS
+from instrumentation import span, traced
 from machine_learning.classifier import CLASSIFIER_NAN
 from models.sensor_metadata import SensorMetadata
 from parse_function.parse_exception import ParseException
@@ -20,6 +25,10 @@ LABEL_INDEX = 2
 COLUMN_TIMESTAMP = ABSOLUTE_DATETIME
 
 
+def _rows(sensor_data, *args, **kwargs) -> int:
+    return len(sensor_data._df)
+
+
 class SensorData:
 
     def __init__(self, project_controller, file_path: Path, sensor_model_id):
@@ -33,34 +42,46 @@ class SensorData:
         self.metadata = SensorMetadata(self.file_path, self.sensor_model, sensor_model_id)
         self.col_metadata = dict()
         self.project_timezone = pytz.timezone(self.project_controller.get_setting('timezone'))
+        self.compact_dtypes = bool(self.project_controller.get_setting(COMPACT_DTYPES))
+        """Whether to use the compact dtypes of `data_import.compact_dtypes`."""
 
         # Parse metadata and data
         self._df = None
+        self.utc_ns = None
+        """The time of every row as int64 nanoseconds since the epoch in UTC, set by `add_abs_dt_col`."""
+        self.sampling_index: Optional[SamplingIndex] = None
+        """The runs and gaps of `utc_ns`, set by `add_abs_dt_col`."""
         self.parse()
 
     def __copy__(self):
-        new = type(self)(self.project_controller, self.file_path, self.sensor_model_id)
+        # Skip __init__, which reads the header of the file again
+        new = type(self).__new__(type(self))
         new.__dict__.update(self.__dict__)
         return new
 
+    @traced('sensor_data.parse')
     def parse(self):
         """
         Parses a csv file to get metadata and data.
 
         :return: the parsed data as a DataFrame
+        :raises TimestampParseException: If the relative timestamps are not numbers
         """
-        if not self._df:
+        if self._df is None:
             self.metadata.load_values()
             if not self.metadata.sensor_timezone:
                 return
             self.metadata.parse_datetime()
 
             # Parse data from file
-            self._df = pd.read_csv(self.file_path,
-                                   names=list(filter(None, self.metadata.col_names)),
-                                   skip_blank_lines=False,
-                                   skiprows=self.sensor_model.col_names_row + 1,
-                                   comment=self.sensor_model.comment_style if self.sensor_model.comment_style else None)
+            with span('sensor_data.read_csv', file=Path(self.file_path).name) as read_span:
+                self._df = pd.read_csv(self.file_path,
+                                       names=list(filter(None, self.metadata.col_names)),
+                                       skip_blank_lines=False,
+                                       skiprows=self.sensor_model.col_names_row + 1,
+                                       comment=self.sensor_model.comment_style if self.sensor_model.comment_style
+                                       else None)
+                read_span.rows = len(self._df)
 
             self._df.columns = self._df.columns.str.strip()
             columns = self._df.columns.values.tolist()
@@ -82,7 +103,8 @@ class SensorData:
                     parsed_expr = parser.parse(conversion)
 
                     # Apply parsed expression to the data
-                    self._df.eval(name + " = " + parsed_expr, inplace=True)
+                    with span('sensor_data.convert', len(self._df), column=name, expression=parsed_expr):
+                        self._df.eval(name + " = " + parsed_expr, inplace=True)
             except ParseException:
                 # Pass ParseException
                 raise
@@ -90,15 +112,33 @@ class SensorData:
             if self.sensor_model.relative_absolute == RELATIVE_TIME_ITEM:
                 try:
                     self.normalize_rel_datetime_column()
-                except TypeError:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Critical)
-                    msg.setWindowTitle("Could not parse timestamps")
-                    msg.setText("The timestamps in your sensor data file could not be parsed."
-                                "Please verify that all settings are correct, including the "
-                                "absolute/relative time option and the comment style.")
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    msg.exec()
+                except TypeError as e:
+                    raise TimestampParseException(
+                        "The timestamps in your sensor data file could not be parsed.",
+                        "Please verify that all settings are correct, including the absolute/relative time option "
+                        "and the comment style."
+                    ) from e
+
+            if self.compact_dtypes:
+                with span('sensor_data.compact', len(self._df)):
+                    compact_frame(self._df, skip=[self._df.columns[self.sensor_model.timestamp_column]])
+
+    def restore(self, df: pd.DataFrame, columns: [str], utc_dt: dt.datetime, sampling_index: SamplingIndex = None):
+        """
+        Uses sensor data that was parsed before, e.g. in a previous session, instead of parsing the file.
+
+        :param df: The parsed DataFrame
+        :param columns: The columns as they were read from the file
+        :param utc_dt: The start datetime of the sensor data in UTC
+        :param sampling_index: The sampling index of the data, built again if it has absolute times and it is None
+        """
+        self._df = df
+        self.metadata.utc_dt = utc_dt
+        self.set_column_metadata(columns)
+
+        if ABSOLUTE_DATETIME in df.columns and isinstance(df[ABSOLUTE_DATETIME].dtype, pd.DatetimeTZDtype):
+            self.utc_ns = timestamps_to_utc_ns(df[ABSOLUTE_DATETIME])
+            self.sampling_index = sampling_index if sampling_index is not None else SamplingIndex.build(self.utc_ns)
 
     def set_column_metadata(self, columns):
         """
@@ -138,6 +178,15 @@ class SensorData:
         else:
             return self._df[self._df["Label"] == label]
 
+    def get_column_names(self) -> [str]:
+        return list(self._df.columns)
+
+    def get_columns(self, columns: [str]) -> pd.DataFrame:
+        """
+        :return: A copy of the given columns, the other columns are not copied like in `get_data`
+        """
+        return self._df[columns]
+
     def add_column_from_func(self, name: str, func: str):
         """
         Constructs a new column in the data frame using a given function.
@@ -151,7 +200,11 @@ class SensorData:
             parsed_expr = parser.parse(func)
 
             # Apply parsed expression to data to create new column
-            self._df.eval(name + " = " + parsed_expr, inplace=True)
+            with span('sensor_data.add_column_from_func', len(self._df), column=name, expression=parsed_expr):
+                self._df.eval(name + " = " + parsed_expr, inplace=True)
+
+                if self.compact_dtypes:
+                    self._df[name] = compact_column(self._df[name])
         except ParseException:
             # Pass ParseException
             raise
@@ -167,85 +220,92 @@ class SensorData:
             pd.to_timedelta(self._df[time_col], unit=time_unit) + \
             utc_to_local(self.metadata.utc_dt, self.project_timezone)
 
+    @traced('sensor_data.add_abs_dt_col', rows=_rows)
     def add_abs_dt_col(self, use_tznaive=False):
         """
-        Add an absolute time column to the existing dataframe.
+        Add an absolute time column to the existing dataframe, and set `utc_ns` to the same times in UTC.
+
+        The times are computed once as nanoseconds in UTC. The column is converted from those, so that the local times
+        are also correct when the recording spans a daylight saving time transition.
+
+        :param use_tznaive: Whether to use the naive datetime in the project timezone
+        :return: True when the column is added
+        :raises DatetimeFormatException: If the timestamps do not match the settings of the sensor model
         """
         time_col = self.sensor_model.timestamp_column
 
         # If time column is relative, convert relative time to absolute time
         if self.sensor_model.relative_absolute == RELATIVE_TIME_ITEM:
-            time_unit = self.sensor_model.timestamp_unit
-
-            # Add absolute datetime column to dataframe
-            if use_tznaive:
-                self._df[ABSOLUTE_DATETIME] = \
-                    utc_to_local(self.metadata.utc_dt, self.project_timezone).replace(tzinfo=None) + \
-                    pd.to_timedelta(self._df.iloc[:, time_col],unit=time_unit)
+            if self.metadata.utc_dt is None:
+                # Relative time format could not be parsed.
+                self.sensor_model.relative_absolute = ABSOLUTE_TIME_ITEM
             else:
                 try:
-                    self._df[ABSOLUTE_DATETIME] = \
-                        utc_to_local(self.metadata.utc_dt, self.project_timezone) + \
-                        pd.to_timedelta(self._df.iloc[:, time_col], unit=time_unit)
+                    offsets = pd.to_timedelta(self._df.iloc[:, time_col], unit=self.sensor_model.timestamp_unit)
                 except ValueError as e:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Critical)
-                    msg.setWindowTitle("Invalid datetime string format")
-                    msg.setText("Error: " + str(e))
-                    msg.setInformativeText("The sensor datetime string format you entered is invalid. "
-                                           f"Please change it to the correct format under Sensor > Sensor models > "
-                                           f"[sensor model name] > View settings.")
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    msg.exec()
-                    return False
-                except AttributeError:
-                    # Relative time format could not be parsed.
-                    self.sensor_model.relative_absolute = ABSOLUTE_TIME_ITEM
+                    raise DatetimeFormatException(
+                        "Error: " + str(e),
+                        "The sensor datetime string format you entered is invalid. Please change it to the correct "
+                        "format under Sensor > Sensor models > [sensor model name] > View settings."
+                    ) from e
+
+                offsets_ns = offsets.to_numpy(dtype='timedelta64[ns]').view(np.int64)
+                self.utc_ns = np.where(offsets.isna().to_numpy(), NAT_NS,
+                                       to_utc_ns(self.metadata.utc_dt) + offsets_ns)
 
         # If time column is absolute, rename the column
         if self.sensor_model.relative_absolute == ABSOLUTE_TIME_ITEM:
             self._df.rename(columns={self._df.columns[time_col]: ABSOLUTE_DATETIME}, inplace=True)
+            timestamps = self._df[ABSOLUTE_DATETIME]
 
             # Make sure the column is datetime
-            if not pd.api.types.is_datetime64_any_dtype(self._df[ABSOLUTE_DATETIME]):
+            if not pd.api.types.is_datetime64_any_dtype(timestamps):
                 try:
                     # Convert to datetime
-                    self._df[ABSOLUTE_DATETIME] = pd.to_datetime(
-                        self._df[ABSOLUTE_DATETIME],
+                    timestamps = pd.to_datetime(
+                        timestamps,
                         errors='raise',
                         format=self.sensor_model.format_string,
                         exact=True
                     )
 
-                except ValueError as e:
-                    msg = QMessageBox()
-                    msg.setIcon(QMessageBox.Critical)
-                    msg.setWindowTitle("Parse DateTime Error")
-                    msg.setText("Error: " + str(e))
-                    msg.setInformativeText("Could not add datetime column in data. Please verify "
-                                           "the format string in the sensor model settings. ")
-                    msg.setStandardButtons(QMessageBox.Ok)
-                    msg.exec()
-                    return False
-                except:
-                    return False
-
-                # Localize to sensor timezone and convert to project timezone
-                self._df[ABSOLUTE_DATETIME] = self._df[ABSOLUTE_DATETIME].dt.tz_localize(
-                    self.metadata.sensor_timezone).dt.tz_convert(self.project_timezone)
+                except (ValueError, TypeError) as e:
+                    raise DatetimeFormatException(
+                        "Error: " + str(e),
+                        "Could not add datetime column in data. Please verify the format string in the sensor model "
+                        "settings."
+                    ) from e
+
+            # Localize to sensor timezone
+            if timestamps.dt.tz is None:
+                timestamps = self.localize(timestamps, self.metadata.sensor_timezone)
+
+            self.utc_ns = timestamps_to_utc_ns(timestamps)
 
             # If start datetime of file is not in metadata, then we take the first value as utc_dt
             if self.metadata.utc_dt is None:
-                first_value = self._df.iloc[0, time_col]
-                first_value = first_value.astimezone(pytz.utc)
+                self.metadata.utc_dt = pd.Timestamp(self.utc_ns[0], tz=pytz.utc).to_pydatetime()
 
-                if type(first_value) == pd.Timestamp:
-                    self.metadata.utc_dt = first_value.to_pydatetime()
-                else:
-                    self.metadata.utc_dt = first_value
+        with span('sensor_data.sampling_index', len(self.utc_ns)):
+            self.sampling_index = SamplingIndex.build(self.utc_ns)
+
+        # The times in the project timezone are only used to display and export the data
+        local = pd.to_datetime(self.utc_ns, utc=True).tz_convert(self.project_timezone)
+        self._df[ABSOLUTE_DATETIME] = local.tz_localize(None) if use_tznaive else local
 
         return True
 
+    @staticmethod
+    def localize(timestamps: pd.Series, timezone) -> pd.Series:
+        """
+        :return: The naive timestamps in the timezone, where the repeated hour at the end of daylight saving time is
+            inferred from the order of the timestamps if possible, and missing otherwise
+        """
+        try:
+            return timestamps.dt.tz_localize(timezone, ambiguous='infer', nonexistent='shift_forward')
+        except (ValueError, pytz.exceptions.InvalidTimeError):
+            return timestamps.dt.tz_localize(timezone, ambiguous='NaT', nonexistent='shift_forward')
+
     def normalize_rel_datetime_column(self):
         """
         Normalize the relative datetime such that the first row will start at 0.
@@ -289,30 +349,44 @@ class SensorData:
                 label_col
             ] = label
 
+    @traced('sensor_data.filter_between_dates', rows=_rows)
     def filter_between_dates(self, start: dt.datetime, end: dt.datetime):
-        start = utc_to_local(start, self.project_timezone).replace(tzinfo=None)
-        end = utc_to_local(end, self.project_timezone).replace(tzinfo=None)
+        """
+        Keep the rows from `start` up to `end`. Requires `add_abs_dt_col`.
 
-        self._df = self._df[(self._df[COLUMN_TIMESTAMP].dt.to_pydatetime() >= start) & (self._df[COLUMN_TIMESTAMP].dt.to_pydatetime() < end)]
+        :param start: The start in UTC
+        :param end: The end in UTC
+        """
+        start_ns, end_ns = to_utc_ns(start), to_utc_ns(end)
+        rows = self.sampling_index.rows_between(self.utc_ns, start_ns, end_ns)
+
+        if rows is not None:
+            # The times are sorted, so the rows are found with a binary search
+            self._df = self._df.iloc[rows[0]:rows[1]]
+            self.sampling_index = self.sampling_index.slice(self.utc_ns, *rows)
+            self.utc_ns = self.utc_ns[rows[0]:rows[1]]
+        else:
+            in_range = (self.utc_ns >= start_ns) & (self.utc_ns < end_ns)
+            self._df = self._df[in_range]
+            self.utc_ns = self.utc_ns[in_range]
+            self.sampling_index = SamplingIndex.build(self.utc_ns)
 
+    @traced('sensor_data.add_labels', rows=_rows)
     def add_labels(self, labels):
         """
-        Add labels to the DataFrame for exporting.
+        Add labels to the DataFrame for exporting. Requires `add_abs_dt_col`.
 
-        :param labels:
-        :return:
+        :param labels: The labels as dictionaries with the 'start' and 'end' in UTC and the 'activity'
         """
-        self._df["Label"] = ""
-        for label in labels:
-            ''' 
-            !!! This is not as convention. !!!
-            The absolute datatime column in the datafile is in naive project timezone.
-            In order to compare the labels (from database in UTC), it has to be converted to project timezone as well.
-            '''
-            start = utc_to_local(label["start"], self.project_timezone).replace(tzinfo=None)
-            end = utc_to_local(label["end"], self.project_timezone).replace(tzinfo=None)
-            activity = label["activity"]
+        utc_labels = [(to_utc_ns(label["start"]), to_utc_ns(label["end"]), label["activity"]) for label in labels]
+
+        if self.compact_dtypes:
+            self._df["Label"] = categorical_labels(self.utc_ns, utc_labels)
+            return
 
+        activities = np.full(len(self._df), "", dtype=object)
+        for start, end, activity in utc_labels:
             # Select all rows with timestamp between start and end and set activity label
-            self._df.loc[(self._df[COLUMN_TIMESTAMP].dt.to_pydatetime() >= start) & (self._df[COLUMN_TIMESTAMP].dt.to_pydatetime() < end),
-                "Label"] = activity
+            activities[(self.utc_ns >= start) & (self.utc_ns < end)] = activity
+
+        self._df["Label"] = activities
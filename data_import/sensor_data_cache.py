@@ -0,0 +1,144 @@
+"""
+In-memory cache of parsed sensor data, shared by everything that opens sensor data files in a session.
+
+The plot, the export and the visual analysis each parse the files they need, and often the same file is parsed several
+times in one session. The cache keeps the parsed DataFrames of the most recently used files within a memory budget. An
+entry is stored as a copy and copied again when it is checked out, because the users of sensor data add columns to and
+filter the DataFrame in place.
+"""
+import threading
+from typing import Optional
+
+import cachetools
+import pandas as pd
+
+from data_import.parsed_data_cache import ParsedDataCache, column_settings
+from file_fingerprint import get_fingerprint
+
+MEGABYTE = 2 ** 20
+
+MAX_SIZE = 512
+"""The default memory budget in megabytes."""
+
+
+class CachedSensorData:
+
+    def __init__(self, df: pd.DataFrame, columns: [str], utc_dt):
+        self.df = df
+        self.columns = list(columns)
+        """The columns as they were read from the file."""
+        self.utc_dt = utc_dt
+        """The start datetime of the sensor data in UTC."""
+        self.size = int(df.memory_usage(index=True, deep=True).sum())
+
+
+class SensorDataCache:
+
+    def __init__(self, max_size: float = MAX_SIZE):
+        """
+        :param max_size: The memory budget in megabytes, the least recently used entries are removed when it is
+            exceeded
+        """
+        self._lock = threading.Lock()
+        self._cache = self._new_cache(max_size)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _new_cache(max_size: float) -> cachetools.LRUCache:
+        return cachetools.LRUCache(maxsize=int(max_size * MEGABYTE), getsizeof=lambda entry: entry.size)
+
+    @staticmethod
+    def key(sensor_data, fingerprint: str = None) -> str:
+        """
+        :param sensor_data: The SensorData object of the file
+        :param fingerprint: The fingerprint of the file, see `file_fingerprint`. It is looked up in the database if
+            None, which is only allowed on the thread that opened the database.
+        :return: The key of the parsed data of `sensor_data`, which covers the file, the sensor model, the timezones
+            and the conversions of the columns
+        """
+        if fingerprint is None:
+            fingerprint = get_fingerprint(sensor_data.file_path)
+
+        return ParsedDataCache.key(fingerprint, sensor_data.sensor_model.__data__,
+                                   sensor_data.metadata.sensor_timezone, sensor_data.project_timezone,
+                                   column_settings(sensor_data.project_controller.settings_dict), {})
+
+    def get(self, key: str) -> Optional[CachedSensorData]:
+        """
+        :return: A copy of the entry, or None if the data is not in the cache
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        return CachedSensorData(entry.df.copy(), entry.columns, entry.utc_dt)
+
+    def put(self, key: str, df: pd.DataFrame, columns: [str], utc_dt) -> None:
+        """
+        Store the parsed data. Data that is larger than the memory budget is not stored.
+
+        :param key: See `key`
+        :param df: A copy of the parsed DataFrame, which is not changed afterwards
+        :param columns: The columns as they were read from the file
+        :param utc_dt: The start datetime of the sensor data in UTC
+        """
+        entry = CachedSensorData(df, columns, utc_dt)
+
+        with self._lock:
+            if entry.size > self._cache.maxsize:
+                return
+            self._cache[key] = entry
+
+    def resize(self, max_size: Optional[float]) -> None:
+        """
+        Change the memory budget, keeping the most recently used entries that fit.
+
+        :param max_size: The memory budget in megabytes, the default budget if None
+        """
+        max_size = MAX_SIZE if max_size is None else max_size
+
+        with self._lock:
+            if self._cache.maxsize == int(max_size * MEGABYTE):
+                return
+
+            # Pops the least recently used entry first
+            entries = [self._cache.popitem() for _ in range(len(self._cache))]
+
+            self._cache = self._new_cache(max_size)
+            for key, entry in entries:
+                # The least recently used entries are evicted when the smaller budget is exceeded
+                if entry.size <= self._cache.maxsize:
+                    self._cache[key] = entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        :return: The number of 'hits' and 'misses', the 'hit_rate', the number of 'entries', and the 'size' and
+            'max_size' in bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'entries': len(self._cache),
+                'size': self._cache.currsize,
+                'max_size': self._cache.maxsize
+            }
+
+
+sensor_data_cache = SensorDataCache()
+"""The cache of the session."""
+
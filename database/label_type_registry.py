@@ -0,0 +1,79 @@
+from typing import Dict, List, Optional
+
+from database.models import LabelType
+
+
+class LabelTypeRegistry:
+    """
+    In-memory registry of all label types in the project database.
+
+    The label types are loaded with a single query the first time they are needed and kept in memory afterwards, so
+    that the keyboard and plotting code can look them up without a database round trip. Every piece of code that
+    changes the LabelType table is responsible for calling `invalidate()`, after which the registry is reloaded on the
+    next lookup.
+    """
+
+    def __init__(self):
+        self._by_id: Optional[Dict[int, LabelType]] = None
+        self._by_activity: Dict[str, LabelType] = {}
+        self._by_shortcut: Dict[str, LabelType] = {}
+
+    def invalidate(self) -> None:
+        """Mark the registry as stale, so that it is reloaded from the database on the next lookup."""
+        self._by_id = None
+        self._by_activity = {}
+        self._by_shortcut = {}
+
+    def _load(self) -> None:
+        by_id, by_activity, by_shortcut = {}, {}, {}
+
+        for label_type in LabelType.select():
+            by_id[label_type.id] = label_type
+            by_activity[label_type.activity] = label_type
+
+            by_shortcut[label_type.keyboard_shortcut] = label_type
+
+        self._by_id, self._by_activity, self._by_shortcut = by_id, by_activity, by_shortcut
+
+    def _ensure_loaded(self) -> None:
+        if self._by_id is None:
+            self._load()
+
+    def get_by_id(self, label_type_id) -> Optional[LabelType]:
+        """
+        :param label_type_id: The id of the label type, or a LabelType instance.
+        :return: The label type with the given id, or None if it does not exist.
+        """
+        self._ensure_loaded()
+
+        if isinstance(label_type_id, LabelType):
+            label_type_id = label_type_id.id
+
+        return self._by_id.get(label_type_id)
+
+    def get_by_activity(self, activity: str) -> Optional[LabelType]:
+        """
+        :param activity: The activity name of the label type.
+        :return: The label type with the given activity name, or None if it does not exist.
+        """
+        self._ensure_loaded()
+        return self._by_activity.get(activity)
+
+    def get_by_shortcut(self, shortcut: str) -> Optional[LabelType]:
+        """
+        :param shortcut: The keyboard shortcut (a single character) of the label type.
+        :return: The label type that is assigned to the shortcut, or None if the shortcut is not in use.
+        """
+        self._ensure_loaded()
+        return self._by_shortcut.get(shortcut)
+
+    def all(self) -> List[LabelType]:
+        """
+        :return: All label types, ordered by id.
+        """
+        self._ensure_loaded()
+        return [self._by_id[label_type_id] for label_type_id in sorted(self._by_id)]
+
+
+# Process-wide registry. There is only one open project database at a time, see `ProjectController.init_db`.
+label_types = LabelTypeRegistry()
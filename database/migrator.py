@@ -1,6 +1,7 @@
 from playhouse.migrate import SqliteDatabase, SqliteMigrator, migrate
-from database.models import SubjectMapping
+from database.models import SubjectMapping, BaseModel
 from pathlib import Path
+from typing import Type
 
 # migrator.drop_not_null('sensordatafile', 'datetime')
 # migrator.add_column('camera', 'manual_offset', DoubleField(null=True))
@@ -12,3 +13,22 @@ def rename_table(db_path: Path, old: str, new: str):
     migrate(migrator.rename_table(old, new))
 
 
+
+
+def add_missing_columns(model: Type[BaseModel]):
+    """
+    Adds the columns of `model` that are missing in its table, e.g. fields added in a newer version of the
+    application. Only nullable fields can be added to a table that already contains rows.
+
+    :param model: The model of which the table should be completed, its database should be connected
+    """
+    database = model._meta.database
+    table = model._meta.table_name
+    existing = {column.name for column in database.get_columns(table)}
+    migrator = SqliteMigrator(database)
+
+    operations = [migrator.add_column(table, field.column_name, field)
+                  for field in model._meta.sorted_fields if field.column_name not in existing]
+
+    if operations:
+        migrate(*operations)
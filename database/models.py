@@ -20,6 +20,13 @@ class Video(BaseModel):
     datetime = DateTimeField()
     camera = ForeignKeyField(Camera)
 
+    # Metadata cache, valid as long as file_id_hash equals the fingerprint of the video file.
+    file_id_hash = TextField(null=True, index=True)
+    begin_time_tag = TextField(null=True)
+    frame_rate = DoubleField(null=True)
+    duration = DoubleField(null=True)
+    camera_name = TextField(null=True)
+
 
 class SensorModel(BaseModel):
     model_name = TextField(unique=True)
@@ -51,6 +58,14 @@ class SensorDataFile(BaseModel):
     last_used_column = TextField(null=True)
 
 
+class FileFingerprint(BaseModel):
+    """Memo of file fingerprints, valid as long as the size and modification time of the file do not change."""
+    path = TextField(unique=True)
+    size = IntegerField()
+    mtime_ns = IntegerField()
+    fingerprint = TextField()
+
+
 class Subject(BaseModel):
     name = TextField(unique=True)
     color = TextField(null=True)
@@ -1,6 +1,14 @@
 import datetime as dt
+
+import numpy as np
+import pandas as pd
 import pytz
 
+EPOCH = dt.datetime(1970, 1, 1)
+
+NAT_NS = np.iinfo(np.int64).min
+"""The nanoseconds of missing timestamps, like `pd.NaT`; it compares lower than any other time."""
+
 
 def naive_to_utc(naive_dt: dt.datetime, timezone) -> dt.datetime:
     """
@@ -40,3 +48,34 @@ def local_to_utc(local_dt: dt.datetime) -> dt.datetime:
     """
 
     return local_dt.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def to_utc_ns(date_time: dt.datetime) -> int:
+    """
+    Transforms a datetime to the time representation of sensor data: nanoseconds since the epoch in UTC.
+    :param date_time: the datetime; if it is naive, it is in UTC, like the datetimes in the database.
+    :return: The number of nanoseconds since 1970-01-01 00:00 UTC.
+    """
+
+    if date_time.tzinfo is not None:
+        date_time = local_to_utc(date_time)
+    return (date_time - EPOCH) // dt.timedelta(microseconds=1) * 1000
+
+
+def timestamps_to_utc_ns(timestamps: pd.Series) -> np.ndarray:
+    """
+    Transforms timestamps with a timezone to nanoseconds since the epoch in UTC, without boxing them as datetimes.
+    :param timestamps: the timezone-aware timestamps.
+    :return: An int64 array, with `NAT_NS` for missing timestamps.
+    """
+
+    naive_utc = timestamps.dt.tz_convert(pytz.utc).dt.tz_localize(None)
+    return naive_utc.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def utc_ns_to_datetime64(utc_ns: np.ndarray) -> np.ndarray:
+    """
+    Views nanoseconds since the epoch in UTC as naive datetime64 values in UTC, e.g. for `matplotlib.dates.date2num`.
+    """
+
+    return np.asarray(utc_ns, dtype=np.int64).view('datetime64[ns]')
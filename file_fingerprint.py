@@ -0,0 +1,136 @@
+"""
+Content fingerprints that recognize a file independent of its location on disk.
+
+A fingerprint is a hash of a few blocks sampled from the start, middle and end of the file, combined with the file
+size. Fingerprints are memoized in the project database per (path, size, modification time), so that a file that has
+not changed since it was last seen is not read at all.
+"""
+import hashlib
+import mmap
+import os
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from database.models import db, FileFingerprint
+
+BLOCK_SIZE = 64 * 1024
+"""Size in bytes of each sampled block."""
+
+SAMPLE_OFFSETS = 3
+"""Number of blocks that are sampled (start, middle and end)."""
+
+
+def compute_fingerprint(file_path, block_size: int = BLOCK_SIZE) -> str:
+    """
+    Compute the fingerprint of a file. Files smaller than the sampled blocks together are hashed completely.
+
+    :param file_path: The path of the file
+    :param block_size: The size in bytes of each sampled block
+    :return: The hexadecimal hash of the sampled blocks, followed by the file size
+    """
+    file_size = os.path.getsize(file_path)
+    blake2b = hashlib.blake2b(digest_size=16)
+    blake2b.update(file_size.to_bytes(8, 'little'))
+
+    # Empty files cannot be memory mapped.
+    if file_size > 0:
+        with open(file_path, mode='rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if file_size <= SAMPLE_OFFSETS * block_size:
+                blake2b.update(mm[:])
+            else:
+                for offset in (0, (file_size - block_size) // 2, file_size - block_size):
+                    blake2b.update(mm[offset:offset + block_size])
+
+    return '{}{}'.format(blake2b.hexdigest(), file_size)
+
+
+def memo_key(file_path) -> str:
+    return Path(os.path.abspath(file_path)).as_posix()
+
+
+def get_fingerprint(file_path) -> str:
+    """
+    Get the fingerprint of a file, using the memo in the project database when the file has not changed.
+
+    :param file_path: The path of the file
+    :return: The fingerprint of the file
+    """
+    return get_fingerprints([file_path])[memo_key(file_path)]
+
+
+def _fingerprint_safe(key: str) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        return compute_fingerprint(key), None
+    except OSError as e:
+        return None, str(e) or type(e).__name__
+
+
+def get_fingerprints(file_paths: Iterable, max_variables: int = 500, executor: Optional[Executor] = None,
+                     failed: Optional[Dict[str, str]] = None,
+                     progress: Callable[[int], None] = None) -> Dict[str, str]:
+    """
+    Get the fingerprints of many files at once. The memo is queried in batches and all new fingerprints are stored in
+    a single transaction.
+
+    :param file_paths: The paths of the files
+    :param max_variables: The maximum number of paths per memo query, SQLite limits the number of query parameters
+    :param executor: Executor used to compute the missing fingerprints in parallel, the database is only accessed
+        from the calling thread
+    :param failed: If given, the files that cannot be read are added to this dictionary from absolute POSIX path to
+        error, instead of raising an OSError
+    :param progress: Called with the number of files of which the fingerprint is known
+    :return: A dictionary from absolute POSIX path to fingerprint, without the failed files
+    """
+    stats = {}
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            if failed is None:
+                raise
+            failed[memo_key(file_path)] = str(e) or type(e).__name__
+            continue
+        stats[memo_key(file_path)] = (stat.st_size, stat.st_mtime_ns)
+
+    keys = list(stats)
+    fingerprints = {}
+
+    for i in range(0, len(keys), max_variables):
+        batch = keys[i:i + max_variables]
+
+        for memo in FileFingerprint.select().where(FileFingerprint.path.in_(batch)):
+            if stats[memo.path] == (memo.size, memo.mtime_ns):
+                fingerprints[memo.path] = memo.fingerprint
+
+    missing = [key for key in keys if key not in fingerprints]
+    compute = _fingerprint_safe if failed is not None else compute_fingerprint
+    computed = executor.map(compute, missing) if executor is not None else map(compute, missing)
+
+    done = len(fingerprints) + (len(failed) if failed is not None else 0)
+    if progress is not None:
+        progress(done)
+
+    new_memos = []
+    for key, fingerprint in zip(missing, computed):
+        done += 1
+        if progress is not None:
+            progress(done)
+
+        if failed is not None:
+            fingerprint, error = fingerprint
+            if error is not None:
+                failed[key] = error
+                continue
+
+        fingerprints[key] = fingerprint
+        size, mtime_ns = stats[key]
+        new_memos.append({'path': key, 'size': size, 'mtime_ns': mtime_ns, 'fingerprint': fingerprint})
+
+    if new_memos:
+        with db.atomic():
+            # Each memo row has 4 parameters.
+            for i in range(0, len(new_memos), max_variables // 4):
+                FileFingerprint.replace_many(new_memos[i:i + max_variables // 4]).execute()
+
+    return fingerprints
@@ -345,6 +345,8 @@ class Ui_MainWindow(object):
         self.actionOpen_Video.setObjectName("actionOpen_Video")
         self.actionOpen_Sensor_Data = QtWidgets.QAction(MainWindow)
         self.actionOpen_Sensor_Data.setObjectName("actionOpen_Sensor_Data")
+        self.actionImport_Sensor_Data_Folder = QtWidgets.QAction(MainWindow)
+        self.actionImport_Sensor_Data_Folder.setObjectName("actionImport_Sensor_Data_Folder")
         self.actionExport_Sensor_Data = QtWidgets.QAction(MainWindow)
         self.actionExport_Sensor_Data.setObjectName("actionExport_Sensor_Data")
         self.actionImport_Settings = QtWidgets.QAction(MainWindow)
@@ -379,6 +381,7 @@ class Ui_MainWindow(object):
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionOpen_Video)
         self.menuFile.addAction(self.actionOpen_Sensor_Data)
+        self.menuFile.addAction(self.actionImport_Sensor_Data_Folder)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionExport_Sensor_Data)
         self.menuFile.addAction(self.actionExit)
@@ -428,6 +431,7 @@ class Ui_MainWindow(object):
         # self.menuStatistics.setTitle(_translate("MainWindow", "Analysis"))
         self.actionOpen_Video.setText(_translate("MainWindow", "Open Video"))
         self.actionOpen_Sensor_Data.setText(_translate("MainWindow", "Open Sensor Data"))
+        self.actionImport_Sensor_Data_Folder.setText(_translate("MainWindow", "Import Sensor Data Folder"))
         self.actionExport_Sensor_Data.setText(_translate("MainWindow", "Export Sensor Data"))
         self.actionImport_Settings.setText(_translate("MainWindow", "Edit Project Settings"))
         self.actionLabel_Settings.setText(_translate("MainWindow", "Label Settings"))
@@ -1,17 +1,18 @@
 import os
 from pathlib import Path
 
-import pandas as pd
 import pytz
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import pyqtSignal, QThread, pyqtSlot, QObject
 from PyQt5.QtWidgets import QMessageBox, QApplication
 
 import date_utils
-from controllers.sensor_controller import get_labels
-from database.models import SensorDataFile, SubjectMapping, Subject
+from core import export
+from data_import.import_exception import ImportException
+from database.models import Subject
 from gui.designer.progress_bar import Ui_Dialog
-from numpy import array_split
+from gui.dialogs.import_error_message import show_import_error
+from instrumentation import span
 
 import datetime as dt
 
@@ -37,28 +38,12 @@ class ExportProgressDialog(QtWidgets.QDialog, Ui_Dialog):
         jobs = []
         cancelled_exports = 0
 
-        print(start_dt, end_dt)
-
         for subject_id in subject_ids:
             subject_name = Subject.get_by_id(subject_id).name  # Retrieve the subject's name
 
-            # Find all the sensors that belong to the selected subjects by looking through the subject mappings.
-            subject_mappings = (SubjectMapping
-                                .select(SubjectMapping.sensor)
-                                .where((SubjectMapping.subject == subject_id) &
-                                       (
-                                               SubjectMapping.start_datetime.between(start_dt, end_dt) |
-                                               SubjectMapping.end_datetime.between(start_dt, end_dt) |
-                                               (start_dt >= SubjectMapping.start_datetime) & (
-                                                       start_dt <= SubjectMapping.end_datetime) |
-                                               (end_dt >= SubjectMapping.start_datetime) & (
-                                                       end_dt <= SubjectMapping.end_datetime)
-                                       )
-                                       ))
-
-            print(f"Found {len(subject_mappings)} subject mappings for subject_id {subject_id}.")
-
-            if len(subject_mappings) == 0:
+            sdf_ids = export.find_subject_files(subject_id, start_dt, end_dt)
+
+            if len(sdf_ids) == 0:
                 local_timezone = pytz.timezone(self.gui.project_controller.get_setting('timezone'))
                 start_local = date_utils.utc_to_local(start_dt, local_timezone)
                 end_local = date_utils.utc_to_local(end_dt, local_timezone)
@@ -80,39 +65,27 @@ class ExportProgressDialog(QtWidgets.QDialog, Ui_Dialog):
             if output_file_path == "":  # The save prompt was closed by the user.
                 raise RuntimeError("No path was chosen. User may have exited manually.")
 
-            # For each (subject, sensor) combination, create one file.
-            for subject_mapping in subject_mappings:
-                sensor_id = subject_mapping.sensor.id
-
-                # Retrieve all SensorDataFiles that have this sensor associated with it.
-                sdf_query = (SensorDataFile
-                             .select(SensorDataFile.id)
-                             .where((SensorDataFile.sensor == sensor_id) &
-                                    SensorDataFile.datetime.between(start_dt, end_dt)))
-
-                sdfs = []
-                print(f"Found {len(sdf_query)} files.")
-                for sdf in sdf_query:
-                    labels = get_labels(sdf.id, start_dt, end_dt)
-                    sensor_data = self.gui.sensor_controller.get_sensor_data(sdf.id)  # DB
-                    if sensor_data is None:
-                        raise Exception('Sensor data not found')
+            # The data of all the sensors of the subject ends up in one file.
+            sdfs = []
+            for sdf_id in sdf_ids:
+                # Asks the user for the location of files that have been moved
+                sensor_data = self.gui.sensor_controller.get_sensor_data(sdf_id)
+                if sensor_data is None:
+                    raise Exception('Sensor data not found')
 
-                    if not sensor_data.add_abs_dt_col(use_tznaive=True):
-                        continue
+                try:
+                    sdfs.append(export.prepare_sensor_data(sensor_data, sdf_id, start_dt, end_dt))
+                except ImportException as e:
+                    show_import_error(self, e)
 
-                    sensor_data.filter_between_dates(start_dt, end_dt)
-                    sensor_data.add_labels(labels)
-
-                    sdfs.append(sensor_data)
-
-                jobs.append((output_file_path, sdfs))
+            jobs.append((output_file_path, sdfs))
 
         if len(jobs) > 0:
             self.worker = ExportWorker(jobs, start_dt, end_dt)
             self.thread = QThread()
             self.worker.progress.connect(self.changeProgress)
             self.worker.text.connect(self.changeText)
+            self.worker.error.connect(self.show_error)
             self.worker.moveToThread(self.thread)
             self.thread.started.connect(self.worker.run)
             self.thread.finished.connect(self.worker.deleteLater)
@@ -153,18 +126,26 @@ class ExportProgressDialog(QtWidgets.QDialog, Ui_Dialog):
     @pyqtSlot()
     def done_(self):
         self.thread.quit()
-        if not self.gui.testing:
+        if not self.gui.testing and not self.worker.failed:
             QMessageBox.information(self, "Export", "Export completed successfully!")
 
+    @pyqtSlot(str)
+    def show_error(self, file_path):
+        QMessageBox.critical(self, "Could not write to file",
+                             f"You do not have the permission to write to {file_path}. If the file already exists, "
+                             "this may mean the file is currently open, so it cannot be overwritten.")
+
 
 class ExportWorker(QObject):
     finished = pyqtSignal()
     text = pyqtSignal(str)
     progress = pyqtSignal(int)
+    error = pyqtSignal(str)
 
     def __init__(self, jobs, start_dt, end_dt):
         super().__init__()
         self.aborted = False
+        self.failed = False
         self.paused = False
         self.jobs = jobs
         self.start_dt = start_dt
@@ -172,49 +153,18 @@ class ExportWorker(QObject):
 
     @pyqtSlot()
     def run(self):
-        """Export the dataframe to a CSV file in chunks.
-
-        This loop separates the dataframe in 100 roughly equal parts and appends each part to the
-        previous parts, so that a progress update can be given in the form of a progress bar. This
-        is particularly useful for dataframes that encompass large amounts of time."""
-        print("Exporting...")
-        for job_i, (file_path, sensor_data) in enumerate(self.jobs):
-            print(f"Exporting job {job_i+1}/{len(self.jobs)}, containing {len(sensor_data)} sdfs...")
-            file_path = Path(file_path)
-            self.text.emit(f"Collecting data for {file_path.as_posix()}")
-            df = pd.DataFrame()
-
-            for i, subject_data in enumerate(sensor_data):
-                data = subject_data.get_data()
-                print(f"Labels present in SDF {i+1}/{len(sensor_data)}:")
-                print(data['Label'].value_counts())
-                df = df.append(data)
-
-            df = df.fillna("")
-
-            # Because exporting uses append mode, the existing file has to be deleted first in case of
-            # the reuse of file name.
-            try:
-                if file_path.is_file():
-                    file_path.unlink()
-
-            except FileNotFoundError:  # Export was cancelled on file location prompt.
-                continue
-
-            except PermissionError:
-                QMessageBox.critical("Could not write to file",
-                                     "You do not have the permission to write to this file location. If the file "
-                                     "already exists, this may mean the file is currently open, so it cannot be "
-                                     "overwritten.")
-
-            df_split = array_split(df, 100)  # Divide into 100 (roughly) equal chunks.
-
-            self.text.emit(f"Writing to {file_path}...")
-
-            for i in range(100):
-                # Append each chunk to output_path CSV using mode='a' (append).
-                df_split[i].to_csv(file_path, mode='a', header=(i == 0), index=False)
-                self.progress.emit(i + 1)
+        """Export the jobs to CSV files, see `core.export.write_export`."""
+        with span('export.run', jobs=len(self.jobs)):
+            for file_path, sensor_data in self.jobs:
+                self.text.emit(f"Writing to {file_path}...")
+
+                try:
+                    export.write_export(Path(file_path), sensor_data, self.progress.emit, lambda: self.aborted)
+                except export.ExportCancelled:
+                    break
+                except PermissionError:
+                    self.failed = True
+                    self.error.emit(Path(file_path).as_posix())
 
         self.finished.emit()
 
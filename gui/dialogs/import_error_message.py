@@ -0,0 +1,20 @@
+from PyQt5.QtWidgets import QMessageBox, QWidget
+
+from data_import.import_exception import ImportException
+
+
+def show_import_error(parent: QWidget, error: ImportException) -> None:
+    """
+    Show why sensor data could not be imported and how the user can resolve it.
+
+    :param parent: The parent widget of the message box
+    :param error: The exception raised while importing
+    """
+    msg = QMessageBox(parent)
+    msg.setIcon(QMessageBox.Critical)
+    msg.setWindowTitle(error.title)
+    msg.setText(str(error))
+    if error.details:
+        msg.setInformativeText(error.details)
+    msg.setStandardButtons(QMessageBox.Ok)
+    msg.exec()
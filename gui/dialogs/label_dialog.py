@@ -9,7 +9,8 @@ from PyQt5.QtWidgets import QMessageBox
 from peewee import DoesNotExist
 
 from controllers.sensor_controller import SensorController
-from database.models import LabelType, Label
+from database.label_type_registry import label_types
+from database.models import Label
 from date_utils import naive_to_utc
 from gui.designer.label_specs import Ui_LabelSpecs
 
@@ -34,12 +35,12 @@ class LabelDialog(QtWidgets.QDialog, Ui_LabelSpecs):
         self.comboBox_labels.currentTextChanged.connect(self.toggle_confirm_annotation)
 
         # Add activities to the labels combobox
-        self.comboBox_labels.addItems([label_type.activity for label_type in LabelType.select()])
+        self.comboBox_labels.addItems([label_type.activity for label_type in label_types.all()])
 
         self.toggle_confirm_annotation()
 
     def update_label_type(self, activity: str):
-        label_type = LabelType.get(LabelType.activity == activity).id
+        label_type = label_types.get_by_activity(activity).id
         self.label.label_type = label_type
 
     def trim_overlap(self, time, pos: str = 'begin') -> str:
@@ -5,6 +5,7 @@ from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import QMessageBox
 
 from controllers.annotation_controller import NonUniqueShortcutException, NonUniqueActivityNameException
+from database.label_type_registry import label_types
 from database.models import LabelType, Label
 from gui.designer.label_settings import Ui_Dialog
 
@@ -117,6 +118,7 @@ class LabelSettingsDialog(QtWidgets.QDialog, Ui_Dialog):
             label_type = LabelType.get(LabelType.activity == activity)
             label_type.color = color
             label_type.save()
+            label_types.invalidate()
             self.color_dict[activity] = color
 
     def opacity_changed(self, value):
@@ -142,6 +144,7 @@ class LabelSettingsDialog(QtWidgets.QDialog, Ui_Dialog):
                 label_type = LabelType.get(LabelType.activity == activity)
                 label_type.keyboard_shortcut = keyboard_shortcut
                 label_type.save()
+                label_types.invalidate()
             except IntegrityError:
                 # This will be thrown whenever no shortcut is given, since all activities without a shortcut will
                 # all have the SAME shortcut: "None", which is non-unique, thus raising an IntegrityError.
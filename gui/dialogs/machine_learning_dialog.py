@@ -1,5 +1,13 @@
+import threading
+
 from PyQt5 import QtWidgets
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject
+
 from gui.designer.machine_learning import Ui_Dialog
+from machine_learning.suggestion_pipeline import SuggestionPipeline
+
+MAX_PENDING_SUGGESTIONS = 5
+"""The number of suggestions that are made ahead of the user, so that accepted labels improve the next ones."""
 
 
 class MachineLearningDialog(QtWidgets.QDialog, Ui_Dialog):
@@ -26,3 +34,47 @@ class MachineLearningDialog(QtWidgets.QDialog, Ui_Dialog):
 
     def switch_column(self):
         self.checkBox.setChecked(self.column_dict[self.comboBox.currentText()])
+
+
+class SuggestionWorker(QObject):
+    """
+    Runs a `SuggestionPipeline` on a worker thread and emits every suggestion as soon as it is made. The worker stays
+    at most `max_pending` suggestions ahead of the user, `suggestion_reviewed` has to be called for every suggestion.
+    """
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+    suggestion = pyqtSignal(object)
+
+    def __init__(self, pipeline: SuggestionPipeline, max_pending: int = MAX_PENDING_SUGGESTIONS):
+        super().__init__()
+        self.pipeline = pipeline
+        self.max_pending = max_pending
+        self.pending = 0
+        self.condition = threading.Condition()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            for suggestions in self.pipeline.suggestions():
+                for suggestion in suggestions:
+                    with self.condition:
+                        self.condition.wait_for(lambda: self.pending < self.max_pending or self.pipeline.aborted)
+                        if self.pipeline.aborted:
+                            return
+                        self.pending += 1
+
+                    self.suggestion.emit(suggestion)
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def suggestion_reviewed(self):
+        with self.condition:
+            self.pending -= 1
+            self.condition.notify_all()
+
+    def abort(self):
+        with self.condition:
+            self.pipeline.abort()
+            self.condition.notify_all()
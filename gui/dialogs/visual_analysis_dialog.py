@@ -3,6 +3,7 @@ import gc
 import math
 import os
 from pathlib import Path
+from typing import Optional
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -15,14 +16,17 @@ from PyQt5.QtWidgets import QFileDialog, QMessageBox, QShortcut
 from matplotlib.backend_bases import MouseButton
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from pandas.core.dtypes.common import is_numeric_dtype
-from peewee import JOIN
 
 import parse_function.custom_function_parser as parser
 from constants import ABSOLUTE_DATETIME
+from core.ingest import open_sensor_data
+from core.labels import get_labels
+from data_import.import_exception import ImportException
 from data_import.sensor_data import SensorData
-from database.models import Subject, LabelType, SubjectMapping, SensorDataFile, Sensor, SensorModel
+from database.models import Subject, LabelType, SubjectMapping, SensorDataFile
+from exceptions import SensorDoesNotExist, SensorModelDoesNotExist
 from gui.designer.visual_analysis import Ui_Dialog
-from controllers.sensor_controller import get_labels
+from gui.dialogs.import_error_message import show_import_error
 from gui.dialogs.project_settings_dialog import ProjectSettingsDialog
 from parse_function.parse_exception import ParseException
 
@@ -126,10 +130,6 @@ class VisualAnalysisDialog(QtWidgets.QDialog, Ui_Dialog):
         if self.x_min == self.x_max:
             self.x_max = self.x_min + 1
 
-        self.sample_rate = round(
-            10 ** 6 / (self.df[ABSOLUTE_DATETIME][self.x_min + 1] - self.df[ABSOLUTE_DATETIME][
-                self.x_min]).microseconds)
-
         # Remove outliers before assessing y_min and y_max value for plot
         self.y_min = self.df[self.current_function].quantile(.0001)
         self.y_max = self.df[self.current_function].quantile(.9999)
@@ -316,30 +316,14 @@ class VisualAnalysisDialog(QtWidgets.QDialog, Ui_Dialog):
                             ))
         return [sdf.id for sdf in sdf_query]
 
-    def get_sensor_data(self, sensor_data_file_id: int) -> SensorData:
+    def get_sensor_data(self, sensor_data_file_id: int) -> Optional[SensorData]:
         file_path = self.get_file_path(sensor_data_file_id)
-        model_id = (SensorDataFile
-                    .select()
-                    .join(Sensor, JOIN.LEFT_OUTER)
-                    .join(SensorModel, JOIN.LEFT_OUTER)
-                    .where(SensorDataFile.id == sensor_data_file_id)
-                    .get()
-                    ).sensor.model.id
-        sensor_id = SensorDataFile.get_by_id(sensor_data_file_id).sensor.id
-
-        if model_id >= 0 and sensor_id >= 0:
-            sensor_timezone = pytz.timezone(Sensor.get_by_id(sensor_id).timezone)
-            sensor_data = SensorData(self.project_controller, Path(file_path), model_id)
-            sensor_data.metadata.sensor_timezone = sensor_timezone
-            # Parse the utc datetime of the sensor data
-            sensor_data.metadata.parse_datetime()
-            sensor_data.parse()
 
+        try:
+            return open_sensor_data(self.project_controller, sensor_data_file_id, Path(file_path))
         # Sensor model unknown
-        else:
-            sensor_data = None
-
-        return sensor_data
+        except (SensorDoesNotExist, SensorModelDoesNotExist):
+            return None
 
     def get_file_path(self, sensor_data_file_id: int) -> str:
         """
@@ -462,8 +446,7 @@ class VisualAnalysisDialog(QtWidgets.QDialog, Ui_Dialog):
                             if sensor_data is None:
                                 raise Exception('Sensor data not found')
 
-                            if not sensor_data.add_abs_dt_col():
-                                return
+                            sensor_data.add_abs_dt_col()
 
                             if self.groupBox_select_timeperiod.isChecked():
                                 # TODO verify localization of start and end_dt
@@ -473,6 +456,11 @@ class VisualAnalysisDialog(QtWidgets.QDialog, Ui_Dialog):
                                 )
 
                             sensor_data.add_labels(labels)
+
+                            # The plot width in seconds is converted to rows with the sampling rate of the data
+                            if sensor_data.sampling_index.rate is not None:
+                                self.sample_rate = sensor_data.sampling_index.rate
+
                             block = sensor_data.get_data(label_type)
                             if len(block) == 0:
                                 continue
@@ -488,6 +476,10 @@ class VisualAnalysisDialog(QtWidgets.QDialog, Ui_Dialog):
                             QMessageBox.critical(self, "Memory error", "Please try again with a smaller time period")
                             self.label_info_text.clear()
                             return
+                        except ImportException as e:
+                            show_import_error(self, e)
+                            self.label_info_text.clear()
+                            return
 
                     # Fill functions combobox for this data
                     self.init_functions()
@@ -1,20 +1,21 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from datetime import timedelta
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
 
-import matplotlib.animation
 import matplotlib.pyplot as plt
-import numpy as np
+import pytz
 from PyQt5 import QtCore
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread
 from PyQt5.QtMultimedia import QMediaContent
-from PyQt5.QtWidgets import QMainWindow, QMessageBox, QShortcut, QFileDialog, qApp, QDialog
+from PyQt5.QtWidgets import QMainWindow, QMessageBox, QShortcut, QFileDialog, qApp, QAction
 
 from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg
-from pandas.plotting import register_matplotlib_converters
-from sklearn.naive_bayes import GaussianNB
+from peewee import IntegrityError
 
-from constants import PROJECT_CONFIG_FILE
+from constants import ABSOLUTE_DATETIME, PROJECT_CONFIG_FILE
 from controllers.annotation_controller import AnnotationController
 from controllers.app_controller import AppController
 from controllers.camera_controller import CameraController
@@ -22,13 +23,12 @@ from controllers.plot_controller import PlotController
 from controllers.project_controller import ProjectController
 from controllers.sensor_controller import SensorController
 from controllers.video_controller import VideoController
-from data_export import windowing as wd
-from database.models import Offset, LabelType
+from date_utils import utc_to_local
+from database.label_type_registry import label_types
+from database.models import Label, Offset
 from gui.designer.gui import Ui_MainWindow
-from gui.dialogs.export_dialog import ExportDialog
 from gui.dialogs.label_dialog import LabelDialog
 from gui.dialogs.label_settings_dialog import LabelSettingsDialog
-from gui.dialogs.machine_learning_dialog import MachineLearningDialog
 from gui.dialogs.new_project_dialog import NewProjectDialog
 from gui.dialogs.project_settings_dialog import ProjectSettingsDialog
 from gui.dialogs.select_camera_dialog import SelectCameraDialog
@@ -36,9 +36,13 @@ from gui.dialogs.select_sensor_dialog import SelectSensorDialog
 from gui.dialogs.sensor_model_dialog import SensorModelDialog
 from gui.dialogs.subject_mapping_dialog import SubjectMappingDialog
 from gui.dialogs.subject_dialog import SubjectDialog
-from gui.dialogs.visual_analysis_dialog import VisualAnalysisDialog
 from gui.dialogs.welcome_dialog import WelcomeDialog
-from machine_learning.classifier import Classifier, make_predictions
+
+# Machine learning, export and visual analysis are imported on first use, because importing scikit-learn, the
+# windowing and the plotting of pandas takes a large part of the startup time.
+if TYPE_CHECKING:
+    from gui.dialogs.machine_learning_dialog import SuggestionWorker
+    from machine_learning.suggestion_pipeline import SuggestionPipeline
 
 COL_LABEL = 'Label'
 COL_TIME = 'Time'
@@ -64,7 +68,15 @@ class GUI(QMainWindow, Ui_MainWindow):
 
         # update_db_structure(self.settings)  # function of self.settings has been moved to project_controller
 
-    def init_project(self):
+    def init_project(self, load_previous_files=True):
+        """
+        Creates the controllers and connects the GUI components.
+
+        :param load_previous_files: Whether to open the last opened video and sensor data file. If False,
+            `load_previous_files` has to be called, e.g. after the main window is shown.
+        """
+        from pandas.plotting import register_matplotlib_converters
+
         # GUI components
         register_matplotlib_converters()
 
@@ -91,6 +103,14 @@ class GUI(QMainWindow, Ui_MainWindow):
         self.actionNew_Project.triggered.connect(self.open_new_project_dialog)
         self.actionOpen_Video.triggered.connect(self.video_controller.prompt_file)
         self.actionOpen_Sensor_Data.triggered.connect(self.sensor_controller.prompt_file)
+        self.actionImport_Sensor_Data_Folder.triggered.connect(self.sensor_controller.prompt_directory)
+
+        # Sensor data of the previous session is loaded in the background, which can be cancelled
+        self.actionCancel_Loading = QAction("Cancel Loading Sensor Data", self)
+        self.actionCancel_Loading.setShortcut(Qt.Key_Escape)
+        self.actionCancel_Loading.setEnabled(False)
+        self.actionCancel_Loading.triggered.connect(lambda: self.sensor_controller.cancel_loading())
+        self.menuFile.insertAction(self.actionExport_Sensor_Data, self.actionCancel_Loading)
         self.pushButton_delete_formula.clicked.connect(self.show_delete_formula_message_box)
 
         self.actionCamera_Settings.triggered.connect(self.open_select_camera_dialog)
@@ -116,7 +136,7 @@ class GUI(QMainWindow, Ui_MainWindow):
         # self.actionMachine_Learning.triggered.connect(self.open_machine_learning_dialog)
 
         # Initialize the libraries that are needed to plot the sensor data, and add them to the GUI
-        self.figure = matplotlib.pyplot.figure()
+        self.figure = plt.figure()
         self.canvas = FigureCanvasQTAgg(self.figure)
         self.canvas.resize(self.canvas.width(), 200)
         self.verticalLayout_plot.addWidget(self.canvas)
@@ -145,30 +165,38 @@ class GUI(QMainWindow, Ui_MainWindow):
         self.doubleSpinBox_plot_width.setValue(self.plot_controller.plot_width)
         self.doubleSpinBox_plot_height.setValue(self.plot_controller.plot_height_factor)
 
-        # Machine learning fields
-        self.ml_dataframe = None
-        self.ml_classifier_engine = GaussianNB()
+        # Machine learning fields, the classifier is created when suggestions are made for the first time
+        self.ml_classifier_engine = None
         self.ml_used_columns = []
-        self.ml_classifier = Classifier(self.ml_classifier_engine)
-
-        # Open the last opened files
-        self.video_controller.open_previous_file()
-        self.sensor_controller.open_previous_file()
+        self.ml_pipeline: Optional['SuggestionPipeline'] = None
+        self.ml_worker: Optional['SuggestionWorker'] = None
+        self.ml_thread: Optional[QThread] = None
+        self.ml_executor: Optional[ThreadPoolExecutor] = None
+        self.ml_suggestions = deque()
+        self.ml_reviewing = False
+        self.ml_original_position = None
 
         project_name = self.project_controller.get_setting('project_name')
 
         if not self.testing:
-            # if self.sensor_controller.df is not None:
-            #     self.plot_controller.init_graph()
-
-            if self.sensor_controller.file_path:
-                self.label_sensor_data_filename.setText(
-                    self.sensor_controller.file_path.as_posix()
-                )
-
             self.label_project_name_value.setText(project_name)
             self.setWindowTitle("AI Sensus - " + project_name)
 
+        if load_previous_files:
+            self.load_previous_files()
+
+    def load_previous_files(self):
+        """
+        Opens the video and sensor data file that were opened last in the project.
+        """
+        self.video_controller.open_previous_file()
+        self.sensor_controller.open_previous_file()
+
+        if not self.testing and self.sensor_controller.file_path:
+            self.label_sensor_data_filename.setText(
+                self.sensor_controller.file_path.as_posix()
+            )
+
     def std_err_post(self, msg):
         """
         This method receives stderr text strings as a pyqtSlot.
@@ -258,6 +286,10 @@ class GUI(QMainWindow, Ui_MainWindow):
         When opening an existing or starting a new project, the GUI components need to be reset. This may also be
         required after the timezone settings change.
         """
+        if hasattr(self, 'sensor_controller'):
+            # Sensor data that is still loading belongs to the previous project
+            self.sensor_controller.cancel_loading()
+
         self.mediaPlayer.setMedia(QMediaContent())
 
         self.label_project_name_value.clear()
@@ -395,6 +427,8 @@ class GUI(QMainWindow, Ui_MainWindow):
         Open the export dialog window, and if a subject and a file location and name are chosen, export the data
         accordingly.
         """
+        from gui.dialogs.export_dialog import ExportDialog
+
         dialog = ExportDialog(self)
         dialog.exec()
 
@@ -408,6 +442,8 @@ class GUI(QMainWindow, Ui_MainWindow):
         """
         Plot all sensor data per subject per activity for visual inspection of annotated data.
         """
+        from gui.dialogs.visual_analysis_dialog import VisualAnalysisDialog
+
         if self.sensor_controller is not None:
             file_date = self.sensor_controller.utc_dt
         else:
@@ -470,12 +506,11 @@ class GUI(QMainWindow, Ui_MainWindow):
 
     def keyPressEvent(self, event) -> None:
         self.current_key_pressed = event.text()
-        try:
-            if hasattr(self, 'plot_controller'):
-                self.label_active_label_value.setText(
-                    LabelType.get(LabelType.keyboard_shortcut == self.current_key_pressed).activity)
-        except:
-            pass
+
+        if hasattr(self, 'plot_controller') and self.current_key_pressed:
+            label_type = label_types.get_by_shortcut(self.current_key_pressed)
+            if label_type is not None:
+                self.label_active_label_value.setText(label_type.activity)
 
     def keyReleaseEvent(self, event):
         self.current_key_pressed = None
@@ -487,129 +522,213 @@ class GUI(QMainWindow, Ui_MainWindow):
 
     def open_machine_learning_dialog(self):
         """
-        Opens the machine learning dialog window.
+        Opens the machine learning dialog window and starts making label suggestions for the selected columns. The
+        suggestions are made on a worker thread and shown one by one as they come in.
         :return:
         """
-        # TODO: Rewrite function such that 'start' and 'end' are datetimes instead of floats
+        from sklearn.naive_bayes import GaussianNB
+
+        from data_export.feature_store import FeatureStore
+        from gui.dialogs.machine_learning_dialog import MachineLearningDialog, SuggestionWorker
+        from machine_learning.model_cache import ModelCache
+        from machine_learning.suggestion_pipeline import SuggestionPipeline
+
+        if self.sensor_controller.df is None:
+            QMessageBox.warning(self, "No sensor data found", "You need to import sensor data first.")
+            return
+
+        if self.ml_worker is not None or self.ml_reviewing:
+            # Suggestions are still being made or reviewed
+            return
+
         columns = [self.comboBox_functions.itemText(i) for i in range(self.comboBox_functions.count())]
         dialog = MachineLearningDialog(columns)
         dialog.exec()
 
-        self.ml_used_columns = []
-        funcs = {
-            'mean': np.mean,
-            'std': np.std
-        }
-        features = []
-
-        if dialog.is_accepted:
-            # Save current position in the video
-            original_position = self.mediaPlayer.position()
-
-            at_least_1_column = False
-            # For each selected column, add new column names to the lists for machine learning
-            for column in columns:
-                if dialog.column_dict[column]:
-                    at_least_1_column = True
-                    self.ml_used_columns.append(column)
-
-                    for func in funcs:
-                        features.append(column + '_' + func)
-
-            # Show warning if user has selected no columns
-            if not at_least_1_column:
-                QMessageBox.warning(self, 'Warning', "At least one column needs to be selected.", QMessageBox.Cancel)
-                return
+        if not dialog.is_accepted:
+            return
 
-            if self.label_data.get_sensor_id() is None:
-                if self.sensor_data_file.sensor_id is None:
-                    raise Exception('self.sensor_id is None')
-
-                self.label_data.set_sensor_id(self.sensor_data_file.sensor_id)
-
-            # Show a window to tell the user that the classifier is running
-            working_msg = QDialog()
-            working_msg.setWindowTitle("Loading...")
-            working_msg.resize(200, 0)
-            working_msg.open()
-
-            # Run the classifier
-            self.ml_dataframe = self.sensor_data_file.sensor_data.__copy__()
-            self.ml_dataframe.add_timestamp_column(COL_TIME, COL_TIMESTAMP)
-            labels = self.plot.label_manager.get_labels_by_file_and_date(self.sensor_data_file.sensor_id,
-                                                                         self.sensor_data_file.utc_dt.date())
-            self.ml_dataframe.add_labels_ml(labels, COL_LABEL, COL_TIMESTAMP)
-            raw_data = self.ml_dataframe.get_data()
-
-            # Remove data points where label is unknown
-            raw_data = raw_data[raw_data[COL_LABEL] != 'unknown']
-
-            self.ml_dataframe = wd.windowing(raw_data, self.ml_used_columns, COL_LABEL, COL_TIMESTAMP, **funcs)
-            self.ml_classifier.set_df(self.ml_dataframe)
-            self.ml_classifier.set_features(features)
-            res = self.ml_classifier.classify()
-
-            # Close the info window
-            working_msg.close()
-
-            self.video.play()
-
-            for prediction in make_predictions(res):
-                label, start_dt, end_dt = prediction['label'], datetime.fromisoformat(prediction['begin']), \
-                                          datetime.fromisoformat(prediction['end'])
-                # Convert datetime times to time in seconds, which is used on the x-axis of the data-plot
-                start = (start_dt - self.sensor_data_file.utc_dt).total_seconds()
-                end = (end_dt - self.sensor_data_file.utc_dt).total_seconds()
-
-                # Add highlight to data-plot and play video in a loop
-                span, text = self.add_suggestion_highlight(start, end, label)
-                self.loop = (int((start + self.doubleSpinBox_video_offset.value()) * 1000),
-                             int((end + self.doubleSpinBox_video_offset.value()) * 1000))
-                if not self.mediaPlayer.media().isNull():
-                    # if a video is opened set video position to start of the suggested label
-                    self.mediaPlayer.setPosition(self.loop[0])
-                else:
-                    # no video; stop updating-timer and move plot to start of the suggested label
-                    self.timer.stop()
-                    self.plot.update_plot_axis(position=start + self.doubleSpinBox_video_offset.value())
-
-                # Ask user to accept or reject the suggested label
-                msg = QMessageBox()
-                msg.setIcon(QMessageBox.Question)
-                msg.setWindowTitle("Label suggestion")
-                msg.setText("The classifier suggests the following label:")
-                msg.setInformativeText("Label: {}\nLabel start: {}\nLabel end: {}\n\n"
-                                       "Do you want to accept this suggestion?"
-                                       .format(label, self.ms_to_hms(int(start * 1000)),
-                                               self.ms_to_hms(int(end * 1000))))
-                msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-                stop_button = msg.addButton("Stop suggestions", QMessageBox.ActionRole)
-                response = msg.exec()
-
-                # user has given a response, stop the loop and remove highlight
-                self.loop = None
-                span.remove()
-                text.remove()
-
-                # user clicked the "Stop suggestions" button
-                if msg.clickedButton() == stop_button:
-                    break
-
-                # user accepted the current suggestion, add it to the database and make a new highlight
-                if response == QMessageBox.Yes:
-                    self.plot.label_manager.add_label(start_dt, end_dt, label, self.sensor_data_file.sensor_id)
-                    self.add_label_highlight(start, end, label)
-                    self.canvas.draw()
-
-            # reset the video-player and data-plot to the original position and pause the video
+        self.ml_used_columns = [column for column in columns if dialog.column_dict[column]]
+
+        # Show warning if user has selected no columns
+        if not self.ml_used_columns:
+            QMessageBox.warning(self, 'Warning', "At least one column needs to be selected.", QMessageBox.Cancel)
+            return
+
+        if self.ml_classifier_engine is None:
+            self.ml_classifier_engine = GaussianNB()
+
+        sdf = self.sensor_controller.sensor_data_file
+        labels = [{'start': label.start_time, 'end': label.end_time, 'activity': label.label_type.activity}
+                  for label in Label.select().where(Label.sensor_data_file == sdf.id)]
+
+        # The pipeline uses the sensor data that is already loaded, instead of parsing the file again. The columns
+        # are windowed in parallel.
+        self.ml_executor = ThreadPoolExecutor()
+        pipeline = SuggestionPipeline(
+            self.sensor_controller.df, ABSOLUTE_DATETIME, self.ml_used_columns, self.ml_classifier_engine, labels,
+            feature_store=FeatureStore(self.project_controller.get_feature_store_dir()),
+            file_id=self.sensor_controller.get_feature_file_id(),
+            model_cache=ModelCache(self.project_controller.get_model_cache_dir()),
+            label_version=self.project_controller.get_label_version(),
+            executor=self.ml_executor
+        )
+
+        # Save current position in the video
+        self.ml_original_position = self.mediaPlayer.position()
+        self.ml_suggestions = deque()
+
+        self.ml_pipeline = pipeline
+        self.ml_worker = SuggestionWorker(pipeline)
+        self.ml_thread = QThread()
+        self.ml_worker.moveToThread(self.ml_thread)
+        self.ml_worker.suggestion.connect(self.add_suggestion)
+        self.ml_worker.error.connect(self.show_suggestion_error)
+        self.ml_worker.finished.connect(self.ml_thread.quit)
+        self.ml_thread.started.connect(self.ml_worker.run)
+        self.ml_thread.finished.connect(self.ml_worker.deleteLater)
+        self.ml_thread.finished.connect(self.suggestions_finished)
+        self.ml_thread.start()
+
+        self.label_active_label.setText("Making suggestions...")
+
+    def add_suggestion(self, suggestion):
+        """
+        Queues a suggestion of the suggestion worker and shows it when no other suggestion is shown.
+        """
+        self.ml_suggestions.append(suggestion)
+
+        if not self.ml_reviewing:
+            self.review_suggestions()
+
+    def review_suggestions(self):
+        """
+        Asks the user to accept or reject the queued suggestions one by one.
+        """
+        self.ml_reviewing = True
+        sdf = self.sensor_controller.sensor_data_file
+
+        while self.ml_suggestions:
+            suggestion = self.ml_suggestions.popleft()
+            label = str(suggestion['label'])
+            # Naive UTC datetimes, like the labels in the database
+            start_dt = suggestion['begin'].astype('datetime64[us]').item()
+            end_dt = suggestion['end'].astype('datetime64[us]').item()
+            # Convert datetime times to time in seconds since the start of the sensor data
+            start = (start_dt - sdf.datetime).total_seconds()
+            end = (end_dt - sdf.datetime).total_seconds()
+            project_timezone = pytz.timezone(self.project_controller.get_setting('timezone'))
+
+            # Add highlight to data-plot and play video in a loop
+            span, text = self.plot_controller.add_suggestion_highlight(start_dt, end_dt, label)
+            self.loop = (int((start + self.doubleSpinBox_video_offset.value()) * 1000),
+                         int((end + self.doubleSpinBox_video_offset.value()) * 1000))
             if not self.mediaPlayer.media().isNull():
-                self.mediaPlayer.setPosition(original_position)
+                # if a video is opened set video position to start of the suggested label
+                self.mediaPlayer.setPosition(self.loop[0])
+                self.mediaPlayer.play()
             else:
-                # no video was playing, restart the updating-timer
-                self.timer.start(25)
+                # no video; stop updating-timer and move plot to start of the suggested label
+                self.timer.stop()
+                self.plot_controller.update_plot_axis(position=start_dt)
+
+            # Ask user to accept or reject the suggested label
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Question)
+            msg.setWindowTitle("Label suggestion")
+            msg.setText("The classifier suggests the following label:")
+            msg.setInformativeText("Label: {}\nLabel start: {}\nLabel end: {}\n\n"
+                                   "Do you want to accept this suggestion?"
+                                   .format(label,
+                                           utc_to_local(start_dt, project_timezone).strftime('%d-%m-%Y %H:%M:%S'),
+                                           utc_to_local(end_dt, project_timezone).strftime('%d-%m-%Y %H:%M:%S')))
+            msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+            stop_button = msg.addButton("Stop suggestions", QMessageBox.ActionRole)
+            response = msg.exec()
+
+            # user has given a response, stop the loop and remove highlight
+            self.loop = None
+            span.remove()
+            text.remove()
+
+            # user clicked the "Stop suggestions" button
+            if msg.clickedButton() == stop_button:
+                if self.ml_worker is not None:
+                    self.ml_worker.abort()
+                self.ml_suggestions.clear()
+                break
+
+            # user accepted the current suggestion, add it to the database and make a new highlight
+            if response == QMessageBox.Yes:
+                label_type = label_types.get_by_activity(label)
+                try:
+                    Label.create(start_time=start_dt, end_time=end_dt, label_type=label_type,
+                                 sensor_data_file=sdf.id)
+                except IntegrityError:
+                    # There already is a label with the same start time
+                    pass
+                else:
+                    self.project_controller.increment_label_version()
+                    # The next suggestions are made with the accepted label
+                    self.ml_pipeline.add_label(start_dt, end_dt, label, self.project_controller.get_label_version())
+                    self.plot_controller.add_label_highlight(start_dt, end_dt, label_type.id)
+
+            self.canvas.draw()
+            if self.ml_worker is not None:
+                self.ml_worker.suggestion_reviewed()
+
+        self.ml_reviewing = False
+
+        if self.ml_worker is None or self.ml_pipeline.aborted:
+            self.reset_suggestion_position()
+
+    def show_suggestion_error(self, error: str):
+        QMessageBox.warning(self, "Label suggestions", "No suggestions could be made:\n" + error)
+
+    def suggestions_finished(self):
+        """
+        Called when the suggestion worker has stopped.
+        """
+        self.ml_worker = None
+        self.ml_thread = None
+        self.ml_executor.shutdown(wait=False)
+        self.ml_executor = None
+        self.label_active_label.clear()
+
+        if not self.ml_reviewing and not self.ml_suggestions:
+            self.reset_suggestion_position()
+
+    def reset_suggestion_position(self):
+        """
+        Resets the video-player and data-plot to the position from before the suggestions and pauses the video.
+        """
+        if self.ml_original_position is None:
+            return
+
+        if not self.mediaPlayer.media().isNull():
+            self.mediaPlayer.setPosition(self.ml_original_position)
+            self.mediaPlayer.pause()
+        else:
+            # no video was playing, restart the updating-timer
+            self.timer.start(25)
+            self.plot_controller.update_plot_axis()
+
+        self.ml_original_position = None
+
+    def set_sensor_data_loading(self, loading: bool):
+        """
+        Enables the action that cancels loading sensor data while sensor data is loaded in the background.
+        """
+        self.actionCancel_Loading.setEnabled(loading)
+
+    def sensor_data_loaded(self, result, generation: int):
+        """
+        Receives the sensor data that was loaded on a worker thread.
+        """
+        self.sensor_controller.finish_loading(result, generation)
 
-            self.plot.update_plot_axis(position=original_position / 1000)
-            self.video.pause()
+    def sensor_data_load_failed(self, error: str, generation: int):
+        self.sensor_controller.fail_loading(error, generation)
 
 
 def add_seconds_to_datetime(date_time: datetime, seconds: float):
@@ -0,0 +1,301 @@
+"""
+Lightweight instrumentation of the stages of the application.
+
+Code marks a stage with the `span` context manager or the `traced` decorator. When instrumentation is enabled, every
+span records its wall time, the number of rows it processed and, optionally, the peak memory that was allocated while
+it ran. The spans can be summarized per stage, or written to a JSON trace that can be opened in chrome://tracing or
+https://ui.perfetto.dev.
+
+Instrumentation is disabled by default, in which case a span only checks a flag. It is enabled by setting the
+AISENSUS_TRACE environment variable to the path of the trace file, which is then written when the application exits,
+or with the 'instrumentation' project setting, in which case the trace is written to the project directory.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+TRACE_ENV_VAR = 'AISENSUS_TRACE'
+"""Environment variable with the path of the trace file, or 1 to write 'aisensus_trace.json'."""
+
+TRACE_MEMORY_ENV_VAR = 'AISENSUS_TRACE_MEMORY'
+"""Environment variable that enables recording the peak memory of spans, which slows down allocations."""
+
+DEFAULT_TRACE_FILE = 'aisensus_trace.json'
+
+MAX_SPANS = 100000
+"""The number of most recent spans that are kept."""
+
+
+class Span:
+    __slots__ = ('name', 'category', 'args', 'rows', 'thread_id', 'thread_name', 'start', 'end', 'peak_memory',
+                 '_start_memory', '_max_memory')
+
+    def __init__(self, name: str, category: str, rows: Optional[int], args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.rows = rows
+        """The number of rows that were processed, can be set while the span is open."""
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.start = 0.0
+        self.end = 0.0
+        self.peak_memory: Optional[int] = None
+        """The peak number of bytes that were allocated while the span was open, if memory is traced."""
+        self._start_memory = 0
+        self._max_memory = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+class _DisabledSpan:
+    """Stands in for a span while instrumentation is disabled, so that code can set rows unconditionally."""
+    __slots__ = ('rows', 'args')
+
+    def __init__(self):
+        self.rows = None
+        self.args = {}
+
+
+class Tracer:
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.enabled = False
+        self.trace_memory = False
+        self._spans = deque(maxlen=max_spans)
+        self._open_memory_spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._epoch = time.perf_counter()
+
+    def enable(self, trace_memory: bool = False) -> None:
+        """
+        :param trace_memory: Whether to record the peak memory of spans. Uses tracemalloc, which slows down every
+            allocation considerably.
+        """
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    @contextmanager
+    def span(self, name: str, rows: int = None, category: str = 'app', **args) -> Iterator[Span]:
+        """
+        Records the stage that runs in the body of the with-statement.
+
+        :param name: The name of the stage
+        :param rows: The number of rows that are processed, can also be set on the span in the body
+        :param category: The category of the stage in the trace
+        :param args: Additional values that are shown with the span in the trace
+        """
+        if not self.enabled:
+            yield _DisabledSpan()
+            return
+
+        span = Span(name, category, rows, args)
+        memory = self.trace_memory and tracemalloc.is_tracing()
+        if memory:
+            self._start_memory(span)
+
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            if memory:
+                self._stop_memory(span)
+
+            with self._lock:
+                self._spans.append(span)
+
+    def traced(self, name: str = None, rows: Callable[..., int] = None, category: str = 'app'):
+        """
+        Decorator that records every call of a function as span.
+
+        :param name: The name of the stage, the qualified name of the function by default
+        :param rows: Function that returns the number of rows that are processed, given the arguments of the call
+        :param category: The category of the stage in the trace
+        """
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                with self.span(span_name, rows(*args, **kwargs) if rows is not None else None, category):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _start_memory(self, span: Span) -> None:
+        # The peak of tracemalloc is process wide, so it is reset at the start of every span. The peak up to that
+        # point is first passed on to the spans that are still open.
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            for open_span in self._open_memory_spans:
+                open_span._max_memory = max(open_span._max_memory, peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+            span._start_memory = current
+            span._max_memory = current
+            self._open_memory_spans.append(span)
+
+    def _stop_memory(self, span: Span) -> None:
+        with self._lock:
+            _, peak = tracemalloc.get_traced_memory()
+            for open_span in self._open_memory_spans:
+                open_span._max_memory = max(open_span._max_memory, peak)
+
+            self._open_memory_spans.remove(span)
+            span.peak_memory = span._max_memory - span._start_memory
+
+    def summary(self) -> List[dict]:
+        """
+        :return: Per stage the number of calls, the total, mean and maximum seconds, the rows processed, the rows per
+            second and the maximum peak memory, slowest stage first
+        """
+        stages = {}
+        for span in self.spans():
+            stage = stages.setdefault(span.name, {'name': span.name, 'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                  'rows': 0, 'peak_memory': None})
+            stage['calls'] += 1
+            stage['seconds'] += span.seconds
+            stage['max_seconds'] = max(stage['max_seconds'], span.seconds)
+            stage['rows'] += span.rows or 0
+            if span.peak_memory is not None:
+                stage['peak_memory'] = max(stage['peak_memory'] or 0, span.peak_memory)
+
+        for stage in stages.values():
+            stage['mean_seconds'] = stage['seconds'] / stage['calls']
+            stage['rows_per_second'] = stage['rows'] / stage['seconds'] if stage['rows'] and stage['seconds'] else None
+
+        return sorted(stages.values(), key=lambda s: s['seconds'], reverse=True)
+
+    def format_summary(self) -> str:
+        lines = ['{:<40} {:>7} {:>10} {:>10} {:>12} {:>12}'.format('Stage', 'Calls', 'Total (s)', 'Max (s)', 'Rows',
+                                                                   'Peak (MB)')]
+        for stage in self.summary():
+            peak = '{:.1f}'.format(stage['peak_memory'] / 2 ** 20) if stage['peak_memory'] is not None else '-'
+            lines.append('{name:<40} {calls:>7} {seconds:>10.3f} {max_seconds:>10.3f} {rows:>12} {peak:>12}'
+                         .format(peak=peak, **stage))
+        return '\n'.join(lines)
+
+    def to_chrome_trace(self) -> dict:
+        """
+        :return: The spans in the Trace Event Format of chrome://tracing
+        """
+        pid = os.getpid()
+        events = []
+        threads = {}
+
+        for span in self.spans():
+            threads[span.thread_id] = span.thread_name
+
+            args = {key: _json_value(value) for key, value in span.args.items()}
+            if span.rows is not None:
+                args['rows'] = span.rows
+            if span.peak_memory is not None:
+                args['peak_memory_bytes'] = span.peak_memory
+
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': (span.start - self._epoch) * 1e6,
+                'dur': span.seconds * 1e6,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': args
+            })
+
+        for thread_id, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path) -> Path:
+        """
+        Writes the spans as JSON trace.
+
+        :param path: The path of the trace file
+        :return: The path of the trace file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('w') as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+def _json_value(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
+
+
+def environment_trace_file() -> Optional[Path]:
+    """
+    :return: The trace file set with the AISENSUS_TRACE environment variable, or None if it is not set
+    """
+    value = os.environ.get(TRACE_ENV_VAR, '').strip()
+    if value.lower() in ('', '0', 'false'):
+        return None
+    return Path(DEFAULT_TRACE_FILE if value.lower() in ('1', 'true') else value)
+
+
+def apply_setting(enabled: bool) -> None:
+    """
+    Enables or disables instrumentation according to the project setting, unless it was enabled with the environment
+    variable.
+    """
+    if environment_trace_file() is not None:
+        return
+    if enabled and not tracer.enabled:
+        tracer.enable()
+    elif not enabled and tracer.enabled:
+        tracer.disable()
+
+
+def _configure_from_environment() -> None:
+    trace_file = environment_trace_file()
+    if trace_file is None:
+        return
+
+    tracer.enable(trace_memory=os.environ.get(TRACE_MEMORY_ENV_VAR, '').strip().lower() in ('1', 'true'))
+    atexit.register(tracer.dump, trace_file)
+
+
+_configure_from_environment()
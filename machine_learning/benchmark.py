@@ -0,0 +1,208 @@
+"""
+Compares classifiers and feature sets on the labeled data of a project.
+
+The labeled rows of exported sensor data are windowed with `windowing.windowing_fast`, after which every estimator is
+evaluated with grouped cross-validation: the windows of a group, e.g. a subject or a sensor data file, are either all
+in the training set or all in the test set. The folds run in parallel with joblib.
+
+Next to the accuracy, the time to fit and to predict and the peak memory that is allocated while fitting and
+predicting are reported, so that a model can be chosen that fits the throughput budget. The memory is measured with
+`tracemalloc` in the worker process of the fold.
+
+Usage: python -m machine_learning.benchmark export_subject_1.csv export_subject_2.csv --n-jobs 4
+"""
+import argparse
+import pickle
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import delayed, Parallel
+from sklearn.base import clone
+from sklearn.model_selection import GroupKFold
+
+from constants import ABSOLUTE_DATETIME
+from data_export import windowing as w
+from machine_learning.classifier import CLASSIFIER_NAN
+
+LABEL_COL = 'Label'
+GROUP_COL = 'Group'
+
+
+def default_estimators() -> dict:
+    """
+    :return: The estimators that are compared when none are given, by name
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    return {
+        'gaussian_nb': GaussianNB(),
+        'decision_tree': DecisionTreeClassifier(random_state=0),
+        'random_forest': RandomForestClassifier(n_estimators=100, random_state=0),
+        'k_neighbors': KNeighborsClassifier()
+    }
+
+
+def load_windows(paths: List[Path], label_col: str = LABEL_COL, timestamp_col: str = ABSOLUTE_DATETIME,
+                 cols: List[str] = None, window: float = 2, hop: float = 1, comment: str = ';') -> pd.DataFrame:
+    """
+    Windows the labeled rows of exported sensor data files. Every file is a group.
+
+    :param paths: The paths of the exported files
+    :param label_col: The column containing the labels, empty for unlabeled rows
+    :param timestamp_col: The column containing the timestamps
+    :param cols: The columns to window over, by default all numeric columns
+    :param window: The window length in seconds
+    :param hop: The time in seconds between the ends of consecutive windows
+    :param comment: The character that starts a comment line
+    :return: The windows with a label, with the file name in the group column
+    """
+    res = []
+
+    for path in paths:
+        path = Path(path)
+        df = pd.read_csv(path, comment=comment, parse_dates=[timestamp_col])
+        # Unlabeled rows are windowed as separate segments, so labeled windows never cover them
+        df[label_col] = df[label_col].fillna(CLASSIFIER_NAN).astype(str)
+
+        file_cols = cols if cols is not None else \
+            [col for col in df.select_dtypes(include='number').columns if col not in (label_col, timestamp_col)]
+
+        windows = w.windowing_fast(df, file_cols, label_col, timestamp_col, window, hop)
+        windows = windows[windows[label_col] != CLASSIFIER_NAN].dropna()
+        windows[GROUP_COL] = path.stem
+        res.append(windows)
+
+    return pd.concat(res)
+
+
+def _evaluate_fold(name: str, feature_set: str, fold: int, estimator, x: np.ndarray, y: np.ndarray,
+                   train: np.ndarray, test: np.ndarray) -> dict:
+    estimator = clone(estimator)
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        estimator.fit(x[train], y[train])
+        fit_seconds = time.perf_counter() - start
+        _, fit_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        predictions = estimator.predict(x[test])
+        predict_seconds = time.perf_counter() - start
+        _, predict_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'estimator': name,
+        'feature_set': feature_set,
+        'fold': fold,
+        'train_windows': len(train),
+        'test_windows': len(test),
+        'accuracy': float(np.mean(predictions == y[test])),
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds,
+        'predict_us_per_window': predict_seconds / max(len(test), 1) * 1e6,
+        'fit_peak_bytes': fit_memory,
+        'predict_peak_bytes': predict_memory,
+        'model_bytes': len(pickle.dumps(estimator))
+    }
+
+
+def benchmark(windows: pd.DataFrame, estimators: dict = None, feature_sets: Dict[str, List[str]] = None,
+              label_col: str = LABEL_COL, group_col: str = GROUP_COL, n_splits: int = 5,
+              n_jobs: Optional[int] = None) -> pd.DataFrame:
+    """
+    Evaluates every estimator on every feature set with grouped cross-validation.
+
+    :param windows: The labeled windows, with a group column, as returned by `load_windows`
+    :param estimators: The scikit-learn estimators by name, `default_estimators` if None
+    :param feature_sets: Lists of feature columns by name, by default all features
+    :param label_col: The column containing the labels
+    :param group_col: The column containing the groups, e.g. the subject or the sensor data file
+    :param n_splits: The maximum number of folds, at most the number of groups
+    :param n_jobs: The number of folds that are evaluated in parallel, see `joblib.Parallel`
+    :return: One row per estimator, feature set and fold
+    """
+    estimators = estimators if estimators is not None else default_estimators()
+    if feature_sets is None:
+        feature_sets = {'all': [col for col in windows.columns if col not in (label_col, group_col)]}
+
+    groups = windows[group_col].to_numpy()
+    n_groups = len(np.unique(groups))
+    if n_groups < 2:
+        raise ValueError('At least two groups are needed for grouped cross-validation')
+
+    y = windows[label_col].to_numpy(dtype=str)
+    folds = list(GroupKFold(n_splits=min(n_splits, n_groups)).split(windows, y, groups))
+
+    tasks = []
+    for feature_set, features in feature_sets.items():
+        x = windows[features].to_numpy(dtype=float)
+
+        for name, estimator in estimators.items():
+            for fold, (train, test) in enumerate(folds):
+                tasks.append(delayed(_evaluate_fold)(name, feature_set, fold, estimator, x, y, train, test))
+
+    return pd.DataFrame(Parallel(n_jobs=n_jobs)(tasks))
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param results: The results of `benchmark`
+    :return: The mean of every measurement over the folds, and the standard deviation of the accuracy
+    """
+    grouped = results.groupby(['estimator', 'feature_set'])
+    summary = grouped[['accuracy', 'fit_seconds', 'predict_seconds', 'predict_us_per_window', 'fit_peak_bytes',
+                       'predict_peak_bytes', 'model_bytes']].mean()
+    summary.insert(1, 'accuracy_std', grouped['accuracy'].std())
+    return summary.sort_values('accuracy', ascending=False)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m machine_learning.benchmark', description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='+', type=Path, help='Exported sensor data files, one group per file')
+    parser.add_argument('--columns', nargs='+', help='The columns to window over, by default all numeric columns')
+    parser.add_argument('--estimators', nargs='+', choices=sorted(default_estimators()),
+                        help='The estimators to compare, by default all')
+    parser.add_argument('--window', type=float, default=2, help='The window length in seconds')
+    parser.add_argument('--hop', type=float, default=1, help='The time between consecutive windows in seconds')
+    parser.add_argument('--timestamp-column', default=ABSOLUTE_DATETIME)
+    parser.add_argument('--label-column', default=LABEL_COL)
+    parser.add_argument('--n-splits', type=int, default=5)
+    parser.add_argument('--n-jobs', type=int, default=None, help='The number of folds evaluated in parallel')
+    parser.add_argument('--output', type=Path, help='Write the results of every fold to this CSV file')
+    args = parser.parse_args(argv)
+
+    estimators = default_estimators()
+    if args.estimators:
+        estimators = {name: estimators[name] for name in args.estimators}
+
+    windows = load_windows(args.files, args.label_column, args.timestamp_column, args.columns, args.window,
+                           args.hop)
+    results = benchmark(windows, estimators, label_col=args.label_column, n_splits=args.n_splits,
+                        n_jobs=args.n_jobs)
+
+    if args.output is not None:
+        results.to_csv(args.output, index=False)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(summarize(results))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,18 @@
+from typing import Optional, TYPE_CHECKING
+
+import numpy as np
 import pandas as pd
 
+if TYPE_CHECKING:
+    # The model cache imports scikit-learn, which is only needed once a classifier is trained
+    from machine_learning.model_cache import ModelCache
+
 
 """ Constants """
 
 
 CLASSIFIER_NAN = 'NaN'
 
-PRED_TIME_INDEX = 0
-PRED_LABEL_INDEX = 1
-PRED_PROBABILITY_INDEX = 2
-
 PRED_PROB_THRESHOLD = 0.9
 PRED_AMOUNT_THRESHOLD = 2
 
@@ -17,53 +20,58 @@ PRED_AMOUNT_THRESHOLD = 2
 """ Functions """
 
 
-def add_pred_to_list(temp: [], res: []):
+def prediction_dtype(label_dtype) -> np.dtype:
     """
-    Helper function for 'make_predictions'. Calculates average probability and appends to result list in-place.
+    The dtype of the structured array returned by `Classifier.classify`.
 
-    :param temp: The list of new predictions to add
-    :param res: The current list of predictions
+    :param label_dtype: The dtype of the labels
     """
-    # Calculate the average probability of all predictions in temp
-    avg_prob = sum(x[PRED_PROBABILITY_INDEX] for x in temp) / len(temp)
+    return np.dtype([('timestamp', 'datetime64[ns]'), ('label', label_dtype), ('probability', 'f8')])
 
-    if avg_prob >= PRED_PROB_THRESHOLD and len(temp) >= PRED_AMOUNT_THRESHOLD:
-        res.append({
-            'begin': temp[0][PRED_TIME_INDEX],
-            'end': temp[len(temp) - 1][PRED_TIME_INDEX],
-            'label': temp[0][PRED_LABEL_INDEX],
-            'avg_probability': avg_prob
-        })
 
+def grouped_prediction_dtype(label_dtype) -> np.dtype:
+    """
+    The dtype of the structured array returned by `make_predictions`.
 
-def make_predictions(preds: []):
+    :param label_dtype: The dtype of the labels
     """
-    Takes a list of predictions by the classifier and conditionally returns them grouped together in a list of
-    dictionaries.
+    return np.dtype([('begin', 'datetime64[ns]'), ('end', 'datetime64[ns]'), ('label', label_dtype),
+                     ('avg_probability', 'f8')])
+
 
-    :param preds: The predictions by the classifier
-    :return: List of dictionaries with grouped predictions
+def make_predictions(preds: np.ndarray, prob_threshold: float = PRED_PROB_THRESHOLD,
+                     amount_threshold: int = PRED_AMOUNT_THRESHOLD) -> np.ndarray:
     """
-    temp = []
-    res = []
+    Groups consecutive predictions with the same label. Only groups with an average probability of at least
+    `prob_threshold` and at least `amount_threshold` predictions are returned.
 
-    for i in range(0, len(preds)):
-        pred = preds[i]
-        next_pred = None
+    :param preds: The predictions by the classifier, as returned by `Classifier.classify`
+    :param prob_threshold: The minimum average probability of a group
+    :param amount_threshold: The minimum number of predictions in a group
+    :return: Structured array with the fields 'begin', 'end', 'label' and 'avg_probability', one row per group
+    """
+    label_dtype = preds.dtype['label']
+    n = len(preds)
 
-        if i < len(preds) - 1:
-            next_pred = preds[i + 1]
+    if n == 0:
+        return np.empty(0, dtype=grouped_prediction_dtype(label_dtype))
 
-        temp.append(pred)
+    labels = preds['label']
 
-        if next_pred is not None:
-            # Check whether the next label is different than the current label
-            if pred[PRED_LABEL_INDEX] != next_pred[PRED_LABEL_INDEX]:
-                add_pred_to_list(temp, res)
+    # Start and (exclusive) end index of every run of equal labels
+    boundaries = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
 
-                temp = []
-        else:   # Index at last item of list
-            add_pred_to_list(temp, res)
+    counts = ends - starts
+    avg_probs = np.add.reduceat(preds['probability'], starts) / counts
+    keep = (avg_probs >= prob_threshold) & (counts >= amount_threshold)
+
+    res = np.empty(np.count_nonzero(keep), dtype=grouped_prediction_dtype(label_dtype))
+    res['begin'] = preds['timestamp'][starts[keep]]
+    res['end'] = preds['timestamp'][ends[keep] - 1]
+    res['label'] = labels[starts[keep]]
+    res['avg_probability'] = avg_probs[keep]
 
     return res
 
@@ -71,7 +79,7 @@ def make_predictions(preds: []):
 class Classifier:
 
     def __init__(self, classifier=None, df: pd.DataFrame=None, features: [str]=None, label_col: str= 'Label',
-                 timestamp_col: str='Timestamp'):
+                 timestamp_col: str='Timestamp', model_cache: 'ModelCache' = None):
         """
         The classifier class can be used to run a classifier over sensor data.
 
@@ -80,12 +88,16 @@ class Classifier:
         :param features: The features that the classifier should use
         :param label_col: The column that contains the current labels
         :param timestamp_col: The column that contains the timestamps
+        :param model_cache: Cache of trained classifiers, if None the classifier is trained on every run
         """
         self.classifier = classifier
         self.df = df
         self.features = features
         self.label_col = label_col
         self.timestamp_col = timestamp_col
+        self.model_cache = model_cache
+        self.label_version = 0
+        """The label version of the project, used to recognize cached classifiers that are still up to date."""
 
     def set_classifier(self, classifier):
         self.classifier = classifier
@@ -96,11 +108,18 @@ class Classifier:
     def set_features(self, features):
         self.features = features
 
-    def classify(self):
-        """
-        Makes class predictions for datasets.
+    def set_model_cache(self, model_cache: Optional['ModelCache']):
+        self.model_cache = model_cache
+
+    def set_label_version(self, label_version: int):
+        self.label_version = label_version
+
+    def train(self):
         """
+        Trains the classifier on the rows in the DataFrame that have a label.
 
+        :return: The trained classifier
+        """
         if self.classifier is None:
             raise ValueError('self.classifier is None')
         if self.df is None:
@@ -109,22 +128,54 @@ class Classifier:
             raise ValueError('self.features is None')
 
         train_set = self.df[self.df[self.label_col] != CLASSIFIER_NAN]
-        test_set = self.df[self.df[self.label_col] == CLASSIFIER_NAN]
 
-        test_set_timestamps = list(test_set.index.strftime('%Y-%m-%d %H:%M:%S.%f'))
+        if self.model_cache is not None:
+            return self.model_cache.fit(self.classifier, self.features, train_set, train_set[self.label_col],
+                                        self.label_version)
 
-        self.classifier.fit(
+        return self.classifier.fit(
             train_set[self.features],
             train_set[self.label_col]
         )
 
-        preds = self.classifier.predict(test_set[self.features])
-        probs = self.classifier.predict_proba(test_set[self.features])
+    def predict(self, trained, test_set: pd.DataFrame) -> np.ndarray:
+        """
+        Makes class predictions for the rows of `test_set`.
+
+        :param trained: The trained classifier, as returned by `train`
+        :param test_set: The rows to predict, with the timestamps as index
+        :return: Structured array with the fields 'timestamp', 'label' and 'probability', one row per prediction
+        """
+        if self.features is None:
+            raise ValueError('self.features is None')
+
+        if len(test_set) == 0:
+            return np.empty(0, dtype=prediction_dtype(np.asarray(trained.classes_).astype(str).dtype))
 
-        res = []
+        probs = trained.predict_proba(test_set[self.features])
+        # Like predict(), take the class with the highest probability, without evaluating the model twice
+        best = probs.argmax(axis=1)
+        preds = np.asarray(trained.classes_)[best]
+        if preds.dtype == object:
+            preds = preds.astype(str)
 
-        for i in range(0, len(preds)):
-            probability = max(probs[i])
-            res.append([test_set_timestamps[i], preds[i], probability])
+        # Keep the wall clock time of the index, also for timezone aware indices
+        timestamps = test_set.index
+        if timestamps.tz is not None:
+            timestamps = timestamps.tz_localize(None)
+
+        res = np.empty(len(test_set), dtype=prediction_dtype(preds.dtype))
+        res['timestamp'] = timestamps.to_numpy(dtype='datetime64[ns]')
+        res['label'] = preds
+        res['probability'] = probs[np.arange(len(best)), best]
 
         return res
+
+    def classify(self) -> np.ndarray:
+        """
+        Makes class predictions for the rows in the DataFrame that have no label.
+
+        :return: Structured array with the fields 'timestamp', 'label' and 'probability', one row per prediction
+        """
+        trained = self.train()
+        return self.predict(trained, self.df[self.df[self.label_col] == CLASSIFIER_NAN])
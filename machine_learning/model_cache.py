@@ -0,0 +1,154 @@
+import copy
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+ENTRY_ESTIMATOR = 'estimator'
+ENTRY_LABEL_VERSION = 'label_version'
+ENTRY_TRAINED_INDEX = 'trained_index'
+ENTRY_TRAINED_LABELS = 'trained_labels'
+
+
+class ModelCache:
+    """
+    Persists trained estimators in a directory, so that a classifier does not have to be trained from scratch every
+    time suggestions are made.
+
+    Every entry is keyed by the estimator class and parameters and by the features it was trained on. Next to the
+    estimator, an entry stores the label version of the project at the time of training and the index and labels of
+    the rows it was trained on. When the label version did not change, the stored estimator is used as is. Otherwise,
+    estimators that support `partial_fit` are updated with only the rows that were added since they were trained, as
+    long as none of the rows they were trained on changed. In all other cases the estimator is trained again.
+
+    Entries are stored with joblib and loaded memory mapped, so large arrays are not read until they are used.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def key(estimator, features: List[str]) -> str:
+        """
+        :param estimator: A scikit-learn estimator
+        :param features: The features the estimator is trained on
+        :return: The key of the cache entry for this estimator configuration and feature set
+        """
+        params = sorted((name, repr(value)) for name, value in estimator.get_params().items())
+        config = repr((type(estimator).__module__, type(estimator).__qualname__, params, list(features)))
+        return hashlib.blake2b(config.encode('utf-8'), digest_size=16).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir.joinpath(key + '.joblib')
+
+    def load(self, key: str) -> Optional[dict]:
+        path = self.entry_path(key)
+
+        if not path.is_file():
+            return None
+
+        try:
+            return joblib.load(path, mmap_mode='r')
+        except Exception:
+            # A corrupt or incompatible entry is treated as missing, it is overwritten by the next fit.
+            return None
+
+    def save(self, key: str, entry: dict) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.entry_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=path.name, suffix='.tmp')
+        os.close(fd)
+
+        try:
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def fit(self, estimator, features: List[str], x: pd.DataFrame, y: pd.Series, label_version: int):
+        """
+        Returns `estimator` trained on `x` and `y`, reusing or updating a cached estimator when possible.
+
+        :param estimator: The (untrained) scikit-learn estimator, used for its configuration
+        :param features: The feature columns of `x`
+        :param x: The training data, the index identifies the rows (e.g. window timestamps)
+        :param y: The labels of the training data
+        :param label_version: The label version of the project, which changes every time labels are changed
+        :return: The trained estimator
+        """
+        key = self.key(estimator, features)
+        entry = self.load(key)
+
+        index = self._row_ids(x.index)
+        labels = np.asarray(y, dtype=str)
+
+        if entry is not None:
+            if entry[ENTRY_LABEL_VERSION] == label_version and np.array_equal(entry[ENTRY_TRAINED_INDEX], index):
+                return entry[ENTRY_ESTIMATOR]
+
+            new_rows = self._new_rows(entry, index, labels)
+
+            if new_rows is not None and hasattr(entry[ENTRY_ESTIMATOR], 'partial_fit'):
+                # The loaded estimator is memory mapped read-only, so it is copied before updating.
+                trained = copy.deepcopy(entry[ENTRY_ESTIMATOR])
+                del entry
+
+                if new_rows.any():
+                    trained.partial_fit(x.loc[new_rows, features], labels[new_rows])
+
+                self.save(key, self._entry(trained, label_version, index, labels))
+                return trained
+
+            del entry
+
+        trained = clone(estimator).fit(x[features], labels)
+        self.save(key, self._entry(trained, label_version, index, labels))
+        return trained
+
+    @staticmethod
+    def _row_ids(index: pd.Index) -> np.ndarray:
+        # Timestamps are stored as integers, which unlike (timezone aware) objects can be memory mapped.
+        if isinstance(index, pd.DatetimeIndex):
+            return index.asi8
+        return np.asarray(index)
+
+    @staticmethod
+    def _new_rows(entry: dict, index: np.ndarray, labels: np.ndarray) -> Optional[np.ndarray]:
+        """
+        :return: A boolean mask of the rows that were not trained on, or None if any trained row was changed or
+            removed, or if a new row has a label the estimator does not know.
+        """
+        trained_index = np.asarray(entry[ENTRY_TRAINED_INDEX])
+        trained_labels = pd.Series(np.asarray(entry[ENTRY_TRAINED_LABELS]), index=trained_index)
+
+        if not trained_labels.index.is_unique or not pd.Index(index).is_unique:
+            return None
+
+        current = pd.Series(labels, index=index)
+        if not trained_labels.index.isin(current.index).all():
+            return None
+        if not np.array_equal(current.loc[trained_labels.index].values, trained_labels.values):
+            return None
+
+        new_rows = ~current.index.isin(trained_labels.index)
+        if not np.isin(labels[new_rows], entry[ENTRY_ESTIMATOR].classes_).all():
+            return None
+
+        return new_rows
+
+    @staticmethod
+    def _entry(estimator, label_version: int, index: np.ndarray, labels: np.ndarray) -> dict:
+        return {
+            ENTRY_ESTIMATOR: estimator,
+            ENTRY_LABEL_VERSION: label_version,
+            ENTRY_TRAINED_INDEX: index,
+            ENTRY_TRAINED_LABELS: labels
+        }
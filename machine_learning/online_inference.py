@@ -0,0 +1,404 @@
+"""
+Label suggestions for sensor data that is still being recorded.
+
+`Classifier.classify` predicts all windows of a complete DataFrame at once. For a sensor file that is still being
+written, `OnlineClassifier` consumes the new rows as they arrive. The most recent rows are kept in a `RingBuffer`, the
+windows are the same as those of `windowing.windowing` for an unlabeled segment, and the predictions are grouped with
+the semantics of `make_predictions`. A group is emitted once it is complete, or once it is `max_group_windows` long,
+which bounds the time between a row arriving and its suggestion being emitted.
+
+`FileTail` reads the rows that were appended to a file since it was last read, as a local stand-in for a live
+sensor.
+"""
+import io
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data_export import spectral_features as sf
+from data_export import window_functions as wf
+from machine_learning.classifier import make_predictions, prediction_dtype, grouped_prediction_dtype, \
+    PRED_AMOUNT_THRESHOLD, PRED_PROB_THRESHOLD
+
+POLL_INTERVAL = 1
+"""The number of seconds between reads of a followed file."""
+
+
+class FileTail:
+
+    def __init__(self, file_path: Path, skip_lines: int = 0, encoding: str = 'utf-8'):
+        """
+        Reads the lines that were appended to a file since the previous read.
+
+        :param file_path: The path of the file, which may not exist yet
+        :param skip_lines: The number of lines at the start of the file that are not data, e.g. a header
+        :param encoding: The encoding of the file
+        """
+        self.file_path = Path(file_path)
+        self.skip_lines = skip_lines
+        self.encoding = encoding
+        self.offset = 0
+        """The position in the file after the last complete line that was read."""
+
+    def read_lines(self) -> List[str]:
+        """
+        :return: The complete lines that were appended since the previous read. A line that is still being written
+            (without line ending) is returned by a later read.
+        """
+        try:
+            with self.file_path.open(mode='rb') as f:
+                if f.seek(0, io.SEEK_END) < self.offset:
+                    # The file was truncated or replaced, start over
+                    self.offset = 0
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return []
+
+        start_offset = self.offset
+        self.offset += end
+        lines = data[:end].decode(self.encoding).splitlines()
+
+        if start_offset == 0 and self.skip_lines:
+            lines = lines[self.skip_lines:]
+
+        return [line for line in lines if line.strip()]
+
+    def read_frame(self, names: List[str], **read_csv_kwargs) -> pd.DataFrame:
+        """
+        :param names: The names of the columns
+        :param read_csv_kwargs: Keyword arguments of `pd.read_csv`, e.g. `sep`
+        :return: The rows that were appended since the previous read
+        """
+        lines = self.read_lines()
+        if not lines:
+            return pd.DataFrame(columns=names)
+
+        return pd.read_csv(io.StringIO('\n'.join(lines)), names=names, header=None, **read_csv_kwargs)
+
+
+class RingBuffer:
+
+    def __init__(self, capacity: int, n_cols: int):
+        """
+        Keeps the timestamps and values of the last `capacity` rows.
+
+        :param capacity: The maximum number of rows
+        :param n_cols: The number of value columns
+        """
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, n_cols))
+        self.count = 0
+        """The total number of rows that were appended."""
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        :param timestamps: The timestamps of the rows in nanoseconds
+        :param values: The values of the rows, one column per value column
+        """
+        n = len(timestamps)
+        if n > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+            self.count += n - self.capacity
+            n = self.capacity
+
+        pos = np.arange(self.count, self.count + n) % self.capacity
+        self.timestamps[pos] = timestamps
+        self.values[pos] = values
+        self.count += n
+
+    def ordered(self) -> (np.ndarray, np.ndarray):
+        """
+        :return: Copies of the timestamps and values in the order they were appended
+        """
+        pos = np.arange(self.count - len(self), self.count) % self.capacity
+        return self.timestamps[pos], self.values[pos]
+
+
+class StreamingGrouper:
+
+    def __init__(self, prob_threshold: float = PRED_PROB_THRESHOLD, amount_threshold: int = PRED_AMOUNT_THRESHOLD,
+                 max_group_windows: Optional[int] = None):
+        """
+        Groups predictions that arrive in batches like `make_predictions` groups all predictions at once.
+
+        :param prob_threshold: The minimum average probability of a group
+        :param amount_threshold: The minimum number of predictions in a group
+        :param max_group_windows: If given, a group is emitted once it has this many predictions, longer runs are
+            emitted as several groups
+        """
+        self.prob_threshold = prob_threshold
+        self.amount_threshold = amount_threshold
+        self.max_group_windows = max_group_windows
+        self.open: Optional[np.ndarray] = None
+        """The predictions of the last run, which may be continued by the next batch."""
+
+    def add(self, preds: np.ndarray) -> np.ndarray:
+        """
+        :param preds: The next predictions, as returned by `Classifier.classify`
+        :return: The groups that were completed, see `make_predictions`
+        """
+        if self.open is not None and len(self.open):
+            # The labels of the batches can have string types of different lengths
+            dtype = prediction_dtype(np.promote_types(self.open.dtype['label'], preds.dtype['label']))
+            preds = np.concatenate((self.open.astype(dtype), preds.astype(dtype)))
+
+        if len(preds) == 0:
+            return make_predictions(preds, self.prob_threshold, self.amount_threshold)
+
+        labels = preds['label']
+        boundaries = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        last_run = boundaries[-1] if len(boundaries) else 0
+
+        complete = [preds[:last_run]]
+        self.open = preds[last_run:]
+
+        if self.max_group_windows is not None:
+            # Runs are cut into groups of at most `max_group_windows` predictions
+            complete = []
+            starts = np.concatenate(([0], boundaries))
+            for start, end in zip(starts, np.concatenate((boundaries, [len(preds)]))):
+                for i in range(start, end, self.max_group_windows):
+                    complete.append(preds[i:min(i + self.max_group_windows, end)])
+
+            self.open = complete.pop() if len(complete[-1]) < self.max_group_windows else preds[:0]
+
+        groups = [make_predictions(part, self.prob_threshold, self.amount_threshold) for part in complete]
+        return np.concatenate(groups)
+
+    def flush(self) -> np.ndarray:
+        """
+        :return: The group of the last run, which is considered complete
+        """
+        if self.open is None:
+            return np.empty(0, dtype=grouped_prediction_dtype('U1'))
+
+        groups = make_predictions(self.open, self.prob_threshold, self.amount_threshold)
+        self.open = None
+        return groups
+
+
+class OnlineClassifier:
+
+    def __init__(self, trained, cols: List[str], funcs: Dict[str, Union[str, Callable]], window: float = 2,
+                 hop: float = 1, features: List[str] = None, capacity: int = None,
+                 prob_threshold: float = PRED_PROB_THRESHOLD, amount_threshold: int = PRED_AMOUNT_THRESHOLD,
+                 max_group_windows: Optional[int] = None):
+        """
+        Classifies the windows of sensor data that arrives in batches.
+
+        :param trained: A trained scikit-learn classifier
+        :param cols: The columns that are windowed over
+        :param funcs: A dictionary of function names and functions, like in `windowing.windowing`
+        :param window: The window length in seconds
+        :param hop: The time in seconds between the ends of consecutive windows
+        :param features: The features the classifier was trained on, in order. By default all combinations of `cols`
+            and `funcs`, in the order of the columns of `windowing.windowing`.
+        :param capacity: The number of rows that are kept, at least the rows of a window. By default four windows.
+        :param prob_threshold: The minimum average probability of a group
+        :param amount_threshold: The minimum number of predictions in a group
+        :param max_group_windows: If given, a group is emitted once it has this many predictions, which bounds the
+            latency of the suggestions to `max_group_windows * hop` seconds
+        """
+        self.trained = trained
+        self.cols = list(cols)
+        self.funcs = funcs
+        self.window = window
+        self.hop = hop
+        self.features = features if features is not None else \
+            sorted('%s_%s' % (col, func_name) for col in self.cols for func_name in funcs)
+        self.capacity = capacity
+        self.grouper = StreamingGrouper(prob_threshold, amount_threshold, max_group_windows)
+
+        self.rpw: Optional[int] = None
+        self.rph: Optional[int] = None
+        self.buffer: Optional[RingBuffer] = None
+        self.origin_ns = 0
+        """The time of the first row, from which the ends of the windows are counted."""
+        self.next_window = 0
+        """The number of the next window, which ends `window + next_window * hop` seconds after the first row."""
+        self.last_stop = 0
+        """The row after the last row of the last emitted window."""
+        self._head: List[tuple] = []
+        """The first rows, until the number of rows per window can be determined."""
+
+    def push(self, timestamps, values: np.ndarray) -> np.ndarray:
+        """
+        Adds new rows and classifies the windows that end in them.
+
+        :param timestamps: The timestamps of the rows, in order
+        :param values: The values of the rows, one column per column in `cols`
+        :return: The groups that were completed, see `make_predictions`
+        """
+        ns = np.asarray(timestamps, dtype='datetime64[ns]').view(np.int64)
+        values = np.asarray(values, dtype=float).reshape(len(ns), len(self.cols))
+
+        if self.buffer is None:
+            self._head.append((ns, values))
+            ns = np.concatenate([head[0] for head in self._head])
+            values = np.concatenate([head[1] for head in self._head])
+
+            if not self._init_buffer(ns):
+                return self.grouper.add(self._empty_predictions())
+            self._head = []
+
+        # Add the rows in parts that fit in the buffer next to the rows of a window
+        step = self.buffer.capacity - self.rpw
+        preds = []
+
+        for i in range(0, len(ns), step):
+            self.buffer.append(ns[i:i + step], values[i:i + step])
+            preds.append(self._predict_ready_windows())
+
+        return self.grouper.add(np.concatenate(preds) if preds else self._empty_predictions())
+
+    def push_frame(self, df: pd.DataFrame, timestamp_col: str) -> np.ndarray:
+        """
+        Like `push`, for a DataFrame with the timestamp column and `cols`.
+        """
+        timestamps = df[timestamp_col]
+        if getattr(timestamps.dt, 'tz', None) is not None:
+            # Keep the wall clock time, like `Classifier.classify`
+            timestamps = timestamps.dt.tz_localize(None)
+
+        return self.push(timestamps.to_numpy(dtype='datetime64[ns]'), df[self.cols].to_numpy(dtype=float))
+
+    def flush(self) -> np.ndarray:
+        """
+        :return: The group of the last predictions, when no more rows will arrive
+        """
+        if self.buffer is not None:
+            # The last windows end after the last row, like at the end of a segment in `windowing.windowing`
+            self.grouper.add(self._predict_ready_windows(final=True))
+
+        return self.grouper.flush()
+
+    def _init_buffer(self, ns: np.ndarray) -> bool:
+        """
+        Determines the rows per window and per hop like `windowing.rows_per_window`, once the rows span the hop.
+        """
+        if len(ns) < 2 or ns[-1] - ns[0] < self.hop * 1e9:
+            return False
+
+        interval = max(float(np.median(np.diff(ns))), 1.0)
+        self.rph = max(int(round(self.hop * 1e9 / interval)), 1)
+        self.rpw = max(int(round(self.window * 1e9 / interval)), 1)
+        self.origin_ns = int(ns[0])
+
+        capacity = self.capacity if self.capacity is not None else 4 * self.rpw
+        self.buffer = RingBuffer(max(capacity, self.rpw + self.rph), len(self.cols))
+        return True
+
+    def _empty_predictions(self) -> np.ndarray:
+        return np.empty(0, dtype=prediction_dtype(np.asarray(self.trained.classes_).astype(str).dtype))
+
+    def _predict_ready_windows(self, final: bool = False) -> np.ndarray:
+        """
+        Classifies the windows of which all rows arrived, which are found from time like in
+        `window_functions.window_bounds`.
+
+        :param final: Whether no more rows will arrive, so that windows that end after the last row are classified
+        """
+        ns, values = self.buffer.ordered()
+        first_row = self.buffer.count - len(ns)
+
+        # A window is complete once a row at or after its end arrived
+        window_ns = int(round(self.window * 1e9))
+        hop_ns = int(round(self.hop * 1e9))
+        limit = int(ns[-1]) + (int(ns[-1] - ns[-2]) if final and len(ns) > 1 else 0)
+        first_end = self.origin_ns + window_ns + self.next_window * hop_ns
+
+        if first_end > limit:
+            return self._empty_predictions()
+
+        windows = (limit - first_end) // hop_ns + 1
+        self.next_window += windows
+
+        # The windows that end in the buffer, in buffer positions. Windows that end in the same gap are emitted once.
+        stops = np.searchsorted(ns, first_end + np.arange(windows, dtype=np.int64) * hop_ns, side='left')
+        stops = np.unique(stops[stops + first_row > self.last_stop])
+        if len(stops) == 0:
+            return self._empty_predictions()
+
+        self.last_stop = int(stops[-1]) + first_row
+        ends = stops - 1
+        starts = np.searchsorted(ns, ns[ends] - window_ns, side='right')
+
+        spectral_names = [func for func in self.funcs.values() if sf.is_spectral_feature(func)]
+        features = {}
+
+        for j, col in enumerate(self.cols):
+            col_values = np.ascontiguousarray(values[:, j])
+            spectral = sf.compute(col_values, spectral_names, self.rpw, self.rph, self.rph / self.hop, stops)
+
+            for func_name, func in self.funcs.items():
+                if isinstance(func, str) and func in spectral:
+                    features['%s_%s' % (col, func_name)] = spectral[func]
+                else:
+                    features['%s_%s' % (col, func_name)] = \
+                        wf.get_window_function(func).evaluate(col_values, starts, stops)
+
+        x = pd.DataFrame({feature: features[feature] for feature in self.features})
+        probs = self.trained.predict_proba(x)
+        best = probs.argmax(axis=1)
+        labels = np.asarray(self.trained.classes_)[best]
+        if labels.dtype == object:
+            labels = labels.astype(str)
+
+        res = np.empty(len(ends), dtype=prediction_dtype(labels.dtype))
+        res['timestamp'] = ns[ends].view('datetime64[ns]')
+        res['label'] = labels
+        res['probability'] = probs[np.arange(len(best)), best]
+        return res
+
+
+def follow(tail: FileTail, classifier: OnlineClassifier, names: List[str], timestamp_col: str,
+           parse_timestamps: Callable[[pd.Series], pd.Series] = None, poll_interval: float = POLL_INTERVAL,
+           stop: threading.Event = None, **read_csv_kwargs) -> Iterator[np.ndarray]:
+    """
+    Classifies the rows that are appended to a file until `stop` is set.
+
+    :param tail: The followed file
+    :param classifier: The online classifier
+    :param names: The names of the columns of the file
+    :param timestamp_col: The column that contains the timestamps
+    :param parse_timestamps: Converts the timestamp column to datetimes, `pd.to_datetime` by default
+    :param poll_interval: The number of seconds between reads of the file
+    :param stop: Stops following the file when set, after which the last group is emitted
+    :param read_csv_kwargs: Keyword arguments of `pd.read_csv`
+    :return: An iterator over the groups that were completed after every read
+    """
+    parse_timestamps = parse_timestamps if parse_timestamps is not None else pd.to_datetime
+    stop = stop if stop is not None else threading.Event()
+
+    while True:
+        # Read once more after `stop` was set, for the rows that were appended in the meantime
+        stopping = stop.is_set()
+        df = tail.read_frame(names, **read_csv_kwargs)
+
+        if len(df):
+            df[timestamp_col] = parse_timestamps(df[timestamp_col])
+            groups = classifier.push_frame(df, timestamp_col)
+            if len(groups):
+                yield groups
+
+        if stopping:
+            break
+
+        time.sleep(poll_interval)
+
+    groups = classifier.flush()
+    if len(groups):
+        yield groups
@@ -0,0 +1,227 @@
+"""
+Generates label suggestions in the background, while the user reviews them.
+
+The pipeline works on the sensor data that is already loaded, it only takes the columns that are used for machine
+learning. It first trains the classifier on the labeled rows, then windows and classifies the unlabeled rows in chunks,
+and yields the grouped predictions of every chunk as soon as the chunk is classified. Labels that the user accepts in
+the meantime are added with `add_label`, the classifier is then trained again before the next chunk is classified.
+
+The pipeline does not use Qt, the GUI runs it on a worker thread.
+"""
+import queue
+import threading
+from concurrent.futures import Executor
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data_export import window_functions as wf
+from data_export import windowing as w
+from data_export.feature_store import FeatureStore
+from machine_learning.classifier import Classifier, CLASSIFIER_NAN, make_predictions, PRED_AMOUNT_THRESHOLD, \
+    PRED_PROB_THRESHOLD
+from machine_learning.model_cache import ModelCache
+
+LABEL_COL = 'Label'
+TIMESTAMP_COL = 'Timestamp'
+
+CHUNK_WINDOWS = 300
+"""The number of windows that are classified at once."""
+
+
+class SuggestionPipeline:
+
+    def __init__(self, df: pd.DataFrame, timestamp_col: str, cols: List[str], estimator, labels: List[dict],
+                 funcs: Dict[str, Union[str, callable]] = None, window: float = 2, hop: float = 1,
+                 feature_store: FeatureStore = None, file_id: str = None, model_cache: ModelCache = None,
+                 label_version: int = 0, chunk_windows: int = CHUNK_WINDOWS,
+                 prob_threshold: float = PRED_PROB_THRESHOLD, amount_threshold: int = PRED_AMOUNT_THRESHOLD,
+                 executor: Executor = None):
+        """
+        :param df: The sensor data, sorted by time
+        :param timestamp_col: The column that contains the absolute datetimes
+        :param cols: The columns that are used for machine learning
+        :param estimator: Classifier from scikit-learn
+        :param labels: The existing labels, dictionaries with the naive UTC datetimes 'start' and 'end' and the
+            'activity', as returned by `core.labels.get_labels`
+        :param funcs: A dictionary of function names and functions that are applied to the windows, see
+            `windowing.windowing`
+        :param window: The window length in seconds
+        :param hop: The time in seconds between the ends of consecutive windows
+        :param feature_store: If given, the windows of the labeled rows are stored here
+        :param file_id: The id of the sensor data in the feature store, see `SensorController.get_feature_file_id`
+        :param model_cache: Cache of trained classifiers, if None the classifier is trained on every run
+        :param label_version: The label version of the project
+        :param chunk_windows: The number of windows that are classified at once
+        :param prob_threshold: The minimum average probability of a suggestion, see `make_predictions`
+        :param amount_threshold: The minimum number of windows of a suggestion, see `make_predictions`
+        :param executor: If given, the windows are computed in parallel on this executor, see
+            `windowing.windowing_parallel`
+        """
+        if feature_store is not None and file_id is None:
+            raise ValueError('A file_id is required to use the feature store')
+
+        self.funcs = funcs if funcs else {'mean': 'mean', 'std': 'std'}
+        self.cols = list(cols)
+        self.window = window
+        self.hop = hop
+        self.feature_store = feature_store
+        self.file_id = file_id
+        self.label_version = label_version
+        self.chunk_windows = chunk_windows
+        self.prob_threshold = prob_threshold
+        self.amount_threshold = amount_threshold
+        self.executor = executor
+
+        # Only the used columns are copied. Timestamps are naive UTC, like the labels in the database.
+        timestamps = df[timestamp_col]
+        if getattr(timestamps.dt, 'tz', None) is not None:
+            timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+
+        self.data = pd.DataFrame({col: df[col].to_numpy() for col in self.cols})
+        self.data[TIMESTAMP_COL] = timestamps.to_numpy(dtype='datetime64[ns]')
+        self.data[LABEL_COL] = CLASSIFIER_NAN
+        self._ns = self.data[TIMESTAMP_COL].to_numpy().view(np.int64)
+
+        self.classifier = Classifier(estimator, features=None, label_col=LABEL_COL, timestamp_col=TIMESTAMP_COL,
+                                     model_cache=model_cache)
+
+        for label in labels:
+            self._set_label(label['start'], label['end'], label['activity'])
+
+        self._pending = queue.SimpleQueue()
+        self._aborted = threading.Event()
+
+    def add_label(self, start, end, activity: str, label_version: int = None) -> None:
+        """
+        Adds a label that was accepted or made by the user. Can be called from any thread, the label is used from the
+        next chunk onwards.
+
+        :param start: The naive UTC start datetime of the label
+        :param end: The naive UTC end datetime of the label
+        :param activity: The activity of the label
+        :param label_version: The label version of the project after adding the label
+        """
+        self._pending.put((start, end, activity, label_version))
+
+    def abort(self) -> None:
+        """
+        Stops the pipeline after the current chunk. Can be called from any thread.
+        """
+        self._aborted.set()
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted.is_set()
+
+    def suggestions(self) -> Iterator[np.ndarray]:
+        """
+        Classifies the unlabeled rows chunk by chunk.
+
+        Suggestions do not continue over the boundary of a chunk, a long activity can be suggested in parts.
+
+        :return: An iterator over the grouped predictions of every chunk, see `make_predictions`. The begin and end of
+            the suggestions are naive UTC datetimes.
+        """
+        trained = self._train()
+        position = 0
+
+        while not self.aborted:
+            if self._apply_pending_labels():
+                trained = self._train()
+
+            chunk = self._next_chunk(position)
+            if chunk is None:
+                return
+
+            start, stop, position = chunk
+            windows = self._windowing(self.data.iloc[start:stop])
+            preds = self.classifier.predict(trained, windows)
+            suggestions = make_predictions(preds, self.prob_threshold, self.amount_threshold)
+
+            if len(suggestions):
+                yield suggestions
+
+    def _set_label(self, start, end, activity: str) -> None:
+        # Same rows as `SensorData.add_labels_ml`: start <= timestamp < end
+        first, last = np.searchsorted(self._ns, [pd.Timestamp(start).value, pd.Timestamp(end).value], side='left')
+        self.data.iloc[first:last, self.data.columns.get_loc(LABEL_COL)] = activity
+
+    def _apply_pending_labels(self) -> bool:
+        applied = False
+
+        while True:
+            try:
+                start, end, activity, label_version = self._pending.get_nowait()
+            except queue.Empty:
+                return applied
+
+            self._set_label(start, end, activity)
+            self.label_version = label_version if label_version is not None else self.label_version + 1
+            applied = True
+
+    def _train(self):
+        train_set = self.data[self.data[LABEL_COL] != CLASSIFIER_NAN]
+
+        if len(train_set) == 0:
+            raise ValueError('There are no labels to train the classifier on')
+
+        # Segments with the same label that are separated by unlabeled rows are windowed as one segment. The windows
+        # are time based, so a window does not cover the unlabeled rows in between.
+        if self.feature_store is not None:
+            windows = self.feature_store.windowing(train_set, self.file_id, self.cols, LABEL_COL, TIMESTAMP_COL,
+                                                   self.window, self.hop, executor=self.executor, **self.funcs)
+        else:
+            windows = self._windowing(train_set)
+
+        self.classifier.set_df(windows)
+        self.classifier.set_features([col for col in windows.columns if col != LABEL_COL])
+        self.classifier.set_label_version(self.label_version)
+
+        return self.classifier.train()
+
+    def _windowing(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.executor is not None:
+            return w.windowing_parallel(df, self.cols, LABEL_COL, TIMESTAMP_COL, self.window, self.hop,
+                                        executor=self.executor, **self.funcs)
+
+        return w.windowing(df, self.cols, LABEL_COL, TIMESTAMP_COL, self.window, self.hop, **self.funcs)
+
+    def _next_chunk(self, position: int) -> Optional[tuple]:
+        """
+        Finds the next chunk of unlabeled rows at or after `position`.
+
+        A chunk contains the rows of `chunk_windows` windows, which are found from time like in
+        `window_functions.window_bounds`. The chunks of a run of unlabeled rows overlap, such that together they emit
+        the same windows as the whole run when a row is sampled at the start of every chunk, as in regularly sampled
+        data.
+
+        :return: The first row and the row after the last row of the chunk and the position of the next chunk, or None
+            if there are no more unlabeled rows
+        """
+        unlabeled = self.data[LABEL_COL].to_numpy()[position:] == CLASSIFIER_NAN
+
+        while unlabeled.any():
+            start = position + int(unlabeled.argmax())
+            labeled = ~unlabeled[start - position:]
+            run_end = start + int(labeled.argmax()) if labeled.any() else len(self.data)
+
+            window_ns = int(round(self.window * 1e9))
+            hop_ns = int(round(self.hop * 1e9))
+
+            # The chunk ends with the first row at or after the end of its last window
+            last_end = self._ns[start] + window_ns + (self.chunk_windows - 1) * hop_ns
+            stop = min(int(np.searchsorted(self._ns, last_end, side='left')) + 1, run_end)
+
+            if len(wf.window_bounds(self._ns[start:stop].view('datetime64[ns]'), self.window, self.hop)[1]):
+                # The next chunk starts one hop after the last window of this chunk
+                next_position = min(int(np.searchsorted(self._ns, last_end - window_ns + hop_ns, side='left')),
+                                    run_end)
+                return start, stop, next_position
+
+            # The rest of the run is shorter than a window
+            unlabeled = unlabeled[run_end - position:]
+            position = run_end
+
+        return None
@@ -112,9 +112,15 @@ def main() -> None:
     main_window = gui.GUI()
     if main_window.app_controller.prev_project_dir is None:
         main_window.show_welcome_dialog()
-    main_window.init_project()
+    main_window.init_project(load_previous_files=False)
     main_window.show()
 
+    # Show the main window before the files of the previous session are loaded
+    QtCore.QTimer.singleShot(0, main_window.load_previous_files)
+
+    # Settings are written to disk with a delay, so make sure the last changes are saved when the app closes.
+    app.aboutToQuit.connect(main_window.project_controller.flush_settings)
+
     # Check whether all dependencies have been installed
     installed = dependencies_installed()
 
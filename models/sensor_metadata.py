@@ -61,14 +61,26 @@ class SensorMetadata:
 
         return IndexError
 
-    def parse_datetime(self):
+    def parse_naive_datetime(self):
+        """
+        Parses the start datetime from the header, without converting it to UTC.
+
+        :return: The naive start datetime, or None if the sensor model has no date and time rows
+        """
         if self.sensor_model.date_row > 0 and self.sensor_model.time_row > 0:
             # Automatically parse date and time from string
             date_row = self._get_value(self.sensor_model.date_row)
             date = dateutil.parser.parse(date_row, fuzzy=True).date()
             time = dateutil.parser.parse(self._get_value(self.sensor_model.time_row), fuzzy=True).time()
             # Create datetime object from date and time
-            naive_dt = dt.datetime.combine(date, time)
+            return dt.datetime.combine(date, time)
+
+        return None
+
+    def parse_datetime(self):
+        naive_dt = self.parse_naive_datetime()
+
+        if naive_dt is not None:
             # Convert naive datetime to UTC
             self.utc_dt = naive_to_utc(naive_dt, self.sensor_timezone)
 
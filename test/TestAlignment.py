@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from constants import ABSOLUTE_DATETIME
+from core.alignment import AlignmentSource, SensorAlignment, NEAREST
+from date_utils import NAT_NS
+
+SECOND = 10 ** 9
+START = pd.Timestamp(2020, 5, 1, 10).value
+
+
+def source(name: str, rate: float, seconds: float, offset: float = 0.0) -> AlignmentSource:
+    times = START + (np.arange(int(seconds * rate)) * SECOND / rate).astype(np.int64)
+    # A linear signal, so that interpolation is exact
+    values = (times - START) / SECOND
+    labels = np.where(values < seconds / 2, 'walk', 'run')
+    return AlignmentSource(name, times, pd.DataFrame({'Ax': values, 'Label': labels}), offset)
+
+
+class TestAlignment(unittest.TestCase):
+
+    def test_resample(self):
+        alignment = SensorAlignment([source('A', 10, 10), source('B', 3, 10)], rate=4)
+        df = next(iter(alignment))
+
+        self.assertEqual(list(df.columns), [ABSOLUTE_DATETIME, 'A_Ax', 'A_Label', 'B_Ax', 'B_Label'])
+        self.assertEqual(df[ABSOLUTE_DATETIME].dt.tz, pytz.utc)
+        self.assertEqual(len(df), alignment.rows)
+        np.testing.assert_allclose(df['A_Ax'], np.arange(len(df)) / 4)
+        # B stops sampling at 9.67 seconds
+        self.assertEqual(df['B_Ax'].last_valid_index(), 38)
+        np.testing.assert_allclose(df['B_Ax'][:39], np.arange(39) / 4)
+        self.assertEqual(df['A_Label'][19], 'walk')
+        self.assertEqual(df['A_Label'][20], 'run')
+
+    def test_gaps(self):
+        a = source('A', 10, 10)
+        times = np.concatenate([a.times[:30], a.times[60:]])
+        df = pd.concat([a.df[:30], a.df[60:]])
+        gap = SensorAlignment([AlignmentSource('A', times, df)], rate=10).block(0)
+
+        self.assertTrue(gap['A_Ax'][30:60].isna().all())
+        self.assertTrue(gap['A_Label'][31:59].isna().all())
+        np.testing.assert_allclose(gap['A_Ax'][60:], np.arange(60, 100) / 10)
+
+        nearest = SensorAlignment([AlignmentSource('A', times, df)], rate=10, method=NEAREST).block(0)
+        self.assertTrue(nearest['A_Ax'][31:59].isna().all())
+        self.assertEqual(nearest['A_Ax'][29], 2.9)
+
+    def test_unsorted(self):
+        a = source('A', 10, 10)
+        times = a.times[::-1].copy()
+        times[5] = NAT_NS
+        df = a.df[::-1]
+        unsorted = AlignmentSource('A', times, df)
+
+        self.assertTrue(np.all(np.diff(unsorted.times) > 0))
+        self.assertEqual(len(unsorted.df), 99)
+        np.testing.assert_allclose(unsorted.df['Ax'], (unsorted.times - START) / SECOND)
+        # Sorted data is used as it is
+        self.assertIs(a.df, AlignmentSource('A', a.times, a.df).df)
+
+    def test_offset(self):
+        # The times of B are shifted 2 seconds forward
+        alignment = SensorAlignment([source('A', 10, 10), source('B', 10, 10, offset=2)], rate=10)
+        df = pd.concat(alignment)
+
+        self.assertEqual(len(df), 120)
+        self.assertTrue(df['A_Ax'][100:].isna().all())
+        np.testing.assert_allclose(df['B_Ax'][20:], np.arange(100) / 10)
+
+    def test_blocks(self):
+        sources = [source('A', 100, 60), source('B', 32, 60)]
+        whole = SensorAlignment(sources, rate=50).block(0)
+        blocks = SensorAlignment(sources, rate=50, block_rows=777)
+
+        self.assertEqual(blocks.blocks, 4)
+        pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), whole)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import contextlib
+import datetime as dt
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generate import generate_sensor_file, START
+from controllers.project_controller import ProjectController
+from data_export import batch_export
+from database.models import SensorModel, Sensor, SensorDataFile, Subject, SubjectMapping, LabelType, Label, Camera, \
+    Offset
+
+
+class TestBatchExport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+        self.project_dir = self.dir.joinpath('project')
+
+        project_controller = ProjectController(None)
+        project_controller.load_or_create(self.project_dir, new_project=True)
+        project_controller.set_setting('timezone', 'UTC')
+
+        sensor_model = SensorModel.create(model_name='test', date_row=2, time_row=3, timestamp_column=0,
+                                          relative_absolute='relative', timestamp_unit='milliseconds', format_string='',
+                                          sensor_id_row=1, sensor_id_column=1, col_names_row=4, comment_style=';')
+        label_type = LabelType.create(activity='walk', color='red', description='', keyboard_shortcut='w')
+        camera = Camera.create(name='cam')
+
+        for i, name in enumerate(['A', 'B']):
+            recording = generate_sensor_file(self.dir.joinpath(f'{name}.csv'), sensor_model, hours=0.02,
+                                             sampling_rate=10, seed=i)
+            sensor = Sensor.create(name=name, model=sensor_model, timezone='UTC')
+            sdf = SensorDataFile.create(file_name=recording.path.name, file_path=recording.path.as_posix(),
+                                        file_id_hash=name, sensor=sensor, datetime=START)
+            subject = Subject.create(name=name)
+            SubjectMapping.create(subject=subject, sensor=sensor, start_datetime=START,
+                                  end_datetime=START + dt.timedelta(hours=1))
+            Label.create(start_time=START, end_time=START + dt.timedelta(seconds=5), label_type=label_type,
+                         sensor_data_file=sdf)
+            Offset.create(camera=camera, sensor=sensor, offset=i + 1.0, added=START.date())
+
+        project_controller.close_db()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def export(self, *args) -> (int, list):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = batch_export.main([self.project_dir.as_posix(), *args])
+
+        return status, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_export(self):
+        status, events = self.export('--jobs', '1')
+
+        self.assertEqual(status, 0)
+        self.assertEqual(events[0]['subjects'], ['A', 'B'])
+        self.assertEqual(events[-1]['exported'], 2)
+        self.assertIn({'event': 'progress', 'percentage': 50, 'subject': 'A',
+                       'file': self.project_dir.joinpath('export', 'export_subject_A.csv').as_posix()}, events)
+
+        df = pd.read_csv(self.project_dir.joinpath('export', 'export_subject_B.csv'))
+        self.assertEqual(len(df), 720)
+        self.assertEqual((df['Label'] == 'walk').sum(), 50)
+
+    def test_parallel_export(self):
+        output_dir = self.dir.joinpath('output')
+        status, events = self.export('--jobs', '2', '--subject', 'B', '--subject', 'A', '--output-dir',
+                                     output_dir.as_posix(), '--start', '2020-05-01T10:00:00+00:00')
+
+        self.assertEqual(status, 0)
+        done = [event for event in events if event['event'] == 'done']
+        self.assertEqual(sorted(event['subject'] for event in done), ['A', 'B'])
+        self.assertEqual([event['rows'] for event in done], [720, 720])
+        self.assertTrue(output_dir.joinpath('export_subject_A.csv').is_file())
+
+    def test_aligned_export(self):
+        status, events = self.export('--jobs', '1', '--subject', 'B', '--rate', '5', '--camera', 'cam')
+
+        self.assertEqual(status, 0)
+        df = pd.read_csv(self.project_dir.joinpath('export', 'export_subject_B.csv'))
+        # 72 seconds at 5 Hz, shifted by the offset of 2 seconds
+        self.assertEqual(len(df), 360)
+        self.assertEqual(list(df.columns), ['absolute_datetime', 'B_Ax', 'B_Ay', 'B_Az', 'B_Gx', 'B_Gy', 'B_Gz',
+                                           'B_Label'])
+        self.assertEqual(pd.Timestamp(df['absolute_datetime'][0]), START + dt.timedelta(seconds=2))
+        self.assertEqual((df['B_Label'] == 'walk').sum(), 25)
+
+    def test_failure(self):
+        self.dir.joinpath('A.csv').unlink()
+
+        status, events = self.export('--jobs', '1')
+
+        self.assertEqual(status, 1)
+        self.assertEqual(events[-1]['failed'], ['A'])
+        failed, = [event for event in events if event['event'] == 'failed']
+        self.assertIn('FileNotFoundError', failed['error'])
+
+    def test_unknown_subject(self):
+        with self.assertRaises(SystemExit) as cm, contextlib.redirect_stderr(io.StringIO()):
+            self.export('--subject', 'C')
+
+        self.assertEqual(cm.exception.code, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+from sklearn.tree import DecisionTreeClassifier
+
+from machine_learning import benchmark
+
+
+def write_export(path: Path, seed: int):
+    """
+    Writes sensor data like the export does: comments, the raw columns, the absolute datetime and the labels, which
+    are empty for unlabeled rows.
+    """
+    rng = np.random.default_rng(seed)
+    labels = ['rest'] * 100 + [''] * 50 + ['move'] * 100
+    means = [0 if label == 'rest' else 10 for label in labels]
+    df = pd.DataFrame({
+        'Time': np.arange(len(labels)) / 10,
+        'Ax': rng.normal(means, 1),
+        'absolute_datetime': pd.date_range('2020-05-01 12:00', periods=len(labels), freq='100ms'),
+        'Label': labels
+    })
+
+    with path.open('w', newline='') as f:
+        f.write(';Subject: {}\n'.format(path.stem))
+        df.to_csv(f, index=False)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = [Path(self.tmp_dir.name, f'subject_{i}.csv') for i in range(3)]
+        for i, path in enumerate(self.paths):
+            write_export(path, i)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_load_windows(self):
+        windows = benchmark.load_windows(self.paths, cols=['Ax'])
+
+        self.assertEqual(set(windows['Label']), {'rest', 'move'})
+        self.assertEqual(set(windows['Group']), {'subject_0', 'subject_1', 'subject_2'})
+        self.assertIn('Ax_mean', windows.columns)
+
+    def test_benchmark(self):
+        windows = benchmark.load_windows(self.paths, cols=['Ax'])
+        estimators = {'nb': GaussianNB(), 'tree': DecisionTreeClassifier(random_state=0)}
+        feature_sets = {'mean': ['Ax_mean'], 'mean_std': ['Ax_mean', 'Ax_std']}
+
+        results = benchmark.benchmark(windows, estimators, feature_sets, n_jobs=2)
+
+        # 2 estimators, 2 feature sets and 3 folds, one per subject
+        self.assertEqual(len(results), 12)
+        self.assertTrue((results['accuracy'] > 0.9).all())
+        self.assertTrue((results['fit_seconds'] > 0).all())
+        self.assertTrue((results['fit_peak_bytes'] > 0).all())
+
+        summary = benchmark.summarize(results)
+        self.assertEqual(len(summary), 4)
+        self.assertIn('predict_us_per_window', summary.columns)
+
+    def test_single_group(self):
+        windows = benchmark.load_windows(self.paths[:1], cols=['Ax'])
+        with self.assertRaises(ValueError):
+            benchmark.benchmark(windows, {'nb': GaussianNB()})
+
+    def test_main(self):
+        output = Path(self.tmp_dir.name, 'results.csv')
+        self.assertEqual(benchmark.main([str(path) for path in self.paths] +
+                                        ['--columns', 'Ax', '--estimators', 'gaussian_nb', '--output', str(output)]),
+                         0)
+        self.assertEqual(len(pd.read_csv(output)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
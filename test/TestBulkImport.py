@@ -0,0 +1,107 @@
+import datetime as dt
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import file_fingerprint
+
+from data_import import bulk_import
+from database.models import db, FileFingerprint, Sensor, SensorDataFile, SensorModel
+
+
+class TestBulkImport(unittest.TestCase):
+
+    def setUp(self) -> None:
+        db.init(':memory:')
+        db.connect()
+        db.create_tables([FileFingerprint, Sensor, SensorDataFile, SensorModel])
+
+        self.sensor_model = SensorModel.create(model_name='test', date_row=2, time_row=3, timestamp_column=0,
+                                               relative_absolute='relative', timestamp_unit='seconds',
+                                               format_string='', sensor_id_row=1, sensor_id_column=1,
+                                               col_names_row=4, comment_style=None)
+        Sensor.create(name='S1', model=self.sensor_model, timezone='Europe/Amsterdam')
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        db.close()
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, sensor_name: str, rows: int = 10) -> Path:
+        path = self.dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = f'Logger\nSensor,{sensor_name}\nDate,2020-05-01\nTime,12:00:00\nt,Ax\n'
+        path.write_text(header + ''.join(f'{i},{i * 2}\n' for i in range(rows)))
+        return path
+
+    def test_import_directory(self):
+        self.write('a.csv', 'S1')
+        self.write('day2/b.csv', 'S2', rows=11)
+        (self.dir / 'notes.txt').write_text('not sensor data')
+
+        result = bulk_import.import_directory(self.dir, self.sensor_model, max_variables=10)
+
+        self.assertEqual(len(result.added), 2)
+        self.assertEqual(SensorDataFile.select().count(), 2)
+
+        # The timezone of S1 is known, so the start time is converted to UTC. S2 is a new sensor without timezone.
+        sdf_a = SensorDataFile.get(SensorDataFile.file_name == 'a.csv')
+        self.assertEqual(sdf_a.sensor.name, 'S1')
+        self.assertEqual(sdf_a.datetime, dt.datetime(2020, 5, 1, 10))
+
+        sdf_b = SensorDataFile.get(SensorDataFile.file_name == 'b.csv')
+        self.assertEqual(sdf_b.sensor.name, 'S2')
+        self.assertIsNone(sdf_b.datetime)
+        self.assertIsNone(sdf_b.sensor.timezone)
+
+    def test_registered_and_duplicate_files_are_skipped(self):
+        self.write('a.csv', 'S1')
+        bulk_import.import_directory(self.dir, self.sensor_model)
+
+        # A copy of a file has the same fingerprint
+        (self.dir / 'copy').mkdir()
+        (self.dir / 'copy' / 'a.csv').write_bytes((self.dir / 'a.csv').read_bytes())
+        self.write('c.csv', 'S1', rows=12)
+
+        result = bulk_import.import_directory(self.dir, self.sensor_model)
+
+        self.assertEqual([path.name for path in result.added], ['c.csv'])
+        self.assertEqual(len(result.skipped), 2)
+        self.assertEqual(SensorDataFile.select().count(), 2)
+
+    def test_unreadable_header(self):
+        self.write('a.csv', 'S1')
+        (self.dir / 'short.csv').write_text('Logger\n')
+
+        result = bulk_import.import_directory(self.dir, self.sensor_model)
+
+        self.assertEqual([path.name for path, _ in result.failed], ['short.csv'])
+        self.assertEqual(SensorDataFile.select().count(), 1)
+
+    def test_unreadable_file(self):
+        self.write('a.csv', 'S1')
+        locked = self.write('locked.csv', 'S1', rows=12)
+        compute_fingerprint = file_fingerprint.compute_fingerprint
+
+        def fail_for_locked(file_path, *args, **kwargs):
+            if Path(file_path).name == locked.name:
+                raise PermissionError(13, 'Permission denied', str(file_path))
+            return compute_fingerprint(file_path, *args, **kwargs)
+
+        progress = []
+        with mock.patch.object(file_fingerprint, 'compute_fingerprint', side_effect=fail_for_locked):
+            result = bulk_import.import_directory(self.dir, self.sensor_model,
+                                                  progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual([path.name for path in result.added], ['a.csv'])
+        self.assertEqual([path.name for path, _ in result.failed], ['locked.csv'])
+        self.assertIn('Permission denied', result.failed[0][1])
+        self.assertEqual(SensorDataFile.select().count(), 1)
+        self.assertEqual(progress[-1], (4, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+
+from machine_learning.classifier import Classifier, CLASSIFIER_NAN, make_predictions, prediction_dtype
+
+
+def predictions(labels, probabilities):
+    res = np.empty(len(labels), dtype=prediction_dtype('U10'))
+    res['timestamp'] = np.datetime64('2020-05-01T12:00:00', 'ns') + np.arange(len(labels)) * np.timedelta64(1, 's')
+    res['label'] = labels
+    res['probability'] = probabilities
+    return res
+
+
+class TestClassifier(unittest.TestCase):
+
+    def test_make_predictions_groups_runs(self):
+        preds = predictions(['walk', 'walk', 'walk', 'run', 'run', 'walk', 'stand', 'stand'],
+                            [1.0, 0.9, 0.95, 0.8, 0.85, 1.0, 0.99, 0.91])
+
+        res = make_predictions(preds)
+
+        # 'run' has a too low average probability and the single 'walk' is too short.
+        self.assertEqual(list(res['label']), ['walk', 'stand'])
+        self.assertEqual(res['begin'][0], preds['timestamp'][0])
+        self.assertEqual(res['end'][0], preds['timestamp'][2])
+        self.assertEqual(res['begin'][1], preds['timestamp'][6])
+        self.assertEqual(res['end'][1], preds['timestamp'][7])
+        self.assertAlmostEqual(res['avg_probability'][0], 0.95)
+
+    def test_make_predictions_thresholds(self):
+        preds = predictions(['walk', 'run', 'run'], [0.5, 0.6, 0.6])
+
+        self.assertEqual(len(make_predictions(preds)), 0)
+        self.assertEqual(list(make_predictions(preds, prob_threshold=0.5, amount_threshold=1)['label']),
+                         ['walk', 'run'])
+        self.assertEqual(len(make_predictions(preds[:0])), 0)
+
+    def test_classify(self):
+        index = pd.date_range('2020-05-01 12:00', periods=8, freq='s', tz='Europe/Amsterdam')
+        df = pd.DataFrame({
+            'x_mean': [0.0, 0.1, 10.0, 10.1, 0.05, 10.05, 0.02, 9.9],
+            'Label': ['rest', 'rest', 'move', 'move', CLASSIFIER_NAN, CLASSIFIER_NAN, CLASSIFIER_NAN, CLASSIFIER_NAN]
+        }, index=index)
+
+        res = Classifier(GaussianNB(), df, ['x_mean']).classify()
+
+        self.assertEqual(list(res['label']), ['rest', 'move', 'rest', 'move'])
+        self.assertEqual(res['timestamp'][0], np.datetime64('2020-05-01T12:00:04', 'ns'))
+        self.assertTrue(np.all(res['probability'] > 0.9))
+
+
+if __name__ == '__main__':
+    unittest.main()
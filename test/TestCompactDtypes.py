@@ -0,0 +1,59 @@
+import datetime as dt
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_import.compact_dtypes import compact_column, compact_frame, categorical_labels
+from date_utils import to_utc_ns
+
+START = dt.datetime(2020, 5, 1, 12, 0)
+SECOND = 10 ** 9
+
+
+class TestCompactDtypes(unittest.TestCase):
+
+    def test_compact_column(self):
+        self.assertEqual(compact_column(pd.Series([0.25, -1.5, np.nan, 9.81])).dtype, np.float32)
+        self.assertEqual(compact_column(pd.Series([1, -2, 3])).dtype, np.int32)
+
+        # Values that need the precision or range of 64 bits are kept
+        self.assertEqual(compact_column(pd.Series([1588334400.001, 1588334400.002])).dtype, np.float64)
+        self.assertEqual(compact_column(pd.Series([1e300])).dtype, np.float64)
+        self.assertEqual(compact_column(pd.Series([2 ** 40])).dtype, np.int64)
+        strings = pd.Series(['a', 'b'], dtype=object)
+        self.assertIs(compact_column(strings), strings)
+
+    def test_categorical_labels(self):
+        times = to_utc_ns(START) + np.arange(10) * SECOND
+        labels = [(to_utc_ns(START), to_utc_ns(START) + 4 * SECOND, 'walk'),
+                  (to_utc_ns(START) + 2 * SECOND, to_utc_ns(START) + 3 * SECOND, 'run')]
+
+        self.assertEqual(list(categorical_labels(times, labels)), ['walk', 'walk', 'run', 'walk'] + [''] * 6)
+        self.assertEqual(list(categorical_labels(times, [])), [''] * 10)
+
+    def test_memory(self):
+        n = 100000
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({name: rng.normal(size=n).round(4) for name in ['Ax', 'Ay', 'Az', 'Gx', 'Gy', 'Gz']})
+        df.insert(0, 'Time', np.arange(n) * 10.0)
+        times = to_utc_ns(START) + np.arange(n) * SECOND // 100
+        labels = [(to_utc_ns(START) + i * 60 * SECOND, to_utc_ns(START) + (i * 60 + 30) * SECOND, 'walk')
+                  for i in range(16)]
+
+        default = df.copy()
+        default['Label'] = ''
+        for start, end, activity in labels:
+            default.loc[(times >= start) & (times < end), 'Label'] = activity
+
+        compact = compact_frame(df.copy(), skip=['Time'])
+        compact['Label'] = categorical_labels(times, labels)
+
+        self.assertTrue((compact['Label'].astype(str) == default['Label']).all())
+        np.testing.assert_allclose(compact['Ax'], default['Ax'], rtol=1e-6)
+        self.assertEqual(compact['Time'].dtype, np.float64)
+        self.assertLess(compact.memory_usage(deep=True).sum(), 0.5 * default.memory_usage(deep=True).sum())
+
+
+if __name__ == '__main__':
+    unittest.main()
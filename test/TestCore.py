@@ -0,0 +1,210 @@
+import datetime as dt
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import core
+from benchmarks import import_time
+from benchmarks.generate import generate_sensor_file, START
+from constants import COMPACT_DTYPES
+from controllers.project_controller import ProjectController
+from data_import.import_exception import DatetimeFormatException
+from data_import import sensor_data_cache as sensor_data_cache_module
+from data_import.parsed_data_cache import ParsedDataCache
+from data_import.sensor_data import SensorData
+from data_import.sensor_data_cache import sensor_data_cache
+from database.models import SensorModel, Sensor, SensorDataFile, Subject, SubjectMapping, LabelType, Label
+from exceptions import SensorDataFileDoesNotExist
+
+
+class TestCore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+
+        self.project_controller = ProjectController(None)
+        self.project_controller.load_or_create(self.dir.joinpath('project'), new_project=True)
+        self.project_controller.set_setting('timezone', 'UTC')
+
+        self.sensor_model = SensorModel.create(model_name='test', date_row=2, time_row=3, timestamp_column=0,
+                                               relative_absolute='relative', timestamp_unit='milliseconds',
+                                               format_string='', sensor_id_row=1, sensor_id_column=1, col_names_row=4,
+                                               comment_style=';')
+        self.recording = generate_sensor_file(self.dir.joinpath('data.csv'), self.sensor_model, hours=0.05,
+                                              sampling_rate=10)
+        self.sensor = Sensor.create(name='S1', model=self.sensor_model, timezone='UTC')
+        self.sdf = SensorDataFile.create(file_name='data.csv', file_path=self.recording.path.as_posix(),
+                                         file_id_hash='abc', sensor=self.sensor, datetime=START)
+
+        self.subject = Subject.create(name='subject')
+        SubjectMapping.create(subject=self.subject, sensor=self.sensor, start_datetime=START,
+                              end_datetime=START + dt.timedelta(hours=1))
+        label_type = LabelType.create(activity='walk', color='red', description='', keyboard_shortcut='w')
+        Label.create(start_time=START + dt.timedelta(seconds=10), end_time=START + dt.timedelta(seconds=20),
+                     label_type=label_type, sensor_data_file=self.sdf)
+
+        self.start_dt = pytz.utc.localize(START - dt.timedelta(minutes=1))
+        self.end_dt = pytz.utc.localize(START + dt.timedelta(hours=1))
+
+    def tearDown(self) -> None:
+        self.project_controller.close_db()
+        self.tmp_dir.cleanup()
+
+    def test_open_sensor_data(self):
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id)
+        self.assertEqual(len(sensor_data.get_data()), self.recording.rows)
+
+        # The second time, the data is a copy of the data in the sensor data cache
+        sensor_data.add_labels([])
+        cached = core.open_sensor_data(self.project_controller, self.sdf.id)
+        self.assertEqual(sensor_data_cache.stats()['hits'], 1)
+        self.assertNotIn('Label', cached.get_data().columns)
+        self.assertEqual(cached.metadata.utc_dt, sensor_data.metadata.utc_dt)
+
+        with self.assertRaises(SensorDataFileDoesNotExist):
+            core.open_sensor_data(self.project_controller, self.sdf.id + 1)
+
+        moved = self.recording.path.rename(self.dir.joinpath('moved.csv'))
+        with self.assertRaises(FileNotFoundError):
+            core.open_sensor_data(self.project_controller, self.sdf.id)
+
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id, moved)
+        self.assertEqual(sensor_data.file_path, moved)
+
+    def test_export_subject(self):
+        self.assertEqual(core.find_subject_files(self.subject.id, self.start_dt, self.end_dt), [self.sdf.id])
+
+        progress = []
+        file_path = self.dir.joinpath('export.csv')
+        rows = core.export_subject(self.project_controller, self.subject.id, self.start_dt, self.end_dt, file_path,
+                                   progress.append)
+
+        df = pd.read_csv(file_path)
+        self.assertEqual(rows, self.recording.rows)
+        self.assertEqual(len(df), rows)
+        # 10 seconds at 10 Hz
+        self.assertEqual((df['Label'] == 'walk').sum(), 100)
+        self.assertEqual(progress[-1], 100)
+
+    def test_compact_dtypes(self):
+        self.project_controller.set_setting(COMPACT_DTYPES, True)
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id)
+        core.prepare_sensor_data(sensor_data, self.sdf.id, self.start_dt, self.end_dt)
+
+        df = sensor_data.get_data()
+        self.assertEqual(df['Ax'].dtype, np.float32)
+        self.assertEqual(df['Label'].dtype, 'category')
+        self.assertEqual((df['Label'] == 'walk').sum(), 100)
+
+        file_path = self.dir.joinpath('export.csv')
+        core.write_export(file_path, [sensor_data])
+        self.assertEqual((pd.read_csv(file_path)['Label'] == 'walk').sum(), 100)
+
+    def test_daylight_saving_time(self):
+        # The clocks in Amsterdam are set back from 03:00 to 02:00 at 01:00 UTC
+        self.project_controller.set_setting('timezone', 'Europe/Amsterdam')
+        start = dt.datetime(2020, 10, 25, 0, 30)
+        recording = generate_sensor_file(self.dir.joinpath('dst.csv'), self.sensor_model, hours=1, sampling_rate=1,
+                                         start=start)
+        sdf = SensorDataFile.create(file_name='dst.csv', file_path=recording.path.as_posix(), file_id_hash='dst',
+                                    sensor=self.sensor, datetime=start)
+        Label.create(start_time=dt.datetime(2020, 10, 25, 0, 50), end_time=dt.datetime(2020, 10, 25, 1, 10),
+                     label_type=LabelType.get(), sensor_data_file=sdf)
+
+        sensor_data = core.open_sensor_data(self.project_controller, sdf.id)
+        core.prepare_sensor_data(sensor_data, sdf.id, pytz.utc.localize(dt.datetime(2020, 10, 25, 0, 45)),
+                                 pytz.utc.localize(dt.datetime(2020, 10, 25, 1, 15)))
+
+        df = sensor_data.get_data()
+        self.assertEqual(len(df), 30 * 60)
+        self.assertEqual((df['Label'] == 'walk').sum(), 20 * 60)
+        # The naive local time is set back as well
+        self.assertEqual(df['absolute_datetime'].iloc[0], pd.Timestamp(2020, 10, 25, 2, 45))
+        self.assertEqual(df['absolute_datetime'].iloc[15 * 60], pd.Timestamp(2020, 10, 25, 2, 0))
+        self.assertEqual(sensor_data.utc_ns[0], pd.Timestamp(2020, 10, 25, 0, 45).value)
+
+    def test_sampling_index(self):
+        cache = ParsedDataCache(self.dir.joinpath('cache'))
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id)
+        self.assertFalse(core.load_sensor_data(sensor_data, {}, cache, 'key').from_cache)
+        self.assertAlmostEqual(sensor_data.sampling_index.rate, 10)
+
+        # The index is stored with the file cache
+        restored = core.open_sensor_data(self.project_controller, self.sdf.id)
+        self.assertTrue(core.load_sensor_data(restored, {}, cache, 'key').from_cache)
+        self.assertEqual(restored.sampling_index.rows, self.recording.rows)
+
+        restored.filter_between_dates(START + dt.timedelta(seconds=10), START + dt.timedelta(seconds=20))
+        self.assertEqual(len(restored.get_data()), 100)
+        self.assertEqual(restored.sampling_index.rows, 100)
+        self.assertEqual(restored.sampling_index.starts_ns[0], restored.utc_ns[0])
+
+    def test_failed_formulas(self):
+        cache = ParsedDataCache(self.dir.joinpath('cache'))
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id)
+        result = core.load_sensor_data(sensor_data, {'Double': 'Ax * 2', 'Broken': 'Unknown + 1'}, cache, 'key')
+
+        self.assertEqual(result.formulas, ['Double'])
+        self.assertEqual(list(result.failed), ['Broken'])
+        self.assertIn('Double', sensor_data.get_data().columns)
+
+        # The result is not cached, so that the failed formula is reported again
+        restored = core.open_sensor_data(self.project_controller, self.sdf.id)
+        result = core.load_sensor_data(restored, {'Double': 'Ax * 2', 'Broken': 'Unknown + 1'}, cache, 'key')
+        self.assertFalse(result.from_cache)
+        self.assertEqual(list(result.failed), ['Broken'])
+
+    def test_load_on_worker_thread(self):
+        sensor_data = SensorData(self.project_controller, self.recording.path, self.sensor_model.id)
+        sensor_data.metadata.sensor_timezone = pytz.utc
+        sensor_data.metadata.parse_datetime()
+
+        # The worker gets the fingerprint of the file, so it does not look it up in the database
+        with mock.patch.object(sensor_data_cache_module, 'get_fingerprint', side_effect=AssertionError), \
+                ThreadPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(core.load_sensor_data, sensor_data, {}, fingerprint='worker').result()
+
+        self.assertEqual(len(result.sensor_data.get_data()), self.recording.rows)
+
+    def test_abort_export(self):
+        file_path = self.dir.joinpath('export.csv')
+        sensor_data = core.open_sensor_data(self.project_controller, self.sdf.id)
+        core.prepare_sensor_data(sensor_data, self.sdf.id, self.start_dt, self.end_dt)
+
+        with self.assertRaises(core.ExportCancelled):
+            core.write_export(file_path, [sensor_data], aborted=lambda: True)
+
+    def test_invalid_format_string(self):
+        sensor_model = SensorModel.create(model_name='absolute', date_row=2, time_row=3, timestamp_column=0,
+                                          relative_absolute='absolute', timestamp_unit='formatted string',
+                                          format_string='%Y-%m-%d %H:%M:%S.%f', sensor_id_row=1, sensor_id_column=1,
+                                          col_names_row=4, comment_style=None)
+        recording = generate_sensor_file(self.dir.joinpath('absolute.csv'), sensor_model, hours=0.01,
+                                         sampling_rate=10)
+        sensor_model.format_string = '%d/%m/%Y'
+        sensor_model.save()
+        sensor = Sensor.create(name='S2', model=sensor_model, timezone='UTC')
+        sdf = SensorDataFile.create(file_name='absolute.csv', file_path=recording.path.as_posix(), file_id_hash='def',
+                                    sensor=sensor, datetime=START)
+
+        sensor_data = core.open_sensor_data(self.project_controller, sdf.id)
+        with self.assertRaises(DatetimeFormatException) as cm:
+            core.load_sensor_data(sensor_data, {})
+
+        self.assertIn('format string', cm.exception.describe())
+
+    def test_core_does_not_use_qt(self):
+        # The sensor data is loaded on a worker thread, where no dialogs can be shown
+        records = import_time.profile_imports('core')
+        self.assertEqual(import_time.eager_imports(records, ['PyQt5']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import functools
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from data_export import windowing as w
+from data_export.feature_store import feature_id, FeatureStore
+
+FUNCS = {'mean': np.mean, 'std': np.std}
+
+
+def sensor_data(labels):
+    n = len(labels)
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2020-05-01 12:00', periods=n, freq='100ms', tz='Europe/Amsterdam'),
+        'Ax': rng.normal(size=n),
+        'Ay': rng.normal(size=n),
+        'Label': labels
+    })
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = FeatureStore(Path(self.tmp_dir.name))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def window(self, df, **kwargs):
+        return self.store.windowing(df, 'file', ['Ax', 'Ay'], 'Label', 'Timestamp', **kwargs, **FUNCS)
+
+    def test_same_result_as_windowing(self):
+        df = sensor_data(['walk'] * 300 + ['NaN'] * 300)
+        expected = w.windowing(df, ['Ax', 'Ay'], 'Label', 'Timestamp', **FUNCS)
+
+        pd.testing.assert_frame_equal(self.window(df), expected)
+        # The second time, every segment is read from the store.
+        with mock.patch.object(w, 'windowing', wraps=w.windowing) as windowing:
+            pd.testing.assert_frame_equal(self.window(df), expected)
+            windowing.assert_not_called()
+
+    def test_only_changed_segments_are_computed(self):
+        self.window(sensor_data(['walk'] * 300 + ['NaN'] * 300))
+
+        # Label the second half of the unlabeled rows, the first segment remains the same.
+        df = sensor_data(['walk'] * 300 + ['NaN'] * 150 + ['run'] * 150)
+        with mock.patch.object(w, 'windowing', wraps=w.windowing) as windowing:
+            res = self.window(df)
+            self.assertEqual(windowing.call_count, 2)
+
+        pd.testing.assert_frame_equal(res, w.windowing(df, ['Ax', 'Ay'], 'Label', 'Timestamp', **FUNCS))
+
+    def test_window_and_hop(self):
+        df = sensor_data(['walk'] * 600)
+        res = self.window(df, window=4, hop=2)
+
+        pd.testing.assert_frame_equal(res, w.windowing(df, ['Ax', 'Ay'], 'Label', 'Timestamp', 4, 2, **FUNCS))
+        # Windows end every 2 seconds, starting once the first window is full.
+        self.assertEqual(res.index[1] - res.index[0], pd.Timedelta(seconds=2))
+        self.assertEqual(res.index[0] - df['Timestamp'].iloc[0], pd.Timedelta(seconds=3.9))
+
+    def test_configuration_is_part_of_key(self):
+        keys = {
+            FeatureStore.key('file', ['Ax'], 2, 1, FUNCS),
+            FeatureStore.key('other', ['Ax'], 2, 1, FUNCS),
+            FeatureStore.key('file', ['Ay'], 2, 1, FUNCS),
+            FeatureStore.key('file', ['Ax'], 4, 1, FUNCS),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'mean': np.mean}),
+        }
+        self.assertEqual(len(keys), 5)
+
+    def test_anonymous_functions_are_part_of_key(self):
+        def quantile(q):
+            return lambda a: np.quantile(a, q)
+
+        keys = {
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': lambda a: a.max()}),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': lambda a: a.min()}),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': quantile(0.25)}),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': quantile(0.75)}),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': functools.partial(np.quantile, q=0.25)}),
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': functools.partial(np.quantile, q=0.75)}),
+        }
+        self.assertEqual(len(keys), 6)
+
+        # The same function defined again has the same key
+        self.assertEqual(feature_id(quantile(0.25)), feature_id(quantile(0.25)))
+        self.assertEqual(feature_id(lambda a: a.max()), feature_id(lambda a: a.max()))
+
+    def test_callables_without_stable_name(self):
+        class Reducer:
+            def __call__(self, a):
+                return a.sum()
+
+        with self.assertRaises(ValueError):
+            FeatureStore.key('file', ['Ax'], 2, 1, {'f': Reducer()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import file_fingerprint
+from database.models import db, FileFingerprint
+
+
+class TestFileFingerprint(unittest.TestCase):
+
+    def setUp(self) -> None:
+        db.init(':memory:')
+        db.connect()
+        db.create_tables([FileFingerprint])
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        db.close()
+        self.tmp_dir.cleanup()
+
+    def write(self, name: str, content: bytes) -> Path:
+        path = self.dir / name
+        path.write_bytes(content)
+        return path
+
+    def test_independent_of_location(self):
+        content = os.urandom(500_000)
+        first = self.write('a.csv', content)
+        second = self.write('b.csv', content)
+
+        self.assertEqual(file_fingerprint.compute_fingerprint(first), file_fingerprint.compute_fingerprint(second))
+        self.assertTrue(file_fingerprint.compute_fingerprint(first).endswith('500000'))
+
+    def test_sampled_blocks_and_size_are_hashed(self):
+        content = bytearray(os.urandom(500_000))
+        original = file_fingerprint.compute_fingerprint(self.write('a.csv', bytes(content)))
+
+        for offset in (0, 250_000 - file_fingerprint.BLOCK_SIZE // 2, 499_999):
+            changed = bytearray(content)
+            changed[offset] ^= 0xFF
+            self.assertNotEqual(original, file_fingerprint.compute_fingerprint(self.write('b.csv', bytes(changed))))
+
+        self.assertNotEqual(original, file_fingerprint.compute_fingerprint(self.write('c.csv', bytes(content) + b'0')))
+
+    def test_small_multibyte_and_empty_files(self):
+        small = self.write('small.csv', 'tijd,µT\n0,1\n'.encode('utf-8'))
+        empty = self.write('empty.csv', b'')
+
+        self.assertNotEqual(file_fingerprint.compute_fingerprint(small), file_fingerprint.compute_fingerprint(empty))
+        self.assertTrue(file_fingerprint.compute_fingerprint(empty).endswith('0'))
+
+    def test_memo_avoids_reading_unchanged_files(self):
+        path = self.write('a.csv', os.urandom(1000))
+        fingerprint = file_fingerprint.get_fingerprint(path)
+        self.assertEqual(FileFingerprint.select().count(), 1)
+
+        with mock.patch.object(file_fingerprint, 'compute_fingerprint') as compute:
+            self.assertEqual(file_fingerprint.get_fingerprint(path), fingerprint)
+            compute.assert_not_called()
+
+        # A change of the file invalidates the memo.
+        path.write_bytes(os.urandom(1001))
+        self.assertNotEqual(file_fingerprint.get_fingerprint(path), fingerprint)
+        self.assertEqual(FileFingerprint.select().count(), 1)
+
+    def test_bulk_fingerprints(self):
+        paths = [self.write(f'{i}.csv', os.urandom(100 + i)) for i in range(300)]
+        fingerprints = file_fingerprint.get_fingerprints(paths, max_variables=40)
+
+        self.assertEqual(len(fingerprints), 300)
+        self.assertEqual(FileFingerprint.select().count(), 300)
+        self.assertEqual(fingerprints, file_fingerprint.get_fingerprints(paths, max_variables=40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from benchmarks import import_time
+
+OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       850 |        970 |   json.decoder
+import time:       300 |       1500 | json
+import time:        90 |         90 |       sklearn.base
+import time:       200 |        290 |     sklearn
+Traceback (most recent call last):
+"""
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        records = import_time.parse_importtime(OUTPUT)
+
+        self.assertEqual([record['module'] for record in records],
+                         ['_json', 'json.decoder', 'json', 'sklearn.base', 'sklearn'])
+        self.assertEqual(records[1], {'module': 'json.decoder', 'self_us': 850, 'cumulative_us': 970, 'depth': 1})
+        self.assertEqual(import_time.total_seconds(records, 'json'), 0.0015)
+
+    def test_eager_imports(self):
+        records = import_time.parse_importtime(OUTPUT)
+
+        self.assertEqual(import_time.eager_imports(records, ['sklearn', 'json.tool']), ['sklearn'])
+        self.assertEqual(import_time.eager_imports(records[3:4], ['sklearn']), ['sklearn'])
+
+    def test_profile_imports(self):
+        records = import_time.profile_imports('benchmarks.history')
+
+        self.assertIn('benchmarks.history', [record['module'] for record in records])
+        self.assertGreater(import_time.total_seconds(records, 'benchmarks.history'), 0)
+
+        with self.assertRaises(RuntimeError):
+            import_time.profile_imports('benchmarks.does_not_exist')
+
+
+if __name__ == '__main__':
+    unittest.main()
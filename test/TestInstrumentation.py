@@ -0,0 +1,126 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import Tracer
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tracer = Tracer()
+
+    def tearDown(self) -> None:
+        self.tracer.disable()
+
+    def test_disabled(self):
+        with self.tracer.span('stage') as span:
+            span.rows = 10
+
+        @self.tracer.traced()
+        def add(a, b):
+            return a + b
+
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(self.tracer.spans(), [])
+
+    def test_span(self):
+        self.tracer.enable()
+
+        with self.tracer.span('outer', rows=5, file='data.csv'):
+            with self.tracer.span('inner') as inner:
+                inner.rows = 3
+
+        inner, outer = self.tracer.spans()
+        self.assertEqual((outer.name, outer.rows, outer.args), ('outer', 5, {'file': 'data.csv'}))
+        self.assertEqual((inner.name, inner.rows), ('inner', 3))
+        self.assertLessEqual(outer.start, inner.start)
+        self.assertGreaterEqual(outer.end, inner.end)
+        self.assertIsNone(outer.peak_memory)
+
+    def test_exception(self):
+        self.tracer.enable()
+
+        with self.assertRaises(ValueError):
+            with self.tracer.span('failing'):
+                raise ValueError()
+
+        self.assertEqual([span.name for span in self.tracer.spans()], ['failing'])
+
+    def test_traced(self):
+        self.tracer.enable()
+
+        @self.tracer.traced('windowing', rows=lambda df, *args, **kwargs: len(df))
+        def window(df, size):
+            return df.rolling(size).mean()
+
+        window(pd.DataFrame({'a': range(50)}), 5)
+
+        span, = self.tracer.spans()
+        self.assertEqual((span.name, span.rows), ('windowing', 50))
+        self.assertEqual(window.__name__, 'window')
+
+    @unittest.skipUnless(hasattr(__import__('tracemalloc'), 'reset_peak'), 'tracemalloc.reset_peak is not available')
+    def test_peak_memory(self):
+        self.tracer.enable(trace_memory=True)
+
+        with self.tracer.span('outer'):
+            with self.tracer.span('allocate'):
+                data = np.ones(2 ** 20)
+                del data
+            with self.tracer.span('small'):
+                pass
+
+        allocate, small, outer = self.tracer.spans()
+        self.assertGreaterEqual(allocate.peak_memory, 8 * 2 ** 20)
+        self.assertLess(small.peak_memory, 2 ** 20)
+        # The peak of a nested span counts for the enclosing span as well
+        self.assertGreaterEqual(outer.peak_memory, allocate.peak_memory)
+
+    def test_chrome_trace(self):
+        self.tracer.enable()
+
+        def work():
+            with self.tracer.span('thread', rows=1, path=Path('a.csv')):
+                pass
+
+        thread = threading.Thread(target=work, name='worker')
+        thread.start()
+        thread.join()
+        with self.tracer.span('main'):
+            pass
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = self.tracer.dump(Path(tmp_dir, 'trace', 'trace.json'))
+            with path.open() as f:
+                trace = json.load(f)
+
+        spans = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in spans], ['thread', 'main'])
+        self.assertEqual(spans[0]['args'], {'path': 'a.csv', 'rows': 1})
+        self.assertNotEqual(spans[0]['tid'], spans[1]['tid'])
+        self.assertIn('worker', [event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'])
+
+    def test_summary(self):
+        self.tracer.enable()
+
+        for rows in [10, 20]:
+            with self.tracer.span('stage', rows=rows):
+                pass
+        with self.tracer.span('other'):
+            pass
+
+        summary = {stage['name']: stage for stage in self.tracer.summary()}
+        self.assertEqual(summary['stage']['calls'], 2)
+        self.assertEqual(summary['stage']['rows'], 30)
+        self.assertIsNone(summary['other']['rows_per_second'])
+        self.assertIn('stage', self.tracer.format_summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+
+from controllers.annotation_controller import AnnotationController, NonUniqueShortcutException, \
+    NonUniqueActivityNameException
+from database.label_type_registry import label_types
+from database.models import db, LabelType, Label, SensorDataFile, Sensor, SensorModel
+
+
+class TestLabelTypeRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        db.init(':memory:')
+        db.connect()
+        db.create_tables([LabelType, Label, SensorDataFile, Sensor, SensorModel])
+        label_types.invalidate()
+
+        self.annotation_controller = AnnotationController(gui=mock.Mock())
+        self.annotation_controller.save_label_to_db('walking', 'red', 'w')
+        self.annotation_controller.save_label_to_db('standing', 'blue', '')
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def test_lookups(self):
+        walking = LabelType.get(LabelType.activity == 'walking')
+
+        self.assertEqual(label_types.get_by_shortcut('w').activity, 'walking')
+        self.assertEqual(label_types.get_by_id(walking.id).color, 'red')
+        self.assertEqual(label_types.get_by_activity('standing').color, 'blue')
+        self.assertIsNone(label_types.get_by_shortcut('x'))
+        self.assertEqual([label_type.activity for label_type in label_types.all()], ['walking', 'standing'])
+
+    def test_no_queries_after_load(self):
+        label_types.get_by_id(1)
+        db.close()  # Any query from here on would fail.
+
+        self.assertEqual(label_types.get_by_shortcut('w').activity, 'walking')
+        db.connect()
+
+    def test_invalidated_on_mutation(self):
+        self.assertIsNotNone(label_types.get_by_activity('walking'))
+
+        self.annotation_controller.remove_label('walking')
+        self.assertIsNone(label_types.get_by_activity('walking'))
+        self.assertIsNone(label_types.get_by_shortcut('w'))
+        self.annotation_controller.gui.project_controller.increment_label_version.assert_called_once()
+
+        self.annotation_controller.save_label_to_db('running', 'green', 'w')
+        self.assertEqual(label_types.get_by_shortcut('w').activity, 'running')
+
+    def test_uniqueness_checks(self):
+        with self.assertRaises(NonUniqueActivityNameException):
+            self.annotation_controller.save_label_to_db('walking', 'green', 'q')
+
+        with self.assertRaises(NonUniqueShortcutException) as cm:
+            self.annotation_controller.save_label_to_db('running', 'green', 'w')
+        self.assertEqual(cm.exception.activity, 'walking')
+
+
+if __name__ == '__main__':
+    unittest.main()
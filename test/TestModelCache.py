@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+from sklearn.tree import DecisionTreeClassifier
+
+from machine_learning.model_cache import ModelCache
+
+
+def training_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2020-05-01 12:00', periods=n, freq='s', tz='Europe/Amsterdam')
+    labels = np.where(np.arange(n) % 2 == 0, 'rest', 'move')
+    x = pd.DataFrame({'x_mean': rng.normal(size=n) + (labels == 'move') * 10}, index=index)
+    return x, pd.Series(labels, index=index)
+
+
+class TestModelCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ModelCache(Path(self.tmp_dir.name))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_unchanged_labels_reuse_model(self):
+        x, y = training_data(20)
+        first = self.cache.fit(GaussianNB(), ['x_mean'], x, y, label_version=1)
+
+        with mock.patch.object(GaussianNB, 'fit') as fit, mock.patch.object(GaussianNB, 'partial_fit') as partial_fit:
+            second = self.cache.fit(GaussianNB(), ['x_mean'], x, y, label_version=1)
+            fit.assert_not_called()
+            partial_fit.assert_not_called()
+
+        np.testing.assert_array_equal(first.theta_, second.theta_)
+
+    def test_added_labels_are_trained_incrementally(self):
+        x, y = training_data(40)
+        self.cache.fit(GaussianNB(), ['x_mean'], x[:20], y[:20], label_version=1)
+
+        with mock.patch.object(GaussianNB, 'partial_fit', autospec=True,
+                               side_effect=GaussianNB.partial_fit) as partial_fit:
+            updated = self.cache.fit(GaussianNB(), ['x_mean'], x, y, label_version=2)
+            self.assertEqual(len(partial_fit.call_args[0][1]), 20)
+
+        full = GaussianNB().fit(x, y)
+        np.testing.assert_allclose(updated.theta_, full.theta_)
+        np.testing.assert_allclose(updated.var_, full.var_)
+
+    def test_changed_labels_retrain(self):
+        x, y = training_data(20)
+        self.cache.fit(GaussianNB(), ['x_mean'], x, y, label_version=1)
+
+        y = y.copy()
+        y.iloc[0] = 'move'
+        with mock.patch.object(GaussianNB, 'partial_fit') as partial_fit:
+            self.cache.fit(GaussianNB(), ['x_mean'], x, y, label_version=2)
+            partial_fit.assert_not_called()
+
+    def test_key_depends_on_configuration(self):
+        keys = {
+            ModelCache.key(GaussianNB(), ['a']),
+            ModelCache.key(GaussianNB(var_smoothing=1e-3), ['a']),
+            ModelCache.key(GaussianNB(), ['a', 'b']),
+            ModelCache.key(DecisionTreeClassifier(), ['a'])
+        }
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(ModelCache.key(GaussianNB(), ['a']), ModelCache.key(GaussianNB(), ['a']))
+
+    def test_estimator_without_partial_fit(self):
+        x, y = training_data(40)
+        self.cache.fit(DecisionTreeClassifier(random_state=0), ['x_mean'], x[:20], y[:20], label_version=1)
+        tree = self.cache.fit(DecisionTreeClassifier(random_state=0), ['x_mean'], x, y, label_version=2)
+
+        self.assertEqual(list(tree.predict(x)), list(y))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+
+from data_export import windowing as w
+from machine_learning.classifier import Classifier, CLASSIFIER_NAN, make_predictions, prediction_dtype
+from machine_learning.online_inference import FileTail, follow, OnlineClassifier, RingBuffer, StreamingGrouper
+
+FUNCS = {'mean': 'mean', 'std': 'std', 'dom_freq': 'dominant_frequency'}
+
+
+def predictions(labels, probabilities):
+    res = np.empty(len(labels), dtype=prediction_dtype('U10'))
+    res['timestamp'] = np.datetime64('2020-05-01T12:00:00', 'ns') + np.arange(len(labels)) * np.timedelta64(1, 's')
+    res['label'] = labels
+    res['probability'] = probabilities
+    return res
+
+
+def sensor_data(activities, label=CLASSIFIER_NAN):
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.normal(0 if activity == 'rest' else 10, 1, size=(seconds * 10, 2))
+                             for activity, seconds in activities])
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2020-05-01 12:00', periods=len(values), freq='100ms'),
+        'Ax': values[:, 0],
+        'Ay': values[:, 1],
+        'Label': label
+    })
+
+
+class TestOnlineInference(unittest.TestCase):
+
+    def setUp(self) -> None:
+        train = sensor_data([('rest', 20), ('move', 20)])
+        train['Label'] = ['rest'] * 200 + ['move'] * 200
+        self.train = w.windowing(train, ['Ax', 'Ay'], 'Label', 'Timestamp', **FUNCS)
+        self.features = [col for col in self.train.columns if col != 'Label']
+        self.trained = GaussianNB().fit(self.train[self.features], self.train['Label'])
+
+        self.stream = sensor_data([('rest', 15), ('move', 25), ('rest', 10)])
+
+    def online(self, **kwargs):
+        return OnlineClassifier(self.trained, ['Ax', 'Ay'], FUNCS, **kwargs)
+
+    def expected(self):
+        windows = w.windowing(self.stream, ['Ax', 'Ay'], 'Label', 'Timestamp', **FUNCS)
+        classifier = Classifier(features=self.features)
+        return make_predictions(classifier.predict(self.trained, windows))
+
+    def test_same_groups_as_batch(self):
+        online = self.online(capacity=25)
+        groups = []
+
+        # Batches of different sizes, smaller and larger than the buffer
+        bounds = [0, 3, 4, 50, 51, 130, 290, len(self.stream)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            groups.append(online.push_frame(self.stream.iloc[start:stop], 'Timestamp'))
+        groups.append(online.flush())
+
+        res = np.concatenate(groups)
+        expected = self.expected()
+
+        self.assertEqual(list(res['label']), list(expected['label']))
+        self.assertTrue(np.array_equal(res['begin'], expected['begin']))
+        self.assertTrue(np.array_equal(res['end'], expected['end']))
+        self.assertTrue(np.allclose(res['avg_probability'], expected['avg_probability']))
+
+    def test_gap_same_as_batch(self):
+        # The sensor stops sampling for 5 seconds
+        self.stream = self.stream.drop(index=range(120, 170)).reset_index(drop=True)
+        online = self.online()
+        groups = [online.push_frame(self.stream.iloc[start:start + 40], 'Timestamp')
+                  for start in range(0, len(self.stream), 40)]
+        groups.append(online.flush())
+
+        res = np.concatenate(groups)
+        expected = self.expected()
+
+        self.assertEqual(list(res['label']), list(expected['label']))
+        self.assertTrue(np.array_equal(res['begin'], expected['begin']))
+        self.assertTrue(np.array_equal(res['end'], expected['end']))
+
+    def test_max_group_windows_bounds_latency(self):
+        online = self.online(max_group_windows=5)
+        res = online.push_frame(self.stream.iloc[:300], 'Timestamp')
+
+        # The 'move' run is still open, but its first windows have been emitted
+        self.assertIn('move', list(res['label']))
+        self.assertTrue(((res['end'] - res['begin']) <= np.timedelta64(4, 's')).all())
+
+    def test_streaming_grouper(self):
+        preds = predictions(['walk', 'walk', 'walk', 'run', 'run', 'walk', 'stand', 'stand'],
+                            [1.0, 0.9, 0.95, 0.99, 0.95, 1.0, 0.99, 0.91])
+        grouper = StreamingGrouper()
+
+        res = np.concatenate([grouper.add(preds[:2]), grouper.add(preds[2:4]), grouper.add(preds[4:]),
+                              grouper.flush()])
+        expected = make_predictions(preds)
+
+        self.assertEqual(list(res['label']), list(expected['label']))
+        self.assertTrue(np.array_equal(res['begin'], expected['begin']))
+
+    def test_ring_buffer(self):
+        buffer = RingBuffer(4, 1)
+        buffer.append(np.arange(3), np.arange(3).reshape(-1, 1))
+        buffer.append(np.arange(3, 9), np.arange(3, 9).reshape(-1, 1))
+
+        ns, values = buffer.ordered()
+        self.assertEqual(list(ns), [5, 6, 7, 8])
+        self.assertEqual(list(values[:, 0]), [5, 6, 7, 8])
+        self.assertEqual(buffer.count, 9)
+
+    def test_file_tail(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'sensor.csv')
+            tail = FileTail(path, skip_lines=1)
+            self.assertEqual(tail.read_lines(), [])
+
+            with path.open('w') as f:
+                f.write('Time,Ax\n0,1.5\n1,2.')
+            self.assertEqual(tail.read_lines(), ['0,1.5'])
+
+            with path.open('a') as f:
+                f.write('5\n2,3.5\n')
+            df = tail.read_frame(['Time', 'Ax'])
+            self.assertEqual(list(df['Ax']), [2.5, 3.5])
+            self.assertEqual(tail.read_lines(), [])
+
+    def test_follow(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'sensor.csv')
+            self.stream[['Timestamp', 'Ax', 'Ay']].to_csv(path, index=False)
+
+            stop = threading.Event()
+            stop.set()
+            res = np.concatenate(list(follow(FileTail(path, skip_lines=1), self.online(),
+                                             ['Timestamp', 'Ax', 'Ay'], 'Timestamp', stop=stop)))
+
+            self.assertEqual(list(res['label']), list(self.expected()['label']))
+
+
+if __name__ == '__main__':
+    unittest.main()
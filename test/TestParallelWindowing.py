@@ -0,0 +1,52 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_export import windowing as w
+
+COLS = ['Ax', 'Ay', 'Az', 'Gx']
+
+
+def sensor_data():
+    n = 2000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(n, len(COLS))), columns=COLS)
+    df['Timestamp'] = pd.date_range('2020-05-01 12:00', periods=n, freq='50ms', tz='Europe/Amsterdam')
+    df['Label'] = np.repeat(['walk', 'NaN', 'run', 'NaN'], n // 4)
+    return df
+
+
+class TestParallelWindowing(unittest.TestCase):
+
+    def test_threads(self):
+        df = sensor_data()
+        funcs = {'mean': np.mean, 'std': 'std', 'dom': 'dominant_frequency'}
+        expected = w.windowing(df, COLS, 'Label', 'Timestamp', **funcs)
+
+        for cols_per_task in (1, 3):
+            res = w.windowing_parallel(df, COLS, 'Label', 'Timestamp', max_workers=4, cols_per_task=cols_per_task,
+                                       **funcs)
+            pd.testing.assert_frame_equal(res, expected)
+
+    def test_processes(self):
+        df = sensor_data()
+        expected = w.windowing(df, COLS, 'Label', 'Timestamp', mean=np.mean, range='range')
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            res = w.windowing_parallel(df, COLS, 'Label', 'Timestamp', executor=executor, mean=np.mean,
+                                       range='range')
+
+        pd.testing.assert_frame_equal(res, expected)
+
+    def test_windowing_fast(self):
+        df = sensor_data()
+        expected = w.windowing_fast(df, COLS, 'Label', 'Timestamp')
+        res = w.windowing_parallel(df, COLS, 'Label', 'Timestamp', windowing_func=w.windowing_fast, cols_per_task=2)
+
+        pd.testing.assert_frame_equal(res, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import datetime as dt
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pytz
+
+from benchmarks import import_time
+from data_import.parsed_data_cache import ParsedDataCache, ENTRY_DATA, ENTRY_COLUMNS, ENTRY_UTC_DT, ENTRY_FORMULAS, \
+    ENTRY_SAMPLING_INDEX
+from data_import.sampling_index import SamplingIndex
+
+
+class TestParsedDataCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ParsedDataCache(Path(self.tmp_dir.name, 'cache'), max_entries=2)
+        self.df = pd.DataFrame({
+            'Time': [0.0, 0.1, 0.2],
+            'Ax': [1.0, 2.0, 3.0],
+            'Magnitude': [1.0, 2.0, 3.0],
+            'absolute_datetime': pd.date_range('2020-05-01 12:00', periods=3, freq='100ms')
+        })
+        self.utc_dt = pytz.utc.localize(dt.datetime(2020, 5, 1, 10, 0))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def key(self, **kwargs):
+        config = dict(fingerprint='abc123', sensor_model={'id': 1, 'timestamp_unit': 'seconds'},
+                      sensor_timezone='Europe/Amsterdam', project_timezone='UTC', settings={'Ax_conversion': 'Ax*2'},
+                      formulas={'Magnitude': 'sqrt(Ax^2)'})
+        config.update(kwargs)
+        return ParsedDataCache.key(**config)
+
+    def test_key(self):
+        self.assertEqual(self.key(), self.key())
+        self.assertNotEqual(self.key(), self.key(fingerprint='def456'))
+        self.assertNotEqual(self.key(), self.key(sensor_model={'id': 1, 'timestamp_unit': 'milliseconds'}))
+        self.assertNotEqual(self.key(), self.key(project_timezone='Europe/Amsterdam'))
+        self.assertNotEqual(self.key(), self.key(settings={'Ax_conversion': 'Ax*3'}))
+        self.assertNotEqual(self.key(), self.key(formulas={}))
+
+    def test_save_and_load(self):
+        key = self.key()
+        self.assertIsNone(self.cache.load(key))
+
+        sampling_index = SamplingIndex.build(self.df['absolute_datetime'].to_numpy(dtype='datetime64[ns]').view('i8'))
+        self.cache.save(key, self.df, ['Time', 'Ax'], self.utc_dt, ['Magnitude'], sampling_index)
+        entry = self.cache.load(key)
+
+        pd.testing.assert_frame_equal(entry[ENTRY_DATA], self.df)
+        self.assertEqual(entry[ENTRY_COLUMNS], ['Time', 'Ax'])
+        self.assertEqual(entry[ENTRY_UTC_DT], self.utc_dt)
+        self.assertEqual(entry[ENTRY_FORMULAS], ['Magnitude'])
+        self.assertAlmostEqual(entry[ENTRY_SAMPLING_INDEX].rate, 10)
+        self.assertEqual(list(self.cache.cache_dir.glob('*.tmp')), [])
+
+    def test_corrupt_entry(self):
+        key = self.key()
+        self.cache.cache_dir.mkdir(parents=True)
+        self.cache.entry_path(key).write_bytes(b'not a pickle')
+
+        self.assertIsNone(self.cache.load(key))
+
+    def test_evict_least_recently_used(self):
+        keys = [self.key(fingerprint=str(i)) for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            self.cache.save(key, self.df, [], self.utc_dt, [])
+            os.utime(self.cache.entry_path(key), (1000 + i, 1000 + i))
+
+        # Using the oldest entry makes the other entry the least recently used one
+        self.cache.load(keys[0])
+        self.cache.save(keys[2], self.df, [], self.utc_dt, [])
+
+        self.assertIsNotNone(self.cache.load(keys[0]))
+        self.assertIsNone(self.cache.load(keys[1]))
+        self.assertIsNotNone(self.cache.load(keys[2]))
+
+    def test_sensor_data_does_not_use_qt(self):
+        # The sensor data is parsed on a worker thread, where no dialogs can be shown
+        records = import_time.profile_imports('data_import.sensor_data')
+        self.assertEqual(import_time.eager_imports(records, ['PyQt5']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
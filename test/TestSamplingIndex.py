@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_import.sampling_index import SamplingIndex
+from date_utils import NAT_NS
+
+SECOND = 10 ** 9
+START = pd.Timestamp(2020, 5, 1, 10).value
+
+
+def times(rate: float, seconds: float, start: float = 0) -> np.ndarray:
+    return START + ((start + np.arange(int(seconds * rate)) / rate) * SECOND).astype(np.int64)
+
+
+class TestSamplingIndex(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # 10 seconds at 100 Hz, a gap of 5 seconds, 10 seconds at 50 Hz
+        self.utc_ns = np.concatenate([times(100, 10), times(50, 10, start=15)])
+        self.index = SamplingIndex.build(self.utc_ns)
+
+    def test_runs(self):
+        runs = self.index.runs()
+
+        self.assertEqual([(run.first, run.stop) for run in runs], [(0, 1000), (1000, 1500)])
+        self.assertAlmostEqual(runs[0].rate, 100)
+        self.assertAlmostEqual(runs[1].rate, 50)
+        self.assertAlmostEqual(self.index.rate, 100)
+        self.assertEqual(self.index.gaps(), [(int(self.utc_ns[999]), START + 15 * SECOND)])
+        self.assertTrue(self.index.monotonic)
+
+        # A change of the sampling rate without a gap
+        self.assertEqual(len(SamplingIndex.build(np.concatenate([times(100, 1), times(25, 1, start=1)]))), 1)
+
+    def test_rate_at(self):
+        self.assertAlmostEqual(self.index.rate_at(START + 5 * SECOND), 100)
+        self.assertAlmostEqual(self.index.rate_at(START + 16 * SECOND), 50)
+        self.assertIsNone(self.index.rate_at(START + 12 * SECOND))
+        self.assertIsNone(self.index.rate_at(START - SECOND))
+
+    def test_rows_between(self):
+        first, stop = self.index.rows_between(self.utc_ns, START + 9 * SECOND, START + 16 * SECOND)
+        self.assertEqual((first, stop), (900, 1050))
+
+        index = self.index.slice(self.utc_ns, first, stop)
+        self.assertEqual([(run.first, run.stop) for run in index.runs()], [(0, 100), (100, 150)])
+        self.assertEqual(index.starts_ns[0], START + 9 * SECOND)
+        self.assertEqual(index.rows, 150)
+
+    def test_empty_slice(self):
+        utc_ns = np.arange(10, dtype=np.int64) * 10 ** 7
+        index = SamplingIndex.build(utc_ns).slice(utc_ns, 5, 5)
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.rows, 0)
+        self.assertIsNone(index.rate)
+
+        # A timespan without rows
+        first, stop = self.index.rows_between(self.utc_ns, START + 11 * SECOND, START + 12 * SECOND)
+        self.assertEqual(len(self.index.slice(self.utc_ns, first, stop)), 0)
+
+    def test_irregular(self):
+        # A step back in time and a missing time
+        utc_ns = np.concatenate([times(10, 2), times(10, 2), [NAT_NS], times(10, 1, start=2)])
+        index = SamplingIndex.build(utc_ns)
+
+        self.assertFalse(index.monotonic)
+        self.assertIsNone(index.rows_between(utc_ns, START, START + SECOND))
+        self.assertEqual([(run.first, run.stop) for run in index.runs()], [(0, 20), (20, 40), (40, 41), (41, 51)])
+        self.assertAlmostEqual(index.rate_at(START + 2 * SECOND + SECOND // 2), 10)
+        self.assertIsNone(SamplingIndex.build(np.zeros(0, dtype=np.int64)).rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_import.sensor_data_cache import SensorDataCache, CachedSensorData, MEGABYTE
+
+
+class TestSensorDataCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.df = pd.DataFrame({'Time': np.arange(1000, dtype=float), 'Ax': np.ones(1000)})
+        self.size = CachedSensorData(self.df, [], None).size
+        # Room for two DataFrames
+        self.cache = SensorDataCache(max_size=2.5 * self.size / MEGABYTE)
+
+    def put(self, key):
+        self.cache.put(key, self.df.copy(), ['Time', 'Ax'], None)
+
+    def test_checkout_copy(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.put('a')
+
+        entry = self.cache.get('a')
+        entry.df['Ax'] = 2.0
+        entry.df.drop(index=range(500), inplace=True)
+
+        pd.testing.assert_frame_equal(self.cache.get('a').df, self.df)
+        self.assertEqual(self.cache.get('a').columns, ['Time', 'Ax'])
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (3, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.75)
+        self.assertEqual(stats['size'], self.size)
+
+    def test_evict_least_recently_used(self):
+        self.put('a')
+        self.put('b')
+        # Using 'a' makes 'b' the least recently used entry
+        self.cache.get('a')
+        self.put('c')
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.assertLessEqual(self.cache.stats()['size'], self.cache.stats()['max_size'])
+
+    def test_too_large(self):
+        cache = SensorDataCache(max_size=0.5 * self.size / MEGABYTE)
+        cache.put('a', self.df, [], None)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_resize(self):
+        for key in ['a', 'b']:
+            self.put(key)
+        self.cache.get('a')
+
+        self.cache.resize(1.5 * self.size / MEGABYTE)
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from controllers.settings_store import SettingsStore
+
+
+class TestSettingsStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = Path(self.tmp_dir.name) / 'project_config.json'
+        self.file_path.write_text(json.dumps({'plot_width': 20}))
+
+        self.store = SettingsStore(self.file_path, delay=0.05)
+        self.store.load()
+
+    def tearDown(self) -> None:
+        self.store.flush()
+        self.tmp_dir.cleanup()
+
+    def read_file(self) -> dict:
+        return json.loads(self.file_path.read_text())
+
+    def test_changes_are_visible_immediately_and_written_later(self):
+        for width in range(21, 40):
+            self.store.set('plot_width', width)
+
+        self.assertEqual(self.store.get('plot_width'), 39)
+        self.assertEqual(self.read_file()['plot_width'], 20)
+
+        time.sleep(0.3)
+        self.assertEqual(self.read_file()['plot_width'], 39)
+
+    def test_flush_writes_pending_changes(self):
+        self.store.set('timezone', 'Europe/Amsterdam')
+        self.store.flush()
+
+        self.assertEqual(self.read_file(), {'plot_width': 20, 'timezone': 'Europe/Amsterdam'})
+
+    def test_nested_changes_after_set_are_not_written(self):
+        formulas = {'vector': 'sqrt(Ax^2)'}
+        self.store.set('formulas', formulas)
+        formulas['other'] = 'Ay'  # Changed without calling set, so not scheduled.
+        self.store.flush()
+
+        self.assertEqual(self.read_file()['formulas'], {'vector': 'sqrt(Ax^2)'})
+
+    def test_no_temporary_files_left_behind(self):
+        self.store.save_now()
+
+        self.assertEqual([path.name for path in Path(self.tmp_dir.name).iterdir()], ['project_config.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
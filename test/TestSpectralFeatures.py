@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data_export import spectral_features as sf
+from data_export import windowing as w
+
+
+def sine_data(freq, seconds=10, rate=50):
+    n = seconds * rate
+    t = np.arange(n) / rate
+    return pd.DataFrame({
+        'Timestamp': pd.Timestamp('2020-05-01 12:00') + pd.to_timedelta(t, unit='s'),
+        'Ax': 3 + np.sin(2 * np.pi * freq * t),
+        'Label': 'walk'
+    })
+
+
+class TestSpectralFeatures(unittest.TestCase):
+
+    def test_windows_align_with_rolling_windows(self):
+        df = sine_data(2)
+        res = w.windowing(df, ['Ax'], 'Label', 'Timestamp', mean=np.mean, sma='sma')
+
+        # The SMA of a positive signal is its mean, so both must be computed over the same windows.
+        np.testing.assert_allclose(res['Ax_sma'], res['Ax_mean'])
+        self.assertEqual(len(res), 9)
+
+    def test_dominant_frequency_and_band_energy(self):
+        res = w.windowing(sine_data(2), ['Ax'], 'Label', 'Timestamp', dom='dominant_frequency',
+                          low='band_energy_1_3', high='band_energy_3_25', entropy='spectral_entropy')
+
+        np.testing.assert_allclose(res['Ax_dom'], 2.0)
+        self.assertTrue(np.all(res['Ax_low'] > 100 * res['Ax_high']))
+        self.assertTrue(np.all(res['Ax_entropy'] < 0.1))
+
+    def test_entropy_of_noise_is_high(self):
+        windows = np.random.default_rng(0).normal(size=(20, 100))
+        res = sf.compute(windows.ravel(), ['spectral_entropy'], 100, 100, 50)
+
+        self.assertEqual(len(res['spectral_entropy']), 20)
+        self.assertTrue(np.all(res['spectral_entropy'] > 0.8))
+
+    def test_matches_per_window_computation(self):
+        values = np.random.default_rng(1).normal(size=230)
+        res = sf.compute(values, ['spectral_energy'], 50, 20, 25)
+
+        expected = [np.sum(np.abs(np.fft.rfft(win - win.mean())) ** 2) / 50
+                    for win in (values[end - 49:end + 1] for end in range(49, 230, 20))]
+        np.testing.assert_allclose(res['spectral_energy'], expected)
+
+    def test_segment_shorter_than_window(self):
+        res = sf.compute(np.ones(10), ['dominant_frequency', 'sma'], 20, 10, 10)
+
+        self.assertEqual(len(res['dominant_frequency']), 0)
+        self.assertEqual(len(res['sma']), 0)
+
+    def test_unknown_feature(self):
+        self.assertFalse(sf.is_spectral_feature('band_energy_x'))
+        with self.assertRaises(KeyError):
+            sf.get_feature('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import datetime as dt
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+
+from data_export import windowing as w
+from data_export.feature_store import FeatureStore
+from machine_learning.model_cache import ModelCache
+from machine_learning.suggestion_pipeline import SuggestionPipeline, LABEL_COL, TIMESTAMP_COL
+
+START = dt.datetime(2020, 5, 1, 10, 0)
+
+
+def sensor_data(activities):
+    """
+    :param activities: A list of (activity, seconds), 'rest' has small values and 'move' large values
+    :return: Sensor data at 10 Hz with a timezone aware datetime column, in the project timezone
+    """
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(0 if activity == 'rest' else 10, 0.1, size=seconds * 10)
+                             for activity, seconds in activities])
+    return pd.DataFrame({
+        'absolute_datetime': pd.date_range(START, periods=len(values), freq='100ms', tz='UTC')
+                               .tz_convert('Europe/Amsterdam'),
+        'Ax': values
+    })
+
+
+def label(activity, start_s, end_s):
+    return {'start': START + dt.timedelta(seconds=start_s), 'end': START + dt.timedelta(seconds=end_s),
+            'activity': activity}
+
+
+class TestSuggestionPipeline(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.df = sensor_data([('rest', 30), ('move', 30), ('rest', 60), ('move', 60)])
+        self.labels = [label('rest', 0, 30), label('move', 30, 60)]
+
+    def pipeline(self, **kwargs):
+        return SuggestionPipeline(self.df, 'absolute_datetime', ['Ax'], GaussianNB(), self.labels, **kwargs)
+
+    def test_suggestions_stream_per_chunk(self):
+        chunks = list(self.pipeline(chunk_windows=20).suggestions())
+
+        self.assertGreater(len(chunks), 1)
+        suggestions = np.concatenate(chunks)
+        self.assertEqual(set(suggestions['label']), {'rest', 'move'})
+
+        # The begin and end are naive UTC, like the labels
+        first = suggestions[0]
+        self.assertEqual(first['label'], 'rest')
+        self.assertGreaterEqual(first['begin'], np.datetime64(START + dt.timedelta(seconds=60)))
+        self.assertLess(first['end'], np.datetime64(START + dt.timedelta(seconds=120)))
+
+    def test_chunks_emit_same_windows_as_whole_run(self):
+        pipeline = self.pipeline(chunk_windows=7)
+        unlabeled = pipeline.data.iloc[600:]
+        expected = w.windowing(unlabeled, ['Ax'], LABEL_COL, TIMESTAMP_COL, **pipeline.funcs).index
+
+        position, windows = 0, []
+        while True:
+            chunk = pipeline._next_chunk(position)
+            if chunk is None:
+                break
+            start, stop, position = chunk
+            windows.append(w.windowing(pipeline.data.iloc[start:stop], ['Ax'], LABEL_COL, TIMESTAMP_COL,
+                                       **pipeline.funcs).index)
+
+        self.assertTrue(np.array_equal(np.concatenate(windows), expected.to_numpy()))
+
+    def test_accepted_labels_are_used_for_the_next_chunk(self):
+        pipeline = self.pipeline(chunk_windows=20)
+        suggestions = pipeline.suggestions()
+        first = next(suggestions)[0]
+
+        pipeline.add_label(first['begin'], first['end'], first['label'], label_version=1)
+        rest = list(suggestions)
+
+        self.assertEqual(pipeline.label_version, 1)
+        self.assertTrue((pipeline.data[LABEL_COL].to_numpy()[600:] != 'NaN').any())
+        # The accepted rows are not suggested again
+        self.assertTrue(all((chunk['begin'] > first['end']).all() for chunk in rest))
+
+    def test_abort(self):
+        pipeline = self.pipeline(chunk_windows=20)
+        suggestions = pipeline.suggestions()
+        next(suggestions)
+        pipeline.abort()
+
+        self.assertEqual(list(suggestions), [])
+
+    def test_no_labels(self):
+        self.labels = []
+        with self.assertRaises(ValueError):
+            next(self.pipeline().suggestions())
+
+    def test_feature_store_and_model_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            kwargs = dict(feature_store=FeatureStore(Path(tmp_dir, 'features')), file_id='file',
+                          model_cache=ModelCache(Path(tmp_dir, 'models')), chunk_windows=20)
+
+            expected = np.concatenate(list(self.pipeline(**kwargs).suggestions()))
+            self.assertTrue(any(Path(tmp_dir, 'models').iterdir()))
+
+            # Second run with the stored windows and the cached classifier
+            res = np.concatenate(list(self.pipeline(**kwargs).suggestions()))
+            self.assertTrue(np.array_equal(res, expected))
+
+    def test_executor(self):
+        expected = np.concatenate(list(self.pipeline(chunk_windows=20).suggestions()))
+
+        with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor(max_workers=2) as executor:
+            for kwargs in ({}, dict(feature_store=FeatureStore(Path(tmp_dir)), file_id='file')):
+                res = np.concatenate(list(self.pipeline(chunk_windows=20, executor=executor, **kwargs).suggestions()))
+                self.assertTrue(np.array_equal(res, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
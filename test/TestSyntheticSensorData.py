@@ -0,0 +1,120 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import history
+from benchmarks.generate import generate_sensor_file, START
+from database.models import db, SensorModel
+from models.sensor_metadata import SensorMetadata
+
+
+class TestSyntheticSensorData(unittest.TestCase):
+
+    def setUp(self) -> None:
+        db.init(':memory:')
+        db.connect()
+        db.create_tables([SensorModel])
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        db.close()
+        self.tmp_dir.cleanup()
+
+    def sensor_model(self, **kwargs):
+        fields = dict(model_name='test', date_row=2, time_row=3, timestamp_column=0, relative_absolute='relative',
+                      timestamp_unit='milliseconds', format_string='', sensor_id_row=1, sensor_id_column=1,
+                      col_names_row=4, comment_style=';')
+        fields.update(kwargs)
+        return SensorModel.create(**fields)
+
+    def read(self, path: Path, sensor_model: SensorModel) -> (SensorMetadata, pd.DataFrame):
+        # Read the file like `SensorData.parse`
+        metadata = SensorMetadata(path, sensor_model, sensor_model.id)
+        metadata.load_values()
+        df = pd.read_csv(path, names=list(filter(None, metadata.col_names)), skip_blank_lines=False,
+                         skiprows=sensor_model.col_names_row + 1, comment=sensor_model.comment_style)
+        return metadata, df
+
+    def test_relative_layout(self):
+        sensor_model = self.sensor_model()
+        recording = generate_sensor_file(self.dir / 'relative.csv', sensor_model, hours=0.1, sampling_rate=50,
+                                         sensor_name='S1')
+        metadata, df = self.read(recording.path, sensor_model)
+
+        self.assertEqual(metadata.sensor_name, 'S1')
+        self.assertEqual(metadata.parse_naive_datetime(), START)
+        self.assertEqual(list(df.columns), ['Time', 'Ax', 'Ay', 'Az', 'Gx', 'Gy', 'Gz'])
+        self.assertEqual(len(df), recording.rows)
+        self.assertEqual(recording.rows, 18000)
+        # Milliseconds at 50 Hz
+        self.assertEqual(list(df['Time'][:3]), [0, 20, 40])
+
+        # The activities cover the whole recording
+        self.assertEqual(recording.labels[0][0], 0)
+        self.assertAlmostEqual(recording.labels[-1][1], 360)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(recording.labels[:-1], recording.labels[1:])))
+
+    def test_absolute_layout(self):
+        sensor_model = self.sensor_model(relative_absolute='absolute', timestamp_column=2, comment_style=None,
+                                         timestamp_unit='formatted string', format_string='%Y-%m-%d %H:%M:%S.%f')
+        recording = generate_sensor_file(self.dir / 'absolute.csv', sensor_model, hours=0.01, sampling_rate=10,
+                                         columns=['Ax', 'Ay', 'Az'])
+        _, df = self.read(recording.path, sensor_model)
+
+        self.assertEqual(list(df.columns), ['Ax', 'Ay', 'Time', 'Az'])
+        timestamps = pd.to_datetime(df['Time'], format=sensor_model.format_string)
+        self.assertEqual(timestamps.iloc[0], pd.Timestamp(START))
+        self.assertEqual(timestamps.iloc[-1], pd.Timestamp(START) + pd.Timedelta(seconds=35.9))
+
+    def test_activities_differ(self):
+        sensor_model = self.sensor_model()
+        recording = generate_sensor_file(self.dir / 'relative.csv', sensor_model, hours=0.5, sampling_rate=10)
+        _, df = self.read(recording.path, sensor_model)
+        seconds = df['Time'] / 1000
+
+        std = {}
+        for start, end, activity in recording.labels:
+            std.setdefault(activity, []).append(df['Ay'][(seconds >= start) & (seconds < end)].std())
+
+        self.assertLess(np.mean(std['rest']), np.mean(std['walk']))
+        self.assertLess(np.mean(std['walk']), np.mean(std['run']))
+        self.assertEqual(recording.label_datetimes()[0][0], START)
+
+
+class TestBenchmarkHistory(unittest.TestCase):
+
+    @staticmethod
+    def record(seconds, stage='windowing', rows=1000):
+        return {'stage': stage, 'layout': 'relative', 'rows': rows, 'machine': 'm', 'seconds': seconds}
+
+    def test_append_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'results', 'history.jsonl')
+            self.assertEqual(history.load_history(path), [])
+
+            history.append_history([self.record(1.0)], path)
+            history.append_history([self.record(2.0)], path)
+            with path.open('a') as f:
+                f.write('{"interrupted')
+
+            self.assertEqual([r['seconds'] for r in history.load_history(path)], [1.0, 2.0])
+
+    def test_find_regressions(self):
+        previous = [self.record(s) for s in [9.0, 1.0, 1.1, 0.9, 1.0, 1.2]] + [self.record(1.0, stage='export')]
+        new = [self.record(1.3), self.record(1.1, stage='export'), self.record(5.0, rows=2000)]
+
+        regressions = history.find_regressions(previous, new)
+
+        # Compared with the median of the last five runs; other data sizes have no history yet
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0]['stage'], 'windowing')
+        self.assertAlmostEqual(regressions[0]['baseline'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import datetime as dt
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from database.models import db, Camera, Video
+
+try:
+    from controllers import video_controller
+except ImportError:
+    video_controller = None
+
+METADATA = {'begin_time_tag': '2020:05:01 12:00:00', 'frame_rate': 25.0, 'duration': 61.5, 'camera_name': 'GoPro'}
+
+
+@unittest.skipIf(video_controller is None, 'PyQt5 is not installed')
+class TestVideoController(unittest.TestCase):
+
+    def setUp(self) -> None:
+        db.init(':memory:')
+        db.connect()
+        db.create_tables([Camera, Video])
+        self.camera = Camera.create(name='camera')
+
+        self.controller = video_controller.VideoController(SimpleNamespace(project_controller=None))
+
+    def tearDown(self) -> None:
+        db.close()
+
+    def open(self, file_name: str, file_id_hash: str):
+        self.controller.file_name = file_name
+        self.controller.file_path = Path('/videos', file_name)
+        self.controller.file_id_hash = file_id_hash
+        self.controller.metadata = None
+        self.controller.video = self.controller.find_video()
+
+    def add_video(self, file_name: str, file_id_hash: str = None, **metadata) -> Video:
+        return Video.create(file_name=file_name, file_path='/videos/' + file_name, datetime=dt.datetime(2020, 5, 1),
+                            camera=self.camera, file_id_hash=file_id_hash, **metadata)
+
+    def test_cached_metadata(self):
+        video = self.add_video('GH010001.MP4', 'day1', **METADATA)
+        self.open('GH010001.MP4', 'day1')
+
+        with mock.patch.object(video_controller.video_metadata, 'read_video_metadata') as read:
+            self.assertEqual(self.controller.get_metadata(), METADATA)
+            read.assert_not_called()
+
+        self.assertEqual(self.controller.video.id, video.id)
+
+    def test_same_file_name_other_video(self):
+        self.add_video('GH010001.MP4', 'day1', **METADATA)
+        self.open('GH010001.MP4', 'day2')
+
+        # A clip with the same name from another day is a new video, the metadata of the other clip is kept
+        self.assertIsNone(self.controller.video)
+        self.assertEqual(Video.get(Video.file_id_hash == 'day1').duration, 61.5)
+
+    def test_legacy_video_without_fingerprint(self):
+        legacy = self.add_video('GH010001.MP4')
+        self.open('GH010001.MP4', 'day1')
+        self.assertEqual(self.controller.video.id, legacy.id)
+
+        metadata = dict(METADATA, duration=30.0)
+        with mock.patch.object(video_controller.video_metadata, 'read_video_metadata', return_value=metadata):
+            self.assertEqual(self.controller.get_metadata(), metadata)
+
+        # The metadata is stored with the fingerprint, the next time it is read from the database
+        legacy = Video.get_by_id(legacy.id)
+        self.assertEqual((legacy.file_id_hash, legacy.duration), ('day1', 30.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
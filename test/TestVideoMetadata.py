@@ -0,0 +1,107 @@
+import datetime as dt
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+import pytz
+
+import video_metadata
+from video_metadata import ExifTool
+
+# Implements the -stay_open protocol of exiftool. Every started process and every request is logged, so the tests can
+# count them.
+STUB = textwrap.dedent('''
+    import json
+    import sys
+
+    log_path = sys.argv[1]
+    with open(log_path, 'a') as log:
+        log.write('start\\n')
+
+    args = []
+    for line in sys.stdin:
+        line = line.rstrip('\\n')
+        if line.startswith('-execute'):
+            with open(log_path, 'a') as log:
+                log.write('execute\\n')
+            files = [arg for arg in args if not arg.startswith('-')]
+            tags = [{
+                'SourceFile': f,
+                'CreateDate': '2020:05:01 12:00:00',
+                'VideoFrameRate': 25,
+                'Duration': 61.5,
+                'DeviceModelName': 'GoPro'
+            } for f in files]
+            sys.stdout.write(json.dumps(tags) + '\\n{ready' + line[len('-execute'):] + '}\\n')
+            sys.stdout.flush()
+            args = []
+        elif line == 'False' and args == ['-stay_open']:
+            break
+        else:
+            args.append(line)
+''')
+
+
+class TestVideoMetadata(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+
+        stub_path = self.dir / 'exiftool_stub.py'
+        stub_path.write_text(STUB)
+        self.log_path = self.dir / 'log.txt'
+        self.exiftool = ExifTool([sys.executable, str(stub_path), str(self.log_path)])
+
+        self.videos = []
+        for i in range(3):
+            video = self.dir / f'video{i}.mp4'
+            video.write_bytes(b'\x00' * 100)
+            self.videos.append(video)
+
+    def tearDown(self) -> None:
+        self.exiftool.close()
+        self.tmp_dir.cleanup()
+
+    def log(self):
+        return self.log_path.read_text().split()
+
+    def test_single_process_for_many_requests(self):
+        for video in self.videos:
+            metadata = video_metadata.read_video_metadata(video, self.exiftool)
+            self.assertEqual(metadata, {'begin_time_tag': '2020:05:01 12:00:00', 'frame_rate': 25.0,
+                                        'duration': 61.5, 'camera_name': '_GoPro'})
+
+        self.assertEqual(self.log(), ['start', 'execute', 'execute', 'execute'])
+
+    def test_batch_request(self):
+        metadata = video_metadata.read_videos_metadata(self.videos, self.exiftool)
+
+        self.assertEqual(len(metadata), 3)
+        self.assertEqual(self.log(), ['start', 'execute'])
+
+    def test_restart_after_close(self):
+        video_metadata.read_video_metadata(self.videos[0], self.exiftool)
+        self.exiftool.close()
+        self.assertFalse(self.exiftool.is_running())
+
+        video_metadata.read_video_metadata(self.videos[0], self.exiftool)
+        self.assertEqual(self.log(), ['start', 'execute', 'start', 'execute'])
+
+    def test_missing_file(self):
+        with self.assertRaises(video_metadata.FileNotFoundException):
+            video_metadata.read_video_metadata(self.dir / 'missing.mp4', self.exiftool)
+
+    def test_parse_begin_time_tag(self):
+        amsterdam = pytz.timezone('Europe/Amsterdam')
+
+        self.assertEqual(video_metadata.parse_begin_time_tag('2020:05:01 12:00:00', amsterdam),
+                         dt.datetime(2020, 5, 1, 10))
+        self.assertEqual(video_metadata.parse_begin_time_tag('2020:05:01 12:00:00+01:00', amsterdam),
+                         dt.datetime(2020, 5, 1, 11))
+
+
+if __name__ == '__main__':
+    unittest.main()
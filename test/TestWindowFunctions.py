@@ -0,0 +1,148 @@
+import gc
+import unittest
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_export import window_functions as wf
+from data_export import windowing as w
+
+
+def rolling_reference(df, col, func, window=2, hop=1):
+    """The windowing as it was done with rolling().apply, which evaluates every window."""
+    _, stops = wf.window_bounds(df['Timestamp'].to_numpy(dtype='datetime64[ns]'), window, hop)
+    rolled = df[[col, 'Timestamp']].rolling(window=timedelta(seconds=window), on='Timestamp').apply(func, raw=True)
+    return rolled[col].to_numpy()[stops - 1]
+
+
+def sensor_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    # Irregular sampling, roughly 20 Hz
+    offsets = np.cumsum(rng.uniform(0.03, 0.07, size=n))
+    return pd.DataFrame({
+        'Timestamp': pd.Timestamp('2020-05-01 12:00', tz='Europe/Amsterdam') + pd.to_timedelta(offsets, unit='s'),
+        'Ax': rng.normal(size=n),
+        'Label': 'walk'
+    })
+
+
+class TestWindowFunctions(unittest.TestCase):
+
+    def test_same_windows_as_rolling(self):
+        df = sensor_data()
+
+        for func in (np.mean, np.median, lambda a: a[-1] - a[0], len):
+            res = w.windowing(df, ['Ax'], 'Label', 'Timestamp', f=func)
+            np.testing.assert_allclose(res['Ax_f'].to_numpy(), rolling_reference(df, 'Ax', func))
+
+    def test_registered_functions(self):
+        df = sensor_data()
+        res = w.windowing(df, ['Ax'], 'Label', 'Timestamp', mean='mean', range='range', energy='energy')
+
+        np.testing.assert_allclose(res['Ax_mean'].to_numpy(), rolling_reference(df, 'Ax', np.mean))
+        np.testing.assert_allclose(res['Ax_range'].to_numpy(), rolling_reference(df, 'Ax', np.ptp))
+        np.testing.assert_allclose(res['Ax_energy'].to_numpy(),
+                                   rolling_reference(df, 'Ax', lambda a: np.mean(a ** 2)))
+
+    def test_only_emitted_windows_are_evaluated(self):
+        df = sensor_data()
+        calls = []
+
+        def count(a):
+            calls.append(len(a))
+            return 0.0
+
+        res = w.windowing(df, ['Ax'], 'Label', 'Timestamp', count=wf.WindowFunction(count, compile=False))
+
+        self.assertEqual(len(calls), len(res))
+        self.assertLess(len(calls), len(df) / 10)
+
+    def test_window_bounds(self):
+        timestamps = np.datetime64('2020-05-01T12:00:00', 'ns') + np.array([0, 500, 1000, 1500, 2000, 2600, 3000],
+                                                                           dtype='timedelta64[ms]')
+        starts, stops = wf.window_bounds(timestamps, 2, 1)
+
+        # Windows ending before 2 s and 3 s, at the rows at 1.5 s and 2.6 s, each containing the rows in
+        # (row - 2 s, row]
+        np.testing.assert_array_equal(stops, [4, 6])
+        np.testing.assert_array_equal(starts, [0, 2])
+
+    def test_gap_within_segment(self):
+        # 10 seconds at 20 Hz without the samples from 3 to 5.5 seconds
+        regular = pd.DataFrame({'Timestamp': pd.date_range('2020-05-01 12:00', periods=200, freq='50ms'),
+                                'Ax': np.arange(200.0), 'Label': 'walk'})
+        df = regular.drop(index=range(60, 110)).reset_index(drop=True)
+        res = w.windowing(df, ['Ax'], 'Label', 'Timestamp', mean='mean')
+
+        # The windows that end in the gap contain the same rows and are emitted once, the windows after the gap still
+        # end `hop` seconds apart
+        offsets = (res.index - regular['Timestamp'].iloc[0]).total_seconds()
+        np.testing.assert_allclose(offsets, [1.95, 2.95, 5.95, 6.95, 7.95, 8.95, 9.95])
+        np.testing.assert_allclose(res['Ax_mean'].to_numpy(), rolling_reference(df, 'Ax', np.mean))
+        self.assertEqual(len(w.windowing_fast(df, ['Ax'], window=2, hop=1)), len(res))
+
+    def test_rows_per_window(self):
+        regular = pd.DataFrame({'Timestamp': pd.date_range('2020-05-01 12:00', periods=100, freq='50ms')})
+        self.assertEqual(w.rows_per_window(regular, 'Timestamp', 2, 1), (40, 20))
+
+        # The rows follow the sampling rate when the sensor dropped samples
+        dropped = regular.drop(index=range(5, 15)).reset_index(drop=True)
+        self.assertEqual(w.rows_per_window(dropped, 'Timestamp', 2, 1), (40, 20))
+        self.assertEqual(w.rows_per_window(regular[:1], 'Timestamp', 2, 1), (0, 0))
+
+    @unittest.skipIf(wf.numba is None, 'Numba is not installed')
+    def test_compiled(self):
+        func = wf.WindowFunction(lambda a: a.max() - a.min())
+        res = func.evaluate(np.arange(10.0), np.array([0, 5]), np.array([5, 10]))
+
+        self.assertTrue(func.is_compiled)
+        np.testing.assert_array_equal(res, [4.0, 4.0])
+
+    def test_wrapped_functions_are_released(self):
+        def func(a):
+            return a.sum()
+
+        wrapped = wf.get_window_function(func)
+        self.assertIs(wf.get_window_function(func), wrapped)
+        np.testing.assert_array_equal(wrapped.evaluate(np.arange(10.0), np.array([0]), np.array([5])), [10.0])
+
+        ref = weakref.ref(func)
+        del func, wrapped
+        gc.collect()
+        self.assertIsNone(ref())
+
+        # The functions themselves are not changed
+        attributes = set(dir(np.median))
+        wf.get_window_function(np.median)
+        self.assertEqual(set(dir(np.median)), attributes)
+
+    def test_threads_share_wrapped_function(self):
+        def func(a):
+            return a.max()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            wrapped = set(executor.map(lambda _: id(wf.get_window_function(func)), range(32)))
+
+        self.assertEqual(len(wrapped), 1)
+
+    @unittest.skipIf(wf.numba is None, 'Numba is not installed')
+    def test_errors_do_not_disable_compilation(self):
+        func = wf.WindowFunction(lambda a: 1 // int(a.sum()))
+
+        with self.assertRaises(ZeroDivisionError):
+            func.evaluate(np.zeros(3), np.array([0]), np.array([3]))
+        self.assertTrue(func.is_compiled)
+
+    def test_fallback_for_functions_that_cannot_be_compiled(self):
+        func = wf.WindowFunction(lambda a: pd.Series(a).sum())
+        res = func.evaluate(np.arange(10.0), np.array([0, 5]), np.array([5, 10]))
+
+        self.assertFalse(func.is_compiled)
+        np.testing.assert_array_equal(res, [10.0, 35.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
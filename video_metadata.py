@@ -1,11 +1,13 @@
+import atexit
 import datetime
 import json
 import os
-import shlex
 import subprocess
+import threading
 # import dateutil.parser as dparser
 from datetime import timedelta
 from pathlib import Path
+from typing import List, Optional, Union
 
 import pytz
 
@@ -14,6 +16,21 @@ from date_utils import naive_to_utc
 
 # MP4_VIDEO_DT_FORMAT = '%Y-%m-%dT%H:%M:%S.000000Z\n'
 
+EXIFTOOL_ENV_VAR = 'EXIFTOOL_PATH'
+"""Environment variable that can point to the exiftool executable, e.g. a stub in tests."""
+
+# List tags to obtain from videofile. Note that different cameras may use different tags
+CREATE_DATETIME_TAGS = ['CreationDateValue', 'DateTimeOriginal', 'CreateDate', 'CreationDate', 'TrackCreateDate',
+                        'MediaCreateDate']
+# 'TimeStamp', 'SonyDateTime', 'DateTime', 'GPSDateStamp'
+REQUESTED_DATETIME_TAGS = ['DateTimeOriginal', 'CreateDate', 'CreationDate', 'TrackCreateDate', 'MediaCreateDate',
+                           'CreationDateValue', 'TimeStamp', 'SonyDateTime', 'DateTime', 'GPSDateStamp']
+CAMERA_NAME_TAGS = ['DeviceManufacturer', 'DeviceModelName', 'DeviceSerialNo']
+
+# The '#' suffix makes exiftool print the numerical value instead of a human readable string.
+FRAME_RATE_TAG = 'VideoFrameRate'
+DURATION_TAG = 'Duration'
+
 
 class FileNotFoundException(Exception):
     pass
@@ -27,6 +44,182 @@ class StartTimeNotParsedException(Exception):
     pass
 
 
+class ExifToolError(Exception):
+    pass
+
+
+class ExifTool:
+    """
+    A long-lived exiftool process in `-stay_open` mode.
+
+    Starting exiftool means starting a Perl interpreter, which takes longer than reading the metadata of a video. This
+    class starts the process once and sends it one request per call of `execute`.
+    """
+
+    def __init__(self, executable: Union[str, List[str], None] = None):
+        """
+        :param executable: The exiftool executable, optionally as list with an interpreter. Defaults to the value of
+            the EXIFTOOL_PATH environment variable, or 'exiftool' on the PATH.
+        """
+        if executable is None:
+            executable = os.environ.get(EXIFTOOL_ENV_VAR, 'exiftool')
+        self.executable = [executable] if isinstance(executable, str) else list(executable)
+
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._request_id = 0
+
+    def start(self) -> None:
+        # Arguments after -common_args are added to every request.
+        self._process = subprocess.Popen(
+            self.executable + ['-stay_open', 'True', '-@', '-', '-common_args', '-j', '-api', 'largefilesupport=1'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def execute(self, *args: str) -> str:
+        """
+        Execute one exiftool request.
+
+        :param args: The command line arguments for this request, one argument per value.
+        :return: The output of exiftool for this request.
+        """
+        with self._lock:
+            if not self.is_running():
+                self.start()
+
+            self._request_id += 1
+            ready = '{{ready{}}}'.format(self._request_id)
+            request = '\n'.join(args) + '\n-execute{}\n'.format(self._request_id)
+
+            try:
+                self._process.stdin.write(request.encode('utf-8'))
+                self._process.stdin.flush()
+
+                output = []
+                while True:
+                    line = self._process.stdout.readline()
+                    if not line:
+                        raise ExifToolError('exiftool exited unexpectedly')
+
+                    line = line.decode('utf-8')
+                    if line.strip() == ready:
+                        break
+                    output.append(line)
+            except (OSError, ExifToolError):
+                self._close()
+                raise
+
+            return ''.join(output)
+
+    def execute_json(self, *args: str) -> list:
+        output = self.execute(*args)
+        return json.loads(output) if output.strip() else []
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._process is None:
+            return
+
+        try:
+            if self._process.poll() is None:
+                self._process.stdin.write(b'-stay_open\nFalse\n')
+                self._process.stdin.flush()
+                self._process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._process.kill()
+        finally:
+            self._process = None
+
+
+_exiftool: Optional[ExifTool] = None
+_exiftool_lock = threading.Lock()
+
+
+def get_exiftool() -> ExifTool:
+    """
+    :return: The exiftool process that is shared by the whole application.
+    """
+    global _exiftool
+
+    with _exiftool_lock:
+        if _exiftool is None:
+            _exiftool = ExifTool()
+            atexit.register(_exiftool.close)
+        return _exiftool
+
+
+def read_videos_metadata(file_paths: List[Path], exiftool: ExifTool = None) -> List[dict]:
+    """
+    Reads the metadata that is needed by the application from video files, using a single exiftool request.
+
+    :param file_paths: The paths of the videos
+    :param exiftool: The exiftool process to use, defaults to the shared process
+    :return: A dictionary per video, with the keys 'begin_time_tag' (unparsed begin time), 'frame_rate', 'duration' and
+        'camera_name'. Values that could not be found are None.
+    """
+    for file_path in file_paths:
+        if file_path is None or not os.path.isfile(file_path):
+            raise FileNotFoundException(file_path)
+
+    if exiftool is None:
+        exiftool = get_exiftool()
+
+    args = ['-' + tag for tag in REQUESTED_DATETIME_TAGS + CAMERA_NAME_TAGS]
+    args += ['-{}#'.format(FRAME_RATE_TAG), '-{}#'.format(DURATION_TAG)]
+    args += [Path(file_path).as_posix() for file_path in file_paths]
+
+    exiftool_output = exiftool.execute_json(*args)
+    tags_by_file = {Path(tags.get('SourceFile', '')).as_posix(): tags for tags in exiftool_output}
+
+    res = []
+    for file_path in file_paths:
+        tags = tags_by_file.get(Path(file_path).as_posix(), {})
+
+        begin_time_tag = None
+        for tag in CREATE_DATETIME_TAGS:
+            value = tags.get(tag)
+            if value != '' and value is not None:
+                begin_time_tag = str(value)
+                break
+
+        camera_name = ''
+        for tag in CAMERA_NAME_TAGS:
+            cid = tags.get(tag)
+            if cid != '' and cid is not None:
+                camera_name = camera_name + '_' + str(cid)
+
+        res.append({
+            'begin_time_tag': begin_time_tag,
+            'frame_rate': _to_float(tags.get(FRAME_RATE_TAG)),
+            'duration': _to_float(tags.get(DURATION_TAG)),
+            'camera_name': camera_name if camera_name != '' else None
+        })
+
+    return res
+
+
+def read_video_metadata(file_path: Path, exiftool: ExifTool = None) -> dict:
+    """
+    Reads the metadata that is needed by the application from a video file. See `read_videos_metadata`.
+    """
+    return read_videos_metadata([file_path], exiftool)[0]
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def parse_video_frame_rate(file_path):
     """
     Parses the frame rate of video files.
@@ -37,15 +230,19 @@ def parse_video_frame_rate(file_path):
     if not os.path.isfile(file_path):
         raise FileNotFoundException(file_path)
 
-    # https://trac.ffmpeg.org/wiki/FFprobeTips
-    args = 'ffprobe -v error -select_streams v:0 -show_entries stream=avg_frame_rate -of ' \
-           'default=noprint_wrappers=1:nokey=1 "{}"'.format(file_path)
+    frame_rate = read_video_metadata(Path(file_path))['frame_rate']
+
+    if frame_rate is None:
+        # https://trac.ffmpeg.org/wiki/FFprobeTips
+        args = 'ffprobe -v error -select_streams v:0 -show_entries stream=avg_frame_rate -of ' \
+               'default=noprint_wrappers=1:nokey=1 "{}"'.format(file_path)
 
-    ffprobe_output = subprocess.check_output(args).decode('utf-8')
+        ffprobe_output = subprocess.check_output(args).decode('utf-8')
+
+        numerator = ffprobe_output.split('/')[0]
+        denominator = ffprobe_output.split('/')[1]
+        frame_rate = float(numerator) / float(denominator)
 
-    numerator = ffprobe_output.split('/')[0]
-    denominator = ffprobe_output.split('/')[1]
-    frame_rate = float(numerator) / float(denominator)
     output = round(frame_rate, 2)
 
     return output
@@ -61,11 +258,15 @@ def parse_video_duration(file_path):
     if not os.path.isfile(file_path):
         raise FileNotFoundException(file_path)
 
-    args = 'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{}"'.format(
-        file_path)
-    ffprobe_output = subprocess.check_output(args).decode('utf-8')
+    duration = read_video_metadata(Path(file_path))['duration']
+
+    if duration is None:
+        args = 'ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "{}"'.format(
+            file_path)
+        ffprobe_output = subprocess.check_output(args).decode('utf-8')
+        duration = float(ffprobe_output)
 
-    return float(ffprobe_output)
+    return duration
 
 
 def parse_camera_name(file_path):
@@ -76,22 +277,8 @@ def parse_camera_name(file_path):
     """
     if file_path is None or not os.path.isfile(file_path):
         raise FileNotFoundException(file_path)
-    camera_name_tags = ['DeviceManufacturer', 'DeviceModelName', 'DeviceSerialNo']
-    cmd = "exiftool -j -DeviceManufacturer -DeviceModelName -DeviceSerialNo"
-    args = shlex.split(cmd)
-    args.append(file_path)
-    # run the exiftool process, decode stdout into utf-8 & convert to JSON
-    exiftool_output = subprocess.check_output(args).decode('utf-8')
-    exiftool_output = json.loads(exiftool_output)
-    camera_id = ''
-    for tag in camera_name_tags:
-        cid = exiftool_output[0].get(tag)
-        if cid != '':
-            camera_id = camera_id + '_' + cid
-    if camera_id == '':
-        camera_id = None
-
-    return camera_id
+
+    return read_video_metadata(Path(file_path))['camera_name']
 
 
 def parse_video_begin_time(file_path: Path, camera_timezone) -> datetime.datetime:
@@ -104,23 +291,16 @@ def parse_video_begin_time(file_path: Path, camera_timezone) -> datetime.datetim
     if file_path is None or not file_path.is_file():
         raise FileNotFoundException(file_path)
 
-    # List tags to obtain from videofile. Note that different cameras may use different tags
-    create_datetime_tags = ['CreationDateValue', 'DateTimeOriginal', 'CreateDate', 'CreationDate', 'TrackCreateDate',
-                            'MediaCreateDate']
-    # 'TimeStamp', 'SonyDateTime', 'DateTime', 'GPSDateStamp'
-    cmd = "exiftool -j -DateTimeOriginal " \
-          "-CreateDate -CreationDate -TrackCreateDate -MediaCreateDate -CreationDateValue -TimeStamp -SonyDateTime " \
-          "-DateTime -GPSDateStamp -api largefilesupport=1"
-    args = shlex.split(cmd)
-    args.append(file_path.as_posix())
-    # run the exiftool process, decode stdout into utf-8 & convert to JSON
-    exiftool_output = subprocess.check_output(args).decode('utf-8')
-    exiftool_output = json.loads(exiftool_output)
-    dt = None
-    for tag in create_datetime_tags:
-        dt = exiftool_output[0].get(tag)
-        if dt != '' and dt is not None:
-            break
+    return parse_begin_time_tag(read_video_metadata(file_path)['begin_time_tag'], camera_timezone)
+
+
+def parse_begin_time_tag(dt: Optional[str], camera_timezone) -> datetime.datetime:
+    """
+    Parses the value of the begin time tag of a video, as found by `read_video_metadata`.
+    :param dt: The value of the begin time tag
+    :param camera_timezone: The timezone that should be used
+    :return: datetime: The begin UTC datetime of the video (without tzinfo)
+    """
     # if dt == '' or dt is None:
     # TODO handle case where no start time for video was found
     # raise StartTimeNotFoundException